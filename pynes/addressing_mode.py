@@ -6,3 +6,5 @@ class AddressingMode(enum.Enum):
     absolute = enum.auto()
     zero_page = enum.auto()
     accumulator = enum.auto()
+    relative = enum.auto()
+    implied = enum.auto()
@@ -0,0 +1,885 @@
+import abc
+import contextlib
+import functools
+import io
+import os
+import struct
+import zipfile
+from typing import Callable
+from typing import List
+from typing import Tuple
+
+import numpy as np
+import numpy.typing as npt
+
+from pynes import cache
+
+CPU_CLOCK_RATE = 1789773  # NTSC, Hz
+DEFAULT_SAMPLE_RATE = 44100
+
+APU_REGISTERS_START = 0x4000
+APU_REGISTERS_END = 0x4013
+STATUS = 0x4015
+FRAME_COUNTER = 0x4017
+
+# Indexed by the 5 bit value written to the length counter load registers
+# fmt: off
+LENGTH_TABLE = (
+    10, 254, 20, 2, 40, 4, 80, 6, 160, 8, 60, 10, 14, 12, 26, 14,
+    12, 16, 24, 18, 48, 20, 96, 22, 192, 24, 72, 26, 16, 28, 32, 30,
+)
+# fmt: on
+
+PULSE_DUTY_CYCLES = np.array(
+    [
+        [0, 1, 0, 0, 0, 0, 0, 0],  # 12.5%
+        [0, 1, 1, 0, 0, 0, 0, 0],  # 25%
+        [0, 1, 1, 1, 1, 0, 0, 0],  # 50%
+        [1, 0, 0, 1, 1, 1, 1, 1],  # 25% negated
+    ],
+    dtype=np.int64,
+)
+TRIANGLE_SEQUENCE = np.array(list(range(15, -1, -1)) + list(range(16)), dtype=np.int64)
+# Timer periods, in cpu cycles
+NOISE_PERIODS = (4, 8, 16, 32, 64, 96, 128, 160, 202, 254, 380, 508, 762, 1016, 2034, 4068)
+DMC_PERIODS = (428, 380, 340, 320, 286, 254, 226, 214, 190, 160, 142, 128, 106, 84, 72, 54)
+
+# Frame counter sequences: cpu cycles after the $4017 write, and whether the step clocks quarter frame units
+# (envelopes, linear counter), half frame units (length counters, sweeps) and the frame interrupt.
+FrameStep = Tuple[int, bool, bool, bool]
+FOUR_STEP_SEQUENCE: Tuple[FrameStep, ...] = (
+    (7457, True, False, False),
+    (14913, True, True, False),
+    (22371, True, False, False),
+    (29829, True, True, True),
+)
+FOUR_STEP_PERIOD = 29830
+FIVE_STEP_SEQUENCE: Tuple[FrameStep, ...] = (
+    (7457, True, False, False),
+    (14913, True, True, False),
+    (22371, True, False, False),
+    (29829, False, False, False),
+    (37281, True, True, False),
+)
+FIVE_STEP_PERIOD = 37282
+
+# Mixer lookup tables, from the nonlinear approximation of the mixing circuit
+PULSE_MIX = np.array([0.0] + [95.52 / (8128.0 / n + 100) for n in range(1, 31)], dtype=np.float64)
+TND_MIX = np.array([0.0] + [163.67 / (24329.0 / n + 100) for n in range(1, 203)], dtype=np.float64)
+
+# Bump when the layout of tables cached on disk changes
+TABLES_VERSION = 1
+
+# Band-limited step synthesis, see BandLimitedBuffer
+KERNEL_TAPS = 16
+KERNEL_PHASES = 32
+
+# Frame interrupt flag, channel time, frame start, frame counter start and 5 step mode, step and interrupt inhibit
+_STATE = struct.Struct('<?qqq?B?')
+
+Transitions = Tuple[npt.NDArray[np.int64], npt.NDArray[np.int64]]
+NoiseCycles = Tuple[List[npt.NDArray[np.int64]], npt.NDArray[np.int64], npt.NDArray[np.int64]]
+
+
+@functools.lru_cache(maxsize=None)
+def step_kernel() -> npt.NDArray[np.float64]:
+    """Band-limited impulses, one row per fractional sample phase.
+
+    Each row is a Blackman windowed sinc, shifted by its phase. Rows are normalized to sum to 1, so integrating them
+    gives a band-limited step of exactly the right height.
+    """
+    phases = np.arange(KERNEL_PHASES)[:, np.newaxis] / KERNEL_PHASES
+    x = np.arange(KERNEL_TAPS)[np.newaxis, :] - (KERNEL_TAPS // 2 - 1) - phases
+    window = 0.42 + 0.5 * np.cos(2 * np.pi * x / KERNEL_TAPS) + 0.08 * np.cos(4 * np.pi * x / KERNEL_TAPS)
+    # Cut off a little below nyquist, to leave room for the window's transition band
+    kernel = np.sinc(x * 0.9) * np.where(np.abs(x) < KERNEL_TAPS / 2, window, 0)
+    normalized: npt.NDArray[np.float64] = kernel / kernel.sum(axis=1, keepdims=True)
+    return normalized
+
+
+@functools.lru_cache(maxsize=None)
+def noise_cycles(mode: bool) -> NoiseCycles:
+    """Decompose the noise channel's 15 bit LFSR into its cycles.
+
+    The LFSR is a bijection, so every state is on exactly one cycle. Returns the cycles (states in order), and for each
+    state the cycle it is on and its position in it. That turns clocking the LFSR n times into a vectorized lookup.
+
+    Walking all 32768 states takes tens of milliseconds, so the result is cached on disk.
+    """
+    path = os.path.join(cache.cache_dir('tables'), f'noise-{"short" if mode else "long"}-v{TABLES_VERSION}.npz')
+    cached = cache.read(path)
+    if cached is not None:
+        # A corrupt or stale file is rebuilt
+        with contextlib.suppress(OSError, ValueError, KeyError, zipfile.BadZipFile):
+            with np.load(io.BytesIO(cached)) as tables:
+                cycles = np.split(tables['states'], tables['starts'][1:])
+                return cycles, tables['cycle_of'], tables['position']
+
+    cycles, cycle_of, position = _build_noise_cycles(mode)
+    buffer = io.BytesIO()
+    starts = np.cumsum([0] + [len(cycle) for cycle in cycles[:-1]])
+    np.savez(buffer, states=np.concatenate(cycles), starts=starts, cycle_of=cycle_of, position=position)
+    cache.write(path, buffer.getvalue())
+    return cycles, cycle_of, position
+
+
+def _build_noise_cycles(mode: bool) -> NoiseCycles:
+    states = np.arange(1 << 15, dtype=np.int64)
+    feedback = (states ^ (states >> (6 if mode else 1))) & 1
+    next_states = (states >> 1) | (feedback << 14)
+
+    cycles: List[npt.NDArray[np.int64]] = []
+    cycle_of = np.full(1 << 15, -1, dtype=np.int64)
+    position = np.zeros(1 << 15, dtype=np.int64)
+    for start in range(1 << 15):
+        if cycle_of[start] >= 0:
+            continue
+
+        cycle = [start]
+        state = int(next_states[start])
+        while state != start:
+            cycle.append(state)
+            state = int(next_states[state])
+
+        cycle_states = np.array(cycle, dtype=np.int64)
+        cycle_of[cycle_states] = len(cycles)
+        position[cycle_states] = np.arange(len(cycle))
+        cycles.append(cycle_states)
+
+    return cycles, cycle_of, position
+
+
+class Stateful:
+    """Save states for the sound units, packing the attributes named in STATE_FIELDS with STATE."""
+
+    STATE: struct.Struct
+    STATE_FIELDS: Tuple[str, ...]
+
+    @property
+    def state_size(self) -> int:
+        return len(self.save_state())
+
+    def save_state(self) -> bytes:
+        return self.STATE.pack(*(getattr(self, name) for name in self.STATE_FIELDS))
+
+    def load_state(self, state: bytes) -> None:
+        for name, value in zip(self.STATE_FIELDS, self.STATE.unpack(state)):
+            setattr(self, name, value)
+
+
+class BandLimitedBuffer:
+    """Turns a channel's level transitions into band-limited samples.
+
+    Each transition adds a band-limited impulse, scaled by the change in level, at its fractional sample position.
+    Integrating (cumsum) gives band-limited steps, without the aliasing of naive point sampling. Impulse tails that run
+    past the end of a buffer are carried over into the next one.
+    """
+
+    def __init__(self, level: float = 0.0) -> None:
+        self.level = level
+        # Level once the impulse tails carried over have played out, i.e. after the last transition
+        self.target = level
+        self._carry = np.zeros(KERNEL_TAPS, dtype=np.float64)
+
+    def render(
+        self, positions: npt.NDArray[np.float64], deltas: npt.NDArray[np.float64], sample_count: int
+    ) -> npt.NDArray[np.float64]:
+        """Samples for a buffer, given the position (in samples) and size of each level change within it."""
+        impulses = np.zeros(sample_count + KERNEL_TAPS, dtype=np.float64)
+        impulses[:KERNEL_TAPS] += self._carry
+
+        if len(positions):
+            whole = np.floor(positions)
+            phases = ((positions - whole) * KERNEL_PHASES).astype(np.int64)
+            indices = whole.astype(np.int64)[:, np.newaxis] + np.arange(KERNEL_TAPS)
+            np.add.at(impulses, indices, deltas[:, np.newaxis] * step_kernel()[phases])
+
+        self.target += float(deltas.sum())
+        samples: npt.NDArray[np.float64] = self.level + np.cumsum(impulses[:sample_count])
+        if sample_count:
+            self.level = samples[-1]
+        self._carry = impulses[sample_count:]
+        return samples
+
+    def skip(self, level: float) -> None:
+        """Jump straight to a level, when samples are not needed."""
+        self.level = level
+        self.target = level
+        self._carry = np.zeros(KERNEL_TAPS, dtype=np.float64)
+
+
+class Channel(Stateful, abc.ABC):
+    """Common state of the sound channels.
+
+    Channels advance their timers in bulk between events with run(), collecting transitions of their output level. The
+    output level is also re-evaluated with update() whenever registers or frame counter units change it.
+    """
+
+    STATE = struct.Struct('<?B?Bq')
+    STATE_FIELDS: Tuple[str, ...] = ('enabled', 'length_counter', 'length_halt', 'level', 'next_step')
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.length_counter = 0
+        self.length_halt = False
+        self.level = 0
+        self.next_step = 0
+        self._times: List[npt.NDArray[np.int64]] = []
+        self._levels: List[npt.NDArray[np.int64]] = []
+
+    @abc.abstractmethod
+    def output(self) -> int:
+        """The level the channel outputs in its current state."""
+
+    @abc.abstractmethod
+    def run(self, start: int, end: int) -> None:
+        """Clock the timer from cycle start to end, recording the level transitions."""
+
+    @abc.abstractmethod
+    def write(self, register: int, value: int) -> None:
+        """Write one of the channel's 4 registers."""
+
+    def quarter_frame(self) -> None:
+        pass
+
+    def half_frame(self) -> None:
+        if self.length_counter and not self.length_halt:
+            self.length_counter -= 1
+
+    def set_enabled(self, enabled: bool) -> None:
+        self.enabled = enabled
+        if not enabled:
+            self.length_counter = 0
+
+    def load_length(self, value: int) -> None:
+        if self.enabled:
+            self.length_counter = LENGTH_TABLE[value >> 3]
+
+    def update(self, time: int) -> None:
+        level = self.output()
+        if level != self.level:
+            self._record(np.array([time], dtype=np.int64), np.array([level], dtype=np.int64))
+
+    def take_transitions(self) -> Transitions:
+        """Level transitions since the last call, as (cpu cycle, new level) arrays."""
+        if self._times:
+            times, levels = np.concatenate(self._times), np.concatenate(self._levels)
+        else:
+            times, levels = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+        self._times = []
+        self._levels = []
+        return times, levels
+
+    def _steps(self, end: int, period: int) -> npt.NDArray[np.int64]:
+        """Cpu cycles at which the timer clocks before end, advancing it past them."""
+        if self.next_step >= end:
+            return np.zeros(0, dtype=np.int64)
+
+        count = -(-(end - self.next_step) // period)
+        times = self.next_step + np.arange(count, dtype=np.int64) * period
+        self.next_step += count * period
+        return times
+
+    def _record(self, times: npt.NDArray[np.int64], levels: npt.NDArray[np.int64]) -> None:
+        if len(times):
+            self._times.append(times)
+            self._levels.append(levels)
+            self.level = int(levels[-1])
+
+
+class Envelope(Stateful):
+    """Volume envelope shared by the pulse and noise channels, clocked every quarter frame."""
+
+    STATE = struct.Struct('<???BBB')
+    STATE_FIELDS: Tuple[str, ...] = ('start', 'loop', 'constant_volume', 'period', 'divider', 'decay')
+
+    def __init__(self) -> None:
+        self.start = False
+        self.loop = False
+        self.constant_volume = False
+        self.period = 0
+        self.divider = 0
+        self.decay = 0
+
+    def write(self, value: int) -> None:
+        self.loop = bool(value & 0x20)
+        self.constant_volume = bool(value & 0x10)
+        self.period = value & 0x0F
+
+    @property
+    def volume(self) -> int:
+        return self.period if self.constant_volume else self.decay
+
+    def clock(self) -> None:
+        if self.start:
+            self.start = False
+            self.decay = 15
+            self.divider = self.period
+        elif self.divider:
+            self.divider -= 1
+        else:
+            self.divider = self.period
+            if self.decay:
+                self.decay -= 1
+            elif self.loop:
+                self.decay = 15
+
+
+class Pulse(Channel):
+    """Square wave with 4 duty cycles, a volume envelope and a frequency sweep.
+
+    - $4000/$4004: duty, length counter halt, constant volume, volume/envelope period
+    - $4001/$4005: sweep enable, period, negate, shift
+    - $4002/$4006: timer low byte
+    - $4003/$4007: length counter load, timer high bits
+    """
+
+    STATE = struct.Struct(Channel.STATE.format + 'BBH?B?BB?')
+    STATE_FIELDS = Channel.STATE_FIELDS + (
+        'duty',
+        'sequence_position',
+        'timer_period',
+        'sweep_enabled',
+        'sweep_period',
+        'sweep_negate',
+        'sweep_shift',
+        'sweep_divider',
+        'sweep_reload',
+    )
+
+    def __init__(self, ones_complement_sweep: bool) -> None:
+        super().__init__()
+        self.envelope = Envelope()
+        self.duty = 0
+        self.sequence_position = 0
+        self.timer_period = 0
+        self.sweep_enabled = False
+        self.sweep_period = 0
+        self.sweep_negate = False
+        self.sweep_shift = 0
+        self.sweep_divider = 0
+        self.sweep_reload = False
+        # Pulse 1 negates with ones' complement, so it sweeps down one further than pulse 2
+        self.ones_complement_sweep = ones_complement_sweep
+
+    def write(self, register: int, value: int) -> None:
+        if register == 0:
+            self.duty = value >> 6
+            self.length_halt = bool(value & 0x20)
+            self.envelope.write(value)
+        elif register == 1:
+            self.sweep_enabled = bool(value & 0x80)
+            self.sweep_period = value >> 4 & 0x07
+            self.sweep_negate = bool(value & 0x08)
+            self.sweep_shift = value & 0x07
+            self.sweep_reload = True
+        elif register == 2:
+            self.timer_period = self.timer_period & 0x700 | value
+        else:
+            self.timer_period = self.timer_period & 0xFF | (value & 0x07) << 8
+            self.load_length(value)
+            self.sequence_position = 0
+            self.envelope.start = True
+
+    def sweep_target(self) -> int:
+        change = self.timer_period >> self.sweep_shift
+        if self.sweep_negate:
+            return self.timer_period - change - (1 if self.ones_complement_sweep else 0)
+        return self.timer_period + change
+
+    def muted(self) -> bool:
+        return self.timer_period < 8 or self.sweep_target() > 0x7FF
+
+    def volume(self) -> int:
+        if not self.length_counter or self.muted():
+            return 0
+        return self.envelope.volume
+
+    def output(self) -> int:
+        return int(PULSE_DUTY_CYCLES[self.duty, self.sequence_position]) * self.volume()
+
+    def run(self, start: int, end: int) -> None:
+        # Timer is clocked every other cpu cycle
+        times = self._steps(end, (self.timer_period + 1) * 2)
+        positions = (self.sequence_position + 1 + np.arange(len(times))) % 8
+        if len(times):
+            self.sequence_position = int(positions[-1])
+
+        volume = self.volume()
+        if volume or self.level:
+            self._record(times, PULSE_DUTY_CYCLES[self.duty, positions] * volume)
+
+    def quarter_frame(self) -> None:
+        self.envelope.clock()
+
+    def half_frame(self) -> None:
+        super().half_frame()
+
+        if not self.sweep_divider and self.sweep_enabled and self.sweep_shift and not self.muted():
+            self.timer_period = self.sweep_target()
+        if not self.sweep_divider or self.sweep_reload:
+            self.sweep_divider = self.sweep_period
+            self.sweep_reload = False
+        else:
+            self.sweep_divider -= 1
+
+    def save_state(self) -> bytes:
+        return super().save_state() + self.envelope.save_state()
+
+    def load_state(self, state: bytes) -> None:
+        size = self.STATE.size
+        super().load_state(state[:size])
+        self.envelope.load_state(state[size:])
+
+
+class Triangle(Channel):
+    """Triangle wave, gated by a linear counter as well as the length counter. Has no volume control.
+
+    - $4008: length counter halt / linear counter control, linear counter reload value
+    - $400A: timer low byte
+    - $400B: length counter load, timer high bits
+    """
+
+    STATE = struct.Struct(Channel.STATE.format + 'BHBB?')
+    STATE_FIELDS = Channel.STATE_FIELDS + (
+        'sequence_position',
+        'timer_period',
+        'linear_counter',
+        'linear_reload_value',
+        'linear_reload',
+    )
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.sequence_position = 0
+        self.timer_period = 0
+        self.linear_counter = 0
+        self.linear_reload_value = 0
+        self.linear_reload = False
+        # Powers on at the top of the sequence, not at 0
+        self.level = self.output()
+
+    def write(self, register: int, value: int) -> None:
+        if register == 0:
+            self.length_halt = bool(value & 0x80)
+            self.linear_reload_value = value & 0x7F
+        elif register == 2:
+            self.timer_period = self.timer_period & 0x700 | value
+        elif register == 3:
+            self.timer_period = self.timer_period & 0xFF | (value & 0x07) << 8
+            self.load_length(value)
+            self.linear_reload = True
+
+    def output(self) -> int:
+        return int(TRIANGLE_SEQUENCE[self.sequence_position])
+
+    def run(self, start: int, end: int) -> None:
+        # The sequencer holds its position while silenced. Ultrasonic periods are held as well, games use them to
+        # silence the channel and emulating them only produces pops.
+        if not (self.length_counter and self.linear_counter) or self.timer_period < 2:
+            self.next_step = max(self.next_step, end)
+            return
+
+        times = self._steps(end, self.timer_period + 1)
+        positions = (self.sequence_position + 1 + np.arange(len(times))) % 32
+        if len(times):
+            self.sequence_position = int(positions[-1])
+        self._record(times, TRIANGLE_SEQUENCE[positions])
+
+    def quarter_frame(self) -> None:
+        if self.linear_reload:
+            self.linear_counter = self.linear_reload_value
+        elif self.linear_counter:
+            self.linear_counter -= 1
+
+        # Control flag (same bit as length counter halt) keeps reloading
+        if not self.length_halt:
+            self.linear_reload = False
+
+
+class Noise(Channel):
+    """Pseudo-random noise from a 15 bit LFSR, with a volume envelope.
+
+    - $400C: length counter halt, constant volume, volume/envelope period
+    - $400E: mode (short sequence), period index
+    - $400F: length counter load
+    """
+
+    STATE = struct.Struct(Channel.STATE.format + '?HH')
+    STATE_FIELDS = Channel.STATE_FIELDS + ('mode', 'period', 'shift_register')
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.envelope = Envelope()
+        self.mode = False
+        self.period = NOISE_PERIODS[0]
+        self.shift_register = 1
+
+    def write(self, register: int, value: int) -> None:
+        if register == 0:
+            self.length_halt = bool(value & 0x20)
+            self.envelope.write(value)
+        elif register == 2:
+            self.mode = bool(value & 0x80)
+            self.period = NOISE_PERIODS[value & 0x0F]
+        elif register == 3:
+            self.load_length(value)
+            self.envelope.start = True
+
+    def volume(self) -> int:
+        return self.envelope.volume if self.length_counter else 0
+
+    def output(self) -> int:
+        # Silenced while bit 0 of the shift register is set
+        return 0 if self.shift_register & 1 else self.volume()
+
+    def run(self, start: int, end: int) -> None:
+        times = self._steps(end, self.period)
+        if not len(times):
+            return
+
+        cycles, cycle_of, position = noise_cycles(self.mode)
+        cycle = cycles[cycle_of[self.shift_register]]
+        states = cycle[(position[self.shift_register] + 1 + np.arange(len(times))) % len(cycle)]
+        self.shift_register = int(states[-1])
+
+        volume = self.volume()
+        if volume or self.level:
+            self._record(times, (1 - (states & 1)) * volume)
+
+    def save_state(self) -> bytes:
+        return super().save_state() + self.envelope.save_state()
+
+    def load_state(self, state: bytes) -> None:
+        size = self.STATE.size
+        super().load_state(state[:size])
+        self.envelope.load_state(state[size:])
+
+
+class Dmc(Channel):
+    """Delta modulation channel, plays 1 bit delta encoded samples from cpu memory.
+
+    - $4010: irq enable, loop, rate index
+    - $4011: direct load of the output level
+    - $4012: sample address, $C000 + value * 64
+    - $4013: sample length, value * 16 + 1 bytes
+    """
+
+    STATE = struct.Struct(Channel.STATE.format + '???HBHHHHB?BB?')
+    STATE_FIELDS = Channel.STATE_FIELDS + (
+        'irq_enabled',
+        'irq',
+        'loop',
+        'period',
+        'output_level',
+        'sample_address',
+        'sample_length',
+        'current_address',
+        'bytes_remaining',
+        'sample_buffer',
+        'sample_buffer_full',
+        'shift_register',
+        'bits_remaining',
+        'silence',
+    )
+
+    def __init__(self, read_memory: Callable[[int], int]) -> None:
+        super().__init__()
+        self.read_memory = read_memory
+        self.irq_enabled = False
+        self.irq = False
+        self.loop = False
+        self.period = DMC_PERIODS[0]
+        self.output_level = 0
+        self.sample_address = 0xC000
+        self.sample_length = 1
+        self.current_address = 0xC000
+        self.bytes_remaining = 0
+        self.sample_buffer = 0
+        self.sample_buffer_full = False
+        self.shift_register = 0
+        self.bits_remaining = 8
+        self.silence = True
+
+    def write(self, register: int, value: int) -> None:
+        if register == 0:
+            self.irq_enabled = bool(value & 0x80)
+            self.loop = bool(value & 0x40)
+            self.period = DMC_PERIODS[value & 0x0F]
+            if not self.irq_enabled:
+                self.irq = False
+        elif register == 1:
+            self.output_level = value & 0x7F
+        elif register == 2:
+            self.sample_address = 0xC000 + value * 64
+        else:
+            self.sample_length = value * 16 + 1
+
+    def set_enabled(self, enabled: bool) -> None:
+        self.enabled = enabled
+        self.irq = False
+        if not enabled:
+            self.bytes_remaining = 0
+        elif not self.bytes_remaining:
+            self._restart()
+
+    @property
+    def active(self) -> bool:
+        return self.bytes_remaining > 0
+
+    def output(self) -> int:
+        return self.output_level
+
+    def half_frame(self) -> None:
+        """No length counter, samples have their own length."""
+
+    def run(self, start: int, end: int) -> None:
+        times = self._steps(end, self.period)
+        if not len(times):
+            return
+
+        if self.silence and not self.sample_buffer_full and not self.bytes_remaining:
+            # Nothing to play, only the bit counter moves
+            self.bits_remaining = (self.bits_remaining - len(times) - 1) % 8 + 1
+            return
+
+        # Deltas depend on clamping of the previous level, so this is sequential. It's bounded by the fastest rate
+        # though, a few hundred steps per frame.
+        levels = np.empty(len(times), dtype=np.int64)
+        for i in range(len(times)):
+            self._clock()
+            levels[i] = self.output_level
+        self._record(times, levels)
+
+    def _clock(self) -> None:
+        if not self.silence:
+            if self.shift_register & 1:
+                if self.output_level <= 125:
+                    self.output_level += 2
+            elif self.output_level >= 2:
+                self.output_level -= 2
+        self.shift_register >>= 1
+
+        self.bits_remaining -= 1
+        if not self.bits_remaining:
+            self.bits_remaining = 8
+            self.silence = not self.sample_buffer_full
+            if self.sample_buffer_full:
+                self.shift_register = self.sample_buffer
+                self.sample_buffer_full = False
+                self._fetch()
+
+    def _fetch(self) -> None:
+        if not self.bytes_remaining:
+            return
+
+        self.sample_buffer = self.read_memory(self.current_address)
+        self.sample_buffer_full = True
+        # Sample addresses wrap around to $8000
+        self.current_address = self.current_address + 1 if self.current_address < 0xFFFF else 0x8000
+        self.bytes_remaining -= 1
+        if not self.bytes_remaining:
+            if self.loop:
+                self._restart()
+            elif self.irq_enabled:
+                self.irq = True
+
+    def _restart(self) -> None:
+        self.current_address = self.sample_address
+        self.bytes_remaining = self.sample_length
+        if not self.sample_buffer_full:
+            self._fetch()
+
+
+class Apu:
+    """Audio processing unit: 2 pulse channels, triangle, noise, DMC and the frame counter.
+
+    Register writes are only queued with their cpu cycle, which is all the run loop pays for. Channel state is brought
+    up to date lazily, at frame boundaries or when $4015 is read: channels advance their timers in bulk between
+    consecutive events (writes, frame counter steps) with numpy, producing level transitions at exact cpu cycles. At
+    the end of a frame, transitions are turned into band-limited samples and mixed through the nonlinear mixer lookup
+    tables, again with numpy.
+    """
+
+    def __init__(self, read_memory: Callable[[int], int], sample_rate: int = DEFAULT_SAMPLE_RATE) -> None:
+        self.sample_rate = sample_rate
+        self.pulse_1 = Pulse(ones_complement_sweep=True)
+        self.pulse_2 = Pulse(ones_complement_sweep=False)
+        self.triangle = Triangle()
+        self.noise = Noise()
+        self.dmc = Dmc(read_memory)
+        self.channels: Tuple[Channel, ...] = (self.pulse_1, self.pulse_2, self.triangle, self.noise, self.dmc)
+        self.frame_irq = False
+
+        self._buffers = [BandLimitedBuffer(channel.level) for channel in self.channels]
+        self._writes: List[Tuple[int, int, int]] = []
+        # Cpu cycle up to which channels have been run, and where the current output buffer starts
+        self._time = 0
+        self._frame_start = 0
+
+        self._frame_sequence = FOUR_STEP_SEQUENCE
+        self._frame_period = FOUR_STEP_PERIOD
+        self._frame_counter_start = 0
+        self._frame_step = 0
+        self._frame_irq_inhibit = False
+
+    def write(self, address: int, value: int, cycle: int) -> None:
+        """Queue a register write, it takes effect when channels are run up to cycle."""
+        self._writes.append((cycle, address, value))
+
+    def read_status(self, cycle: int) -> int:
+        """$4015: length counters still running, DMC active and interrupt flags. Clears the frame interrupt flag."""
+        self._run_until(cycle)
+
+        status = 0
+        for bit, channel in enumerate(self.channels[:4]):
+            if channel.length_counter:
+                status |= 1 << bit
+        if self.dmc.active:
+            status |= 0x10
+        if self.frame_irq:
+            status |= 0x40
+        if self.dmc.irq:
+            status |= 0x80
+
+        self.frame_irq = False
+        return status
+
+    def save_state(self) -> bytes:
+        """Snapshot of all sound units. Only taken between frames, writes still queued are not included."""
+        header = _STATE.pack(
+            self.frame_irq,
+            self._time,
+            self._frame_start,
+            self._frame_counter_start,
+            self._frame_sequence is FIVE_STEP_SEQUENCE,
+            self._frame_step,
+            self._frame_irq_inhibit,
+        )
+        return header + b''.join(channel.save_state() for channel in self.channels)
+
+    def load_state(self, state: bytes) -> None:
+        (
+            self.frame_irq,
+            self._time,
+            self._frame_start,
+            self._frame_counter_start,
+            five_step,
+            self._frame_step,
+            self._frame_irq_inhibit,
+        ) = _STATE.unpack_from(state)
+        self._frame_sequence = FIVE_STEP_SEQUENCE if five_step else FOUR_STEP_SEQUENCE
+        self._frame_period = FIVE_STEP_PERIOD if five_step else FOUR_STEP_PERIOD
+        self._writes = []
+
+        offset = _STATE.size
+        for channel, buffer in zip(self.channels, self._buffers):
+            end = offset + channel.state_size
+            channel.load_state(state[offset:end])
+            offset = end
+            channel.take_transitions()
+            buffer.skip(channel.level)
+
+    @property
+    def state_size(self) -> int:
+        return _STATE.size + sum(channel.state_size for channel in self.channels)
+
+    def end_frame(self, cycle: int, synthesize: bool = True) -> npt.NDArray[np.float32]:
+        """Run channels up to cycle, and return the samples since the last frame, between 0.0 and 1.0.
+
+        With synthesize off, channels are kept up to date but no samples are produced, for fast-forwarding.
+        """
+        self._run_until(cycle)
+
+        first_sample = self._sample_index(self._frame_start)
+        sample_count = self._sample_index(cycle) - first_sample
+        levels = []
+        for channel, buffer in zip(self.channels, self._buffers):
+            times, channel_levels = channel.take_transitions()
+            if not synthesize:
+                buffer.skip(channel.level)
+                continue
+
+            # Integer level deltas, at fractional sample positions. From the level after the previous transition, which
+            # the buffer may not have reached yet if it was near the end of the last frame.
+            deltas = np.diff(channel_levels, prepend=int(round(buffer.target))).astype(np.float64)
+            positions = (times * (self.sample_rate / CPU_CLOCK_RATE) - first_sample).astype(np.float64)
+            levels.append(buffer.render(positions, deltas, sample_count))
+
+        self._frame_start = cycle
+        if not synthesize:
+            return np.zeros(0, dtype=np.float32)
+
+        pulse_1, pulse_2, triangle, noise, dmc = levels
+        pulse = np.interp(pulse_1 + pulse_2, np.arange(len(PULSE_MIX)), PULSE_MIX)
+        tnd = np.interp(3 * triangle + 2 * noise + dmc, np.arange(len(TND_MIX)), TND_MIX)
+        samples: npt.NDArray[np.float32] = (pulse + tnd).astype(np.float32)
+        return samples
+
+    def _sample_index(self, cycle: int) -> int:
+        return cycle * self.sample_rate // CPU_CLOCK_RATE
+
+    def _run_until(self, cycle: int) -> None:
+        writes = self._writes
+        write_index = 0
+        while True:
+            frame_clock = self._frame_counter_start + self._frame_sequence[self._frame_step][0]
+            write_cycle = writes[write_index][0] if write_index < len(writes) else cycle
+            next_event = min(frame_clock, write_cycle, cycle)
+
+            for channel in self.channels:
+                channel.run(self._time, next_event)
+            self._time = next_event
+
+            if write_index < len(writes) and write_cycle == next_event:
+                _, address, value = writes[write_index]
+                write_index += 1
+                self._apply_write(address, value)
+            elif frame_clock == next_event:
+                self._clock_frame_counter()
+            else:
+                break
+
+            for channel in self.channels:
+                channel.update(next_event)
+
+        del writes[:write_index]
+
+    def _apply_write(self, address: int, value: int) -> None:
+        if address == STATUS:
+            for bit, channel in enumerate(self.channels):
+                channel.set_enabled(bool(value & 1 << bit))
+        elif address == FRAME_COUNTER:
+            five_step = bool(value & 0x80)
+            self._frame_sequence = FIVE_STEP_SEQUENCE if five_step else FOUR_STEP_SEQUENCE
+            self._frame_period = FIVE_STEP_PERIOD if five_step else FOUR_STEP_PERIOD
+            self._frame_counter_start = self._time
+            self._frame_step = 0
+            self._frame_irq_inhibit = bool(value & 0x40)
+            if self._frame_irq_inhibit:
+                self.frame_irq = False
+            if five_step:
+                # Switching to the 5 step sequence immediately clocks all units
+                self._clock_units(quarter=True, half=True)
+        elif APU_REGISTERS_START <= address <= APU_REGISTERS_END:
+            offset = address - APU_REGISTERS_START
+            self.channels[offset // 4].write(offset % 4, value)
+
+    def _clock_frame_counter(self) -> None:
+        _, quarter, half, irq = self._frame_sequence[self._frame_step]
+        self._clock_units(quarter, half)
+        if irq and not self._frame_irq_inhibit:
+            self.frame_irq = True
+
+        self._frame_step += 1
+        if self._frame_step == len(self._frame_sequence):
+            self._frame_step = 0
+            self._frame_counter_start += self._frame_period
+
+    def _clock_units(self, quarter: bool, half: bool) -> None:
+        for channel in self.channels:
+            if quarter:
+                channel.quarter_frame()
+            if half:
+                channel.half_frame()
@@ -0,0 +1,56 @@
+from typing import Callable
+from typing import List
+from typing import Optional
+from typing import Union
+
+PAGE_SIZE = 0x100
+PAGE_COUNT = 0x100
+
+ReadHandler = Callable[[int], int]
+WriteHandler = Callable[[int, int], None]
+# Whether reading an address twice has the same effect as reading it once
+IdempotencyCheck = Callable[[int], bool]
+
+
+class Bus:
+    """Page table for the cpu's 16 bit address bus.
+
+    The 64 KiB address space is split into 256 pages of 256 bytes. Pages without a handler are plain memory, backed by
+    Cpu.memory. Memory mapped peripherals (controllers, PPU registers, etc.) install handlers for the pages they live
+    in, so plain memory accesses only pay for a list lookup.
+
+    Reading some registers has side effects (e.g. controllers shift to the next button). Pages are flagged as
+    idempotent when reading them twice has the same effect as reading them once, which plain memory trivially is. Pages
+    where that depends on the register get a check of the address instead.
+    """
+
+    def __init__(self) -> None:
+        self.readers: List[Optional[ReadHandler]] = [None] * PAGE_COUNT
+        self.writers: List[Optional[WriteHandler]] = [None] * PAGE_COUNT
+        self.idempotent: List[bool] = [True] * PAGE_COUNT
+        self.idempotency_checks: List[Optional[IdempotencyCheck]] = [None] * PAGE_COUNT
+
+    def map(
+        self,
+        start: int,
+        end: int,
+        reader: Optional[ReadHandler] = None,
+        writer: Optional[WriteHandler] = None,
+        idempotent: Union[bool, IdempotencyCheck] = False,
+    ) -> None:
+        """Install handlers for all pages covering addresses start to end (inclusive).
+
+        Handlers receive the full address. Passing None maps the pages back to plain memory. idempotent is either a flag
+        for the whole range, or a check of the address.
+        """
+        check = idempotent if callable(idempotent) and reader is not None else None
+        for page in range(start // PAGE_SIZE, end // PAGE_SIZE + 1):
+            self.readers[page] = reader
+            self.writers[page] = writer
+            self.idempotent[page] = idempotent is True or reader is None
+            self.idempotency_checks[page] = check
+
+    def is_idempotent(self, address: int) -> bool:
+        page = address >> 8
+        check = self.idempotency_checks[page]
+        return self.idempotent[page] if check is None else check(address)
@@ -0,0 +1,37 @@
+import contextlib
+import os
+import tempfile
+from typing import Optional
+
+
+def cache_dir(name: str) -> str:
+    """Directory for one kind of cached data, under $XDG_CACHE_HOME/pynes."""
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'pynes', name)
+
+
+def read(path: str) -> Optional[bytes]:
+    """Contents of a cache entry, None if there is none."""
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def write(path: str, data: bytes) -> None:
+    """Store a cache entry. Failing to write is not an error, the data is just not cached."""
+    directory = os.path.dirname(path)
+    with contextlib.suppress(OSError):
+        os.makedirs(directory, exist_ok=True)
+        # Write to a temporary file first, so concurrent processes never see a partial entry
+        cache_file = tempfile.NamedTemporaryFile('wb', dir=directory, suffix='.tmp', delete=False)
+        try:
+            with cache_file:
+                cache_file.write(data)
+            os.replace(cache_file.name, path)
+        except OSError:
+            # Don't leave the temporary file behind
+            with contextlib.suppress(OSError):
+                os.unlink(cache_file.name)
+            raise
@@ -0,0 +1,209 @@
+import contextlib
+import enum
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+from typing import Tuple
+
+from pynes import cache
+from pynes.nes import Nes
+from pynes.rom import Rom
+
+# Bump when the way results are produced changes, so cached ones are not reused
+CONFORMANCE_VERSION = 1
+
+ROM_EXTENSION = '.nes'
+# One minute of emulated time, longer than any of blargg's tests take
+DEFAULT_FRAME_LIMIT = 60 * 60
+
+# blargg's result protocol: a status byte at $6000, a signature after it, then a zero terminated message
+RESULT_STATUS = 0x6000
+RESULT_SIGNATURE = 0x6001
+RESULT_MESSAGE = 0x6004
+SIGNATURE = b'\xde\xb0\x61'
+SIGNATURE_END = RESULT_SIGNATURE + len(SIGNATURE)
+STATUS_RUNNING = 0x80
+STATUS_RESET_REQUIRED = 0x81
+# The rom asks for reset to be pressed after at least 100 ms
+RESET_DELAY_FRAMES = 6
+
+# Older roms only print their result, in ascii, on the first name table
+SCREEN_COLUMNS = 32
+SCREEN_ROWS = 30
+
+
+class Outcome(enum.Enum):
+    passed = enum.auto()
+    failed = enum.auto()
+    # Still running when the frame limit was reached
+    timeout = enum.auto()
+    # The emulator can't run the rom, e.g. an unsupported mapper or opcode
+    error = enum.auto()
+
+
+class Result(NamedTuple):
+    rom: str
+    outcome: Outcome
+    message: str
+    frames: int
+
+    def to_json(self) -> bytes:
+        return json.dumps([self.rom, self.outcome.name, self.message, self.frames]).encode()
+
+    @classmethod
+    def from_json(cls, data: bytes) -> 'Result':
+        rom, outcome, message, frames = json.loads(data)
+        return cls(rom, Outcome[outcome], message, frames)
+
+
+def find_roms(directory: str) -> List[str]:
+    """Paths of the test roms under directory, relative to it."""
+    roms = []
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if name.lower().endswith(ROM_EXTENSION):
+                roms.append(os.path.relpath(os.path.join(root, name), directory))
+    return sorted(roms)
+
+
+def code_fingerprint() -> str:
+    """Digest of the emulator's source, results are only reused while it is unchanged."""
+    package = os.path.dirname(os.path.abspath(__file__))
+    digest = hashlib.sha1()
+    for root, directories, files in os.walk(package):
+        directories[:] = sorted(directory for directory in directories if directory != '__pycache__')
+        for name in sorted(files):
+            if name.endswith('.py'):
+                path = os.path.join(root, name)
+                digest.update(os.path.relpath(path, package).encode())
+                with open(path, 'rb') as f:
+                    digest.update(f.read())
+    return digest.hexdigest()
+
+
+def screen_text(nes: Nes) -> Iterator[str]:
+    """Rows of the first name table, read as ascii."""
+    tiles = bytes(nes.ppu.name_tables[: SCREEN_COLUMNS * SCREEN_ROWS])
+    for start in range(0, len(tiles), SCREEN_COLUMNS):
+        end = start + SCREEN_COLUMNS
+        yield ''.join(chr(tile) if 0x20 <= tile < 0x7F else ' ' for tile in tiles[start:end]).strip()
+
+
+def read_result(nes: Nes) -> Optional[Tuple[Outcome, str]]:
+    """The outcome the rom reports, None while it is still running or asks for a reset.
+
+    Roms with the signature at $6001 report through memory, status 0 is a pass and anything below $80 is the number of
+    the failed test. Otherwise, the screen is searched for "Passed" or "Failed".
+    """
+    memory = nes.cpu.memory
+    if memory[RESULT_SIGNATURE:SIGNATURE_END] == SIGNATURE:
+        status = memory[RESULT_STATUS]
+        if status >= STATUS_RUNNING:
+            return None
+        # Zero terminated, or running to the end of memory
+        message = bytes(memory[RESULT_MESSAGE:]).split(b'\x00', 1)[0].decode('ascii', 'replace').strip()
+        return (Outcome.passed if status == 0 else Outcome.failed), message
+
+    for row in screen_text(nes):
+        if row.startswith('Passed'):
+            return Outcome.passed, row
+        if row.startswith('Failed'):
+            return Outcome.failed, row
+    return None
+
+
+def run_nes(nes: Nes, frame_limit: int = DEFAULT_FRAME_LIMIT) -> Tuple[Outcome, str, int]:
+    """Run until the rom reports its result or the frame limit. Returns the outcome, message and frames run."""
+    memory = nes.cpu.memory
+    reset_at: Optional[int] = None
+    while nes.frame_count < frame_limit:
+        nes.run_frame()
+        result = read_result(nes)
+        if result is not None:
+            return result[0], result[1], nes.frame_count
+
+        reset_required = (
+            memory[RESULT_STATUS] == STATUS_RESET_REQUIRED and memory[RESULT_SIGNATURE:SIGNATURE_END] == SIGNATURE
+        )
+        if not reset_required:
+            reset_at = None
+        elif reset_at is None:
+            reset_at = nes.frame_count + RESET_DELAY_FRAMES
+        elif nes.frame_count >= reset_at:
+            nes.reset()
+            reset_at = None
+    return Outcome.timeout, '', nes.frame_count
+
+
+def run_rom(directory: str, rom: str, frame_limit: int = DEFAULT_FRAME_LIMIT) -> Result:
+    """Run one test rom, rom being its path relative to directory."""
+    try:
+        nes = Nes(Rom.load(os.path.join(directory, rom)))
+        # Nothing looks at the frames, only at memory and name tables
+        nes.render = False
+        outcome, message, frames = run_nes(nes, frame_limit)
+    except Exception as e:  # pylint: disable=broad-except
+        # Including emulator bugs (e.g. the program counter running past $FFFF), so one rom can't take the suite down
+        return Result(rom, Outcome.error, f'{type(e).__name__}: {e}', 0)
+    return Result(rom, outcome, message, frames)
+
+
+def _cache_path(directory: str, rom: str, fingerprint: str, frame_limit: int) -> Optional[str]:
+    try:
+        with open(os.path.join(directory, rom), 'rb') as f:
+            rom_digest = hashlib.sha1(f.read()).hexdigest()
+    except OSError:
+        return None
+    key = hashlib.sha1(f'{CONFORMANCE_VERSION}:{fingerprint}:{frame_limit}'.encode()).hexdigest()[:12]
+    return os.path.join(cache.cache_dir('conformance'), f'{rom_digest}_{key}.json')
+
+
+def run_suite(
+    directory: str, workers: Optional[int] = None, frame_limit: int = DEFAULT_FRAME_LIMIT, use_cache: bool = True
+) -> List[Result]:
+    """Run every test rom under directory, sharded across worker processes (one per cpu by default).
+
+    Results are cached by rom contents, emulator source and frame limit, so re-runs only run the roms whose result
+    could have changed. Results come back in rom order.
+    """
+    fingerprint = code_fingerprint()
+    results: Dict[str, Result] = {}
+    pending: Dict[str, Optional[str]] = {}
+    for rom in find_roms(directory):
+        path = _cache_path(directory, rom, fingerprint, frame_limit)
+        cached = cache.read(path) if use_cache and path is not None else None
+        # Missing, corrupt or stale entries alike mean running the rom, which overwrites the entry
+        with contextlib.suppress(ValueError, KeyError, TypeError):
+            results[rom] = Result.from_json(cached or b'')._replace(rom=rom)
+            continue
+        pending[rom] = path
+
+    if pending:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            roms = list(pending)
+            for result in executor.map(run_rom, [directory] * len(roms), roms, [frame_limit] * len(roms)):
+                results[result.rom] = result
+                path = pending[result.rom]
+                if path is not None:
+                    cache.write(path, result.to_json())
+
+    return [results[rom] for rom in sorted(results)]
+
+
+def report(results: List[Result]) -> List[str]:
+    """A line per rom, then a tally of the outcomes."""
+    lines = [
+        f'{result.outcome.name.upper():8} {result.rom}' + (f': {result.message}' if result.message else '')
+        for result in results
+    ]
+    tally = {outcome: 0 for outcome in Outcome}
+    for result in results:
+        tally[result.outcome] += 1
+    lines.append(', '.join(f'{count} {outcome.name}' for outcome, count in tally.items()))
+    return lines
@@ -0,0 +1,50 @@
+import enum
+
+
+class Button(enum.IntFlag):
+    """Standard controller buttons, in the order they are shifted out."""
+
+    a = 1 << 0
+    b = 1 << 1
+    select = 1 << 2
+    start = 1 << 3
+    up = 1 << 4
+    down = 1 << 5
+    left = 1 << 6
+    right = 1 << 7
+
+
+class Controller:
+    """Standard controller, read serially through $4016 (player 1) or $4017 (player 2).
+
+    - Writing 1 then 0 to $4016 (strobe) latches the state of all buttons into a shift register
+    - Each read returns the next button in the low bit, in Button order
+    - After all 8 buttons are read, the official controller returns 1
+    """
+
+    def __init__(self) -> None:
+        self.buttons: int = 0
+        self._strobe = False
+        self._shift_register = 0
+
+    def write(self, value: int) -> None:
+        self._strobe = bool(value & 0x01)
+        if self._strobe:
+            self._shift_register = self.buttons
+
+    def read(self) -> int:
+        if self._strobe:
+            # While strobe is held, the shift register is continuously reloaded and only A is ever read
+            return self.buttons & 0x01
+
+        value = self._shift_register & 0x01
+        # Shift in 1s, that's what is read after the 8th button
+        self._shift_register = self._shift_register >> 1 | 0x80
+        return value
+
+    def save_state(self) -> bytes:
+        return bytes([self.buttons, self._strobe, self._shift_register])
+
+    def load_state(self, state: bytes) -> None:
+        self.buttons, strobe, self._shift_register = state
+        self._strobe = bool(strobe)
@@ -1,15 +1,33 @@
 import enum
+import struct
 from dataclasses import dataclass
+from typing import Callable
+from typing import Dict
+from typing import Optional
+from typing import TYPE_CHECKING
+from typing import Union
 
 from pynes.addressing_mode import AddressingMode
-from pynes.instructions import add
-from pynes.instructions import and_
-from pynes.instructions import asl
-from pynes.instructions import branch
-from pynes.instructions import cmp
+from pynes.bus import Bus
+from pynes.idle import IdleLoopDetector
+
+if TYPE_CHECKING:  # pragma: no cover
+    from pynes.opcodes import Opcode
 
 MAX_UNSIGNED_VALUE = 2 ** 8
 
+# Program counter, stack pointer, accumulator, x, y, status, cycles
+_REGISTERS = struct.Struct('<HHBBBBQ')
+
+
+class Variant(enum.Enum):
+    """6502 cores the cpu can be. They differ in decimal mode and in a handful of opcodes."""
+
+    # The NES's cpu. Decimal mode is disconnected, the decimal flag can be set but ADC ignores it.
+    ricoh_2a03 = enum.auto()
+    nmos_6502 = enum.auto()
+    wdc_65c02 = enum.auto()
+
 
 class StatusFlag(enum.Enum):
     carry = enum.auto()
@@ -31,6 +49,31 @@ class StatusRegister:
     overflow: bool = False
     negative: bool = False
 
+    def pack(self) -> int:
+        """Status register as a byte, in hardware bit order: NV-BDIZC. The unused bit 5 always reads as set."""
+        return (
+            self.carry
+            | self.zero << 1
+            | self.interrupt_disable << 2
+            | self.decimal << 3
+            | self.break_ << 4
+            | 1 << 5
+            | self.overflow << 6
+            | self.negative << 7
+        )
+
+    @classmethod
+    def unpack(cls, value: int) -> 'StatusRegister':
+        return cls(
+            carry=bool(value & 1 << 0),
+            zero=bool(value & 1 << 1),
+            interrupt_disable=bool(value & 1 << 2),
+            decimal=bool(value & 1 << 3),
+            break_=bool(value & 1 << 4),
+            overflow=bool(value & 1 << 6),
+            negative=bool(value & 1 << 7),
+        )
+
 
 class Cpu:
     """6502 cpu
@@ -43,7 +86,8 @@ class Cpu:
     - x, y and accumulator register. 8-bit registers that have semantic meaning and use
     """
 
-    def __init__(self) -> None:
+    def __init__(self, variant: Variant = Variant.ricoh_2a03) -> None:
+        self.variant = variant
         self.program_counter: int = 0  # 16 bit
         self.stack_pointer: int = 0  # 16 bit
         self.stack: int = 0  # 256 byte
@@ -51,10 +95,31 @@ class Cpu:
         self.register_x: int = 0  # 8 bit
         self.register_y: int = 0  # 8 bit
         self.status = StatusRegister()
-        self.memory = bytearray()
+        # A bytearray, or a view onto memory shared with other processes (see env.VectorEnv)
+        self.memory: Union[bytearray, memoryview] = bytearray()
+        self.cycles: int = 0
+        # Cycle that the current run() stops at, i.e. the next scheduled event
+        self.run_until: int = 0
+        self.bus = Bus()
+        self.idle_loop_detector: Optional[IdleLoopDetector] = None
+        # Recompiled code by start address, see pynes.recompiler. Anything else is interpreted.
+        self.blocks: Optional[Dict[int, Callable[['Cpu', int], None]]] = None
+
+        # Deferred import, the instruction modules import StatusFlag from this module
+        from pynes.opcodes import opcode_table  # pylint: disable=import-outside-toplevel
+
+        self.opcodes: Dict[int, 'Opcode'] = opcode_table(variant)
 
     def decode_instruction(self, opcode: int) -> None:  # pragma: no cover
         """This function is currently a stub, will eventually be the only way to reference instructions."""
+        # Importing the instruction modules is deferred until they're used, to keep importing the cpu cheap
+        # pylint: disable=import-outside-toplevel
+        from pynes.instructions import add
+        from pynes.instructions import and_
+        from pynes.instructions import asl
+        from pynes.instructions import branch
+        from pynes.instructions import cmp
+
         if opcode == 'PLACEHOLDER for add':
             addressing_mode = AddressingMode.immediate
             data = 0x0
@@ -74,5 +139,97 @@ class Cpu:
             data = 0x0
             cmp.cmp(self, data)
 
+    def step(self) -> int:
+        """Fetch, decode and execute the instruction at the program counter.
+
+        Returns the number of cycles the instruction took.
+        """
+        address = self.program_counter
+        opcode = self.opcodes.get(self.read_from_memory(address))
+        if opcode is None:
+            raise NotImplementedError(f'Unsupported opcode {self.read_from_memory(address):#04x} at {address:#06x}')
+
+        # Operands are little endian, the low byte comes first
+        if opcode.size == 2:
+            operand = self.read_from_memory(address + 1)
+        elif opcode.size == 3:
+            operand = self.read_from_memory(address + 1) | self.read_from_memory(address + 2) << 8
+        else:
+            operand = 0
+
+        # Program counter points to the next instruction while executing, relative branches are based off of it
+        self.program_counter = address + opcode.size
+        # Instructions may add cycles of their own, e.g. the 65C02's decimal add
+        start = self.cycles
+        opcode.execute(self, operand)
+
+        self.cycles += opcode.cycles
+        return self.cycles - start
+
+    def run(self, until: int) -> None:
+        """Execute instructions until the cycle counter reaches until.
+
+        The last instruction may overshoot, the extra cycles are carried over to the next run.
+        """
+        self.run_until = until
+        blocks = self.blocks
+        if blocks is None:
+            while self.cycles < until:
+                self.step()
+            return
+
+        while self.cycles < until:
+            block = blocks.get(self.program_counter)
+            if block is None:
+                self.step()
+            else:
+                block(self, until)
+
+    def save_state(self) -> bytes:
+        """Snapshot of registers and memory. Peripherals are not included, they save their own state."""
+        registers = _REGISTERS.pack(
+            self.program_counter,
+            self.stack_pointer,
+            self.accumulator,
+            self.register_x,
+            self.register_y,
+            self.status.pack(),
+            self.cycles,
+        )
+        return registers + self.memory
+
+    def load_state(self, state: bytes) -> None:
+        """Restore a snapshot from save_state.
+
+        Memory is overwritten in place, so views onto it stay valid. The snapshot must come from a cpu with the same
+        memory size.
+        """
+        registers_size = _REGISTERS.size
+        memory = memoryview(state)[registers_size:]
+        if len(memory) != len(self.memory):
+            raise ValueError(f'State has {len(memory)} bytes of memory, expected {len(self.memory)}')
+
+        (
+            self.program_counter,
+            self.stack_pointer,
+            self.accumulator,
+            self.register_x,
+            self.register_y,
+            status,
+            self.cycles,
+        ) = _REGISTERS.unpack_from(state)
+        self.status = StatusRegister.unpack(status)
+        self.memory[:] = memory
+
     def read_from_memory(self, address: int) -> int:
-        return self.memory[address]
+        reader = self.bus.readers[address >> 8]
+        if reader is None:
+            return self.memory[address]
+        return reader(address)
+
+    def write_to_memory(self, address: int, value: int) -> None:
+        writer = self.bus.writers[address >> 8]
+        if writer is None:
+            self.memory[address] = value
+        else:
+            writer(address, value)
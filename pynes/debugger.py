@@ -0,0 +1,180 @@
+import enum
+from typing import Dict
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+from typing import Set
+from typing import TYPE_CHECKING
+from typing import Tuple
+
+from pynes.bus import PAGE_SIZE
+from pynes.bus import ReadHandler
+from pynes.bus import WriteHandler
+from pynes.disassembler import block_exit
+from pynes.disassembler import decode
+
+if TYPE_CHECKING:  # pragma: no cover
+    from pynes.cpu import Cpu
+
+# Give up extending a block past this many instructions, e.g. when running into a long stretch of code without branches
+MAX_BLOCK_SIZE = 64
+
+
+class Access(enum.Enum):
+    breakpoint = enum.auto()
+    read = enum.auto()
+    write = enum.auto()
+
+
+class Hit(NamedTuple):
+    """Why execution stopped. value is the value read or written, None for breakpoints."""
+
+    access: Access
+    address: int
+    value: Optional[int]
+
+
+class Debugger:
+    """Breakpoints on the program counter, and watchpoints on memory reads and writes.
+
+    Watchpoints replace the bus handlers of only the pages they are on, with wrappers around the original handlers.
+    Breakpoints are checked at the start of each basic block, and only blocks containing one are stepped through an
+    instruction at a time. With nothing set, run() is just Cpu.run, so there is no overhead.
+
+    A watchpoint stops execution after the instruction that triggered it. Instruction fetches count as reads.
+    """
+
+    def __init__(self, cpu: 'Cpu') -> None:
+        self.cpu = cpu
+        self.breakpoints: Set[int] = set()
+        self._read_watches: Dict[int, Set[int]] = {}
+        self._write_watches: Dict[int, Set[int]] = {}
+        # Original handlers of patched pages
+        self._original_handlers: Dict[int, Tuple[Optional[ReadHandler], Optional[WriteHandler]]] = {}
+        # Addresses of the instructions in the block starting at each address
+        self._blocks: Dict[int, List[int]] = {}
+        self._hit: Optional[Hit] = None
+
+    @property
+    def active(self) -> bool:
+        return bool(self.breakpoints or self._original_handlers)
+
+    def add_breakpoint(self, address: int) -> None:
+        self.breakpoints.add(address)
+
+    def remove_breakpoint(self, address: int) -> None:
+        self.breakpoints.discard(address)
+
+    def watch(self, address: int, read: bool = True, write: bool = True) -> None:
+        page = address // PAGE_SIZE
+        if read:
+            self._read_watches.setdefault(page, set()).add(address)
+        if write:
+            self._write_watches.setdefault(page, set()).add(address)
+        self._patch(page)
+
+    def unwatch(self, address: int) -> None:
+        page = address // PAGE_SIZE
+        for watches in (self._read_watches, self._write_watches):
+            addresses = watches.get(page, set())
+            addresses.discard(address)
+            if not addresses:
+                watches.pop(page, None)
+
+        if page in self._original_handlers and page not in self._read_watches and page not in self._write_watches:
+            self._unpatch(page)
+
+    def clear(self) -> None:
+        """Remove all breakpoints and watchpoints, restoring the bus."""
+        self.breakpoints.clear()
+        self._read_watches.clear()
+        self._write_watches.clear()
+        for page in list(self._original_handlers):
+            self._unpatch(page)
+
+    def run(self, until: int) -> Optional[Hit]:
+        """Run the cpu until cycle until, or until a breakpoint or watchpoint is hit."""
+        cpu = self.cpu
+        if not self.active:
+            cpu.run(until)
+            return None
+
+        # Skipping the iterations of wait loops would skip the breakpoints and watchpoints in them too
+        idle_loop_detector = cpu.idle_loop_detector
+        cpu.idle_loop_detector = None
+        try:
+            return self._step(until)
+        finally:
+            cpu.idle_loop_detector = idle_loop_detector
+
+    def _step(self, until: int) -> Optional[Hit]:
+        cpu = self.cpu
+        cpu.run_until = until
+        self._hit = None
+        # Resuming from a breakpoint executes the instruction it stopped at
+        resume_at: Optional[int] = cpu.program_counter
+        while cpu.cycles < until:
+            start = cpu.program_counter
+            block = self._blocks.get(start)
+            if block is None:
+                block = self._blocks[start] = self._decode_block(start)
+
+            # Only blocks containing a breakpoint are checked instruction by instruction
+            check = not self.breakpoints.isdisjoint(block)
+            for address in block:
+                if cpu.cycles >= until:
+                    break
+                if check and address in self.breakpoints and address != resume_at:
+                    return Hit(Access.breakpoint, address, None)
+
+                resume_at = None
+                cpu.step()
+                if self._hit is not None:
+                    return self._hit
+
+        return None
+
+    def _decode_block(self, start: int) -> List[int]:
+        addresses: List[int] = []
+        address = start
+        while len(addresses) < MAX_BLOCK_SIZE:
+            instruction = decode(self.cpu.memory, address)
+            addresses.append(address)
+            if instruction is None or block_exit(instruction) is not None:
+                break
+            address = (address + instruction.size) & 0xFFFF
+        return addresses
+
+    def _patch(self, page: int) -> None:
+        if page in self._original_handlers:
+            return
+
+        bus = self.cpu.bus
+        memory = self.cpu.memory
+        reader = bus.readers[page]
+        writer = bus.writers[page]
+        self._original_handlers[page] = (reader, writer)
+        read_watches = self._read_watches
+        write_watches = self._write_watches
+
+        def watched_read(address: int) -> int:
+            value = memory[address] if reader is None else reader(address)
+            if address in read_watches.get(page, ()):
+                self._hit = Hit(Access.read, address, value)
+            return value
+
+        def watched_write(address: int, value: int) -> None:
+            if writer is None:
+                memory[address] = value
+            else:
+                writer(address, value)
+            if address in write_watches.get(page, ()):
+                self._hit = Hit(Access.write, address, value)
+
+        bus.readers[page] = watched_read
+        bus.writers[page] = watched_write
+
+    def _unpatch(self, page: int) -> None:
+        reader, writer = self._original_handlers.pop(page)
+        self.cpu.bus.readers[page] = reader
+        self.cpu.bus.writers[page] = writer
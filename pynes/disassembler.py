@@ -0,0 +1,283 @@
+import base64
+import bisect
+import contextlib
+import hashlib
+import json
+import os
+import zlib
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Any
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+from typing import Set
+from typing import Tuple
+from typing import Union
+
+from pynes import cache
+from pynes.addressing_mode import AddressingMode
+from pynes.opcodes import OPCODES
+from pynes.opcodes import signed_offset
+from pynes.rom import IRQ_VECTOR
+from pynes.rom import NMI_VECTOR
+from pynes.rom import PRG_ROM_START
+from pynes.rom import RESET_VECTOR
+from pynes.rom import Rom
+
+ANALYSIS_VERSION = 1
+VECTORS = (('nmi', NMI_VECTOR), ('reset', RESET_VECTOR), ('irq', IRQ_VECTOR))
+PRG_ROM_SPACE = 0x10000 - PRG_ROM_START
+
+# Code map values, one per byte of prg rom space
+DATA = 0
+OPCODE = 1
+OPERAND = 2
+
+# Control flow that addressing modes alone don't tell apart. Keyed by mnemonic, so the analysis follows these as soon
+# as the cpu implements them.
+UNCONDITIONAL_JUMPS = frozenset({'JMP'})
+SUBROUTINE_CALLS = frozenset({'JSR'})
+RETURNS = frozenset({'RTS', 'RTI', 'BRK'})
+
+
+class Instruction(NamedTuple):
+    address: int
+    opcode: int
+    mnemonic: str
+    addressing_mode: AddressingMode
+    size: int
+    operand: int
+
+    @property
+    def branch_target(self) -> int:
+        return (self.address + self.size + signed_offset(self.operand)) & 0xFFFF
+
+    @property
+    def target(self) -> Optional[int]:
+        """Address control is transferred to, for branches, jumps and calls with a static destination."""
+        if self.addressing_mode == AddressingMode.relative:
+            return self.branch_target
+        if self.mnemonic in UNCONDITIONAL_JUMPS | SUBROUTINE_CALLS and self.addressing_mode == AddressingMode.absolute:
+            return self.operand
+        return None
+
+    def __str__(self) -> str:
+        mode = self.addressing_mode
+        if mode == AddressingMode.immediate:
+            return f'{self.mnemonic} #${self.operand:02X}'
+        if mode == AddressingMode.zero_page:
+            return f'{self.mnemonic} ${self.operand:02X}'
+        if mode == AddressingMode.absolute:
+            return f'{self.mnemonic} ${self.operand:04X}'
+        if mode == AddressingMode.accumulator:
+            return f'{self.mnemonic} A'
+        if mode == AddressingMode.relative:
+            return f'{self.mnemonic} ${self.branch_target:04X}'
+        return self.mnemonic
+
+
+def decode(memory: Union[bytearray, memoryview], address: int) -> Optional[Instruction]:
+    """Decode the instruction at address, None if the opcode is unknown."""
+    value = memory[address]
+    opcode = OPCODES.get(value)
+    if opcode is None:
+        return None
+
+    operand = 0
+    for i in range(1, opcode.size):
+        operand |= memory[(address + i) & 0xFFFF] << 8 * (i - 1)
+    return Instruction(address, value, opcode.mnemonic, opcode.addressing_mode, opcode.size, operand)
+
+
+def opcodes_fingerprint() -> str:
+    """Digest of the opcode metadata, analyses (and code recompiled from them) are stale once it changes."""
+    metadata = sorted(
+        (value, op.mnemonic, op.addressing_mode.name, op.size, op.cycles) for value, op in OPCODES.items()
+    )
+    return hashlib.sha1(repr(metadata).encode()).hexdigest()
+
+
+@dataclass(frozen=True)
+class BasicBlock:
+    """Straight line code from start up to end (exclusive). successors are the static destinations of its exit."""
+
+    start: int
+    end: int
+    successors: Tuple[int, ...]
+
+
+@dataclass
+class Analysis:
+    """Static control flow of a rom's prg space, found by recursive descent from the interrupt vectors.
+
+    Only reachable code is decoded, so everything else is considered data. Decoding stops at opcodes the cpu doesn't
+    know, those addresses are listed in unknown. Indirect jumps and returns end the descent, code only reached through
+    them is not found.
+    """
+
+    entry_points: Dict[str, int]
+    code_map: bytearray
+    blocks: Dict[int, BasicBlock]
+    jump_targets: Set[int]
+    unknown: Set[int]
+    _block_starts: List[int] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        self._block_starts = sorted(self.blocks)
+
+    def is_code(self, address: int) -> bool:
+        return address >= PRG_ROM_START and self.code_map[address - PRG_ROM_START] != DATA
+
+    def is_instruction(self, address: int) -> bool:
+        return address >= PRG_ROM_START and self.code_map[address - PRG_ROM_START] == OPCODE
+
+    def block_at(self, address: int) -> Optional[BasicBlock]:
+        """The basic block containing address."""
+        index = bisect.bisect_right(self._block_starts, address) - 1
+        if index < 0:
+            return None
+
+        block = self.blocks[self._block_starts[index]]
+        return block if address < block.end else None
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            'version': ANALYSIS_VERSION,
+            'opcodes': opcodes_fingerprint(),
+            'entry_points': self.entry_points,
+            'code_map': base64.b64encode(zlib.compress(self.code_map)).decode(),
+            'blocks': [[block.start, block.end, list(block.successors)] for block in self.blocks.values()],
+            'jump_targets': sorted(self.jump_targets),
+            'unknown': sorted(self.unknown),
+        }
+
+    @classmethod
+    def from_json(cls, data: Dict[str, Any]) -> 'Analysis':
+        return cls(
+            entry_points=data['entry_points'],
+            code_map=bytearray(zlib.decompress(base64.b64decode(data['code_map']))),
+            blocks={start: BasicBlock(start, end, tuple(successors)) for start, end, successors in data['blocks']},
+            jump_targets=set(data['jump_targets']),
+            unknown=set(data['unknown']),
+        )
+
+
+def _read_word(memory: bytearray, address: int) -> int:
+    return memory[address] | memory[address + 1] << 8
+
+
+def block_exit(instruction: Instruction) -> Optional[Tuple[int, ...]]:
+    """Successors of an instruction that ends a basic block, None if execution simply carries on."""
+    target = instruction.target
+    if instruction.mnemonic in RETURNS or instruction.mnemonic in UNCONDITIONAL_JUMPS and target is None:
+        # Destination is only known at runtime
+        return ()
+    if target is None:
+        return None
+    if instruction.mnemonic in UNCONDITIONAL_JUMPS:
+        return (target,)
+
+    # Branches and subroutine calls come back to the next instruction
+    return (target, (instruction.address + instruction.size) & 0xFFFF)
+
+
+def analyze(memory: bytearray) -> Analysis:
+    """Find the code reachable from the interrupt vectors in a 64 KiB cpu address space."""
+    entry_points = {name: _read_word(memory, vector) for name, vector in VECTORS}
+    instructions: Dict[int, Instruction] = {}
+    leaders = set(entry_points.values())
+    jump_targets: Set[int] = set()
+    unknown: Set[int] = set()
+
+    pending = sorted(leaders)
+    while pending:
+        address = pending.pop()
+        # Follow straight line code until it leaves rom or reaches code that was already decoded
+        while address >= PRG_ROM_START and address not in instructions:
+            instruction = decode(memory, address)
+            if instruction is None:
+                unknown.add(address)
+                break
+
+            instructions[address] = instruction
+            successors = block_exit(instruction)
+            if successors is None:
+                address = (address + instruction.size) & 0xFFFF
+                continue
+
+            target = instruction.target
+            if target is not None:
+                jump_targets.add(target)
+            leaders.update(successors)
+            pending.extend(successors)
+            break
+
+    code_map = bytearray(PRG_ROM_SPACE)
+    for address, instruction in instructions.items():
+        code_map[address - PRG_ROM_START] = OPCODE
+        for operand_address in range(address + 1, min(address + instruction.size, 0x10000)):
+            code_map[operand_address - PRG_ROM_START] = OPERAND
+
+    return Analysis(entry_points, code_map, _basic_blocks(instructions, leaders), jump_targets, unknown)
+
+
+def _basic_blocks(instructions: Dict[int, Instruction], leaders: Set[int]) -> Dict[int, BasicBlock]:
+    blocks: Dict[int, BasicBlock] = {}
+    start: Optional[int] = None
+    for address in sorted(instructions):
+        if start is not None and address in leaders:
+            # Falls through into a block that is jumped to
+            blocks[start] = BasicBlock(start, address, (address,))
+            start = None
+        if start is None:
+            start = address
+
+        instruction = instructions[address]
+        end = address + instruction.size
+        successors = block_exit(instruction)
+        if successors is not None or end not in instructions:
+            blocks[start] = BasicBlock(start, end, successors or ())
+            start = None
+
+    return blocks
+
+
+def listing(memory: bytearray, analysis: Analysis) -> Iterator[str]:
+    """Assembly listing of prg space, with labels on jump targets and data as .byte directives."""
+    address = PRG_ROM_START
+    while address < 0x10000:
+        if address in analysis.jump_targets or address in analysis.entry_points.values():
+            yield f'L{address:04X}:'
+
+        instruction = decode(memory, address) if analysis.is_instruction(address) else None
+        if instruction is None:
+            yield f'    ${address:04X}  .byte ${memory[address]:02X}'
+            address += 1
+        else:
+            yield f'    ${address:04X}  {instruction}'
+            address += instruction.size
+
+
+def load_analysis(rom: Rom, cache_dir: Optional[str] = None) -> Analysis:
+    """Analysis of a rom, cached on disk by rom hash so it is only computed once.
+
+    Cached results from a different analysis version or opcode table are recomputed. Failing to write the cache is not
+    an error, the analysis is just not cached.
+    """
+    cache_dir = cache.cache_dir('analysis') if cache_dir is None else cache_dir
+    path = os.path.join(cache_dir, f'{rom.sha1}.json')
+
+    cached = cache.read(path)
+    with contextlib.suppress(ValueError, KeyError, TypeError, zlib.error):
+        data = json.loads(cached or b'')
+        if data['version'] == ANALYSIS_VERSION and data['opcodes'] == opcodes_fingerprint():
+            return Analysis.from_json(data)
+
+    memory = bytearray(0x10000)
+    rom.load_into(memory)
+    analysis = analyze(memory)
+    cache.write(path, json.dumps(analysis.to_json()).encode())
+    return analysis
@@ -0,0 +1,235 @@
+import ctypes
+import multiprocessing
+from multiprocessing.connection import Connection
+from multiprocessing.sharedctypes import RawArray
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+import numpy as np
+import numpy.typing as npt
+
+from pynes.nes import MEMORY_SIZE
+from pynes.nes import Nes
+from pynes.nes import RAM_SIZE
+from pynes.rom import Rom
+from pynes.video import HEIGHT
+from pynes.video import WIDTH
+
+RewardFunction = Callable[[Nes], float]
+DoneFunction = Callable[[Nes], bool]
+Info = Dict[str, Any]
+
+
+class Observation(NamedTuple):
+    # Palette index of each pixel, HEIGHT x WIDTH
+    pixels: npt.NDArray[np.uint8]
+    ram: npt.NDArray[np.uint8]
+
+
+def no_reward(nes: Nes) -> float:
+    return 0.0
+
+
+def never_done(nes: Nes) -> bool:
+    return False
+
+
+def _read_only(array: npt.NDArray[np.uint8]) -> npt.NDArray[np.uint8]:
+    array.flags.writeable = False
+    return array
+
+
+class NesEnv:
+    """Gym style environment around the console: reset(), then step(action) until done.
+
+    An action is the buttons held on controller 1 (a Button mask), for frame_skip frames. Frames skipped over aren't
+    drawn. reward and done are called with the console after each frame, reward is summed over the skipped frames.
+    Episodes are also cut off after max_frames.
+
+    The observation is built once, as read only numpy views onto the console's own frame buffer and ram. Every step
+    updates it in place, so nothing is copied per step. Copy it to hold on to an older observation.
+    """
+
+    def __init__(
+        self,
+        rom: Rom,
+        frame_skip: int = 1,
+        reward: RewardFunction = no_reward,
+        done: DoneFunction = never_done,
+        max_frames: Optional[int] = None,
+    ) -> None:
+        if frame_skip < 1:
+            raise ValueError(f'frame_skip must be positive, got {frame_skip}')
+
+        self.nes = Nes(rom)
+        self.frame_skip = frame_skip
+        self.reward = reward
+        self.done = done
+        self.max_frames = max_frames
+        self._initial_state = self.nes.save_state()
+        self.observation = self._observation()
+
+    def _observation(self) -> Observation:
+        return Observation(
+            pixels=_read_only(np.frombuffer(self.nes.frame.pixels, dtype=np.uint8).reshape(HEIGHT, WIDTH)),
+            ram=_read_only(np.frombuffer(self.nes.cpu.memory, dtype=np.uint8, count=RAM_SIZE)),
+        )
+
+    def _move_to(self, pixels: memoryview, memory: memoryview) -> None:
+        """Move the console's frame buffer and memory into the given buffers, e.g. shared memory."""
+        pixels[:] = self.nes.frame.pixels
+        memory[:] = self.nes.cpu.memory
+        self.nes.frame.pixels = pixels
+        self.nes.cpu.memory = memory
+        self.observation = self._observation()
+
+    def reset(self) -> Observation:
+        self.nes.load_state(self._initial_state)
+        # The frame buffer isn't part of save states, don't show the end of the last episode
+        self.nes.frame.pixels[:] = bytes(len(self.nes.frame.pixels))
+        return self.observation
+
+    def step(self, action: int) -> Tuple[Observation, float, bool, Info]:
+        nes = self.nes
+        nes.controllers[0].buttons = action
+        total = 0.0
+        done = False
+        for frame in range(self.frame_skip):
+            nes.render = frame == self.frame_skip - 1
+            nes.run_frame()
+            total += self.reward(nes)
+            done = self.done(nes) or (self.max_frames is not None and nes.frame_count >= self.max_frames)
+            if done:
+                break
+
+        if not nes.render:
+            # The episode ended on a frame that was going to be skipped, draw it after all
+            nes.draw()
+        nes.render = True
+        return self.observation, total, done, {'frame': nes.frame_count}
+
+
+def _shared_observations(pixels: 'ctypes.Array[ctypes.c_uint8]', memory: 'ctypes.Array[ctypes.c_uint8]') -> Observation:
+    """Views onto the observations of all environments of a VectorEnv, stacked along the first axis."""
+    return Observation(
+        pixels=np.frombuffer(memoryview(pixels), dtype=np.uint8).reshape(-1, HEIGHT, WIDTH),
+        ram=np.frombuffer(memoryview(memory), dtype=np.uint8).reshape(-1, MEMORY_SIZE)[:, :RAM_SIZE],
+    )
+
+
+def _slot(shared: 'ctypes.Array[ctypes.c_uint8]', index: int, size: int) -> memoryview:
+    start = index * size
+    end = start + size
+    return memoryview(shared).cast('B')[start:end]
+
+
+def _worker(
+    connection: Connection,
+    pixels: 'ctypes.Array[ctypes.c_uint8]',
+    memory: 'ctypes.Array[ctypes.c_uint8]',
+    index: int,
+    env_args: Tuple[Rom, int, RewardFunction, DoneFunction, Optional[int]],
+) -> None:
+    """Run one environment of a VectorEnv, until told to close.
+
+    Commands are (name, action) pairs. The console's frame buffer and memory live in this environment's slot of shared
+    memory, so observations are never copied. Only rewards and done flags are sent back.
+    """
+    env = NesEnv(*env_args)
+    env._move_to(_slot(pixels, index, HEIGHT * WIDTH), _slot(memory, index, MEMORY_SIZE))
+    while True:
+        command, action = connection.recv()
+        result: Optional[Tuple[float, bool, Info]] = None
+        if command == 'step':
+            _, reward, done, info = env.step(action)
+            if done:
+                env.reset()
+            result = (reward, done, info)
+        elif command == 'reset':
+            env.reset()
+        else:
+            break
+
+        connection.send(result)
+    connection.close()
+
+
+class VectorEnv:
+    """count NesEnvs, each in its own process, stepped in lockstep.
+
+    Each worker's console runs directly on shared memory, and observation holds numpy views onto it with a leading axis
+    for the environment. Only actions, rewards and done flags go through pipes. Like gym's vector environments, an
+    environment that is done is reset right away, its observation is the first one of the next episode.
+
+    Arguments after count are passed on to each NesEnv. reward and done are sent to the workers, so must be picklable
+    (e.g. module level functions).
+    """
+
+    def __init__(
+        self,
+        rom: Rom,
+        count: int,
+        frame_skip: int = 1,
+        reward: RewardFunction = no_reward,
+        done: DoneFunction = never_done,
+        max_frames: Optional[int] = None,
+    ) -> None:
+        self.count = count
+        self._pixels = RawArray(ctypes.c_uint8, count * HEIGHT * WIDTH)
+        self._memory = RawArray(ctypes.c_uint8, count * MEMORY_SIZE)
+        self.observation = _shared_observations(self._pixels, self._memory)
+
+        env_args = (rom, frame_skip, reward, done, max_frames)
+        self._connections: List[Connection] = []
+        self._processes: List[multiprocessing.Process] = []
+        for index in range(count):
+            connection, worker_connection = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=_worker, args=(worker_connection, self._pixels, self._memory, index, env_args), daemon=True
+            )
+            process.start()
+            worker_connection.close()
+            self._connections.append(connection)
+            self._processes.append(process)
+
+    def __enter__(self) -> 'VectorEnv':
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def reset(self) -> Observation:
+        self._send_all([('reset', None)] * self.count)
+        return self.observation
+
+    def step(
+        self, actions: Sequence[int]
+    ) -> Tuple[Observation, npt.NDArray[np.float64], npt.NDArray[np.bool_], List[Info]]:
+        if len(actions) != self.count:
+            raise ValueError(f'Expected {self.count} actions, got {len(actions)}')
+
+        results = self._send_all([('step', action) for action in actions])
+        rewards = np.array([reward for reward, _, _ in results], dtype=np.float64)
+        dones = np.array([done for _, done, _ in results], dtype=np.bool_)
+        return self.observation, rewards, dones, [info for _, _, info in results]
+
+    def close(self) -> None:
+        for connection in self._connections:
+            connection.send(('close', None))
+            connection.close()
+        for process in self._processes:
+            process.join()
+        self._connections.clear()
+        self._processes.clear()
+
+    def _send_all(self, commands: List[Tuple[str, Optional[int]]]) -> List[Any]:
+        # Send everything before waiting on anything, so the workers run in parallel
+        for connection, command in zip(self._connections, commands):
+            connection.send(command)
+        return [connection.recv() for connection in self._connections]
@@ -0,0 +1,122 @@
+from typing import List
+from typing import Optional
+from typing import TYPE_CHECKING
+from typing import Tuple
+
+if TYPE_CHECKING:  # pragma: no cover
+    from pynes.cpu import Cpu
+
+# Wait loops are tiny, don't bother watching anything bigger
+MAX_LOOP_SIZE = 32
+MAX_LOOP_READS = 16
+
+# Target address, accumulator, x, y, stack pointer and status, on arrival at the top of the loop
+Snapshot = Tuple[int, int, int, int, int, int]
+AccessLog = List[Tuple[int, int]]
+
+
+class IdleLoopDetector:
+    """Detects side effect free wait loops and skips the cpu ahead to the next scheduled event.
+
+    Games commonly spin waiting for vblank (BIT $2002; BPL back to the BIT). Emulating every iteration of those spins
+    is pure overhead. Detection piggybacks on taken backward branches: the loop is watched for two iterations, with
+    memory reads logged. If both iterations start from the same registers, read the same addresses with the same
+    values, write nothing and only read idempotent addresses (see Bus), then every further iteration will do exactly
+    the same until something outside of the cpu changes. Peripherals only change at scheduled events, i.e. the cycle
+    the cpu is run until, so whole iterations are skipped up to that point. The result is identical to spinning, down
+    to the cycle count.
+
+    Reads are logged by shadowing the cpu's memory accessors while a loop is being watched, so there is no overhead
+    outside of short backward branches.
+    """
+
+    def __init__(self) -> None:
+        self.skipped_cycles = 0
+        self._snapshot: Optional[Snapshot] = None
+        self._arrival_cycles = 0
+        self._iteration_cycles = 0
+        self._log: AccessLog = []
+        self._previous_log: Optional[AccessLog] = None
+        self._watching: Optional['Cpu'] = None
+
+    def backward_branch(self, cpu: 'Cpu', offset: int) -> None:
+        """Called by branch instructions when a backward branch is taken, after the program counter is updated."""
+        if offset < -MAX_LOOP_SIZE:
+            self.stop()
+            return
+
+        snapshot = (
+            cpu.program_counter,
+            cpu.accumulator,
+            cpu.register_x,
+            cpu.register_y,
+            cpu.stack_pointer,
+            cpu.status.pack(),
+        )
+        iteration_cycles = cpu.cycles - self._arrival_cycles
+
+        if self._watching is not cpu or snapshot != self._snapshot:
+            # New loop, or the loop is doing actual work (counting, etc.)
+            self._watch(cpu, snapshot)
+        elif self._log == self._previous_log and iteration_cycles == self._iteration_cycles:
+            self._skip(cpu, iteration_cycles)
+        else:
+            # Need a second identical iteration to compare against
+            self._previous_log = self._log
+            self._iteration_cycles = iteration_cycles
+            self._next_iteration(cpu)
+
+    def stop(self) -> None:
+        """Stop watching, restoring the cpu's regular memory accessors."""
+        if self._watching is not None:
+            self._watching.__dict__.pop('read_from_memory', None)
+            self._watching.__dict__.pop('write_to_memory', None)
+        self._watching = None
+        self._snapshot = None
+
+    def _watch(self, cpu: 'Cpu', snapshot: Snapshot) -> None:
+        if self._watching is not cpu:
+            self.stop()
+            self._patch(cpu)
+
+        self._snapshot = snapshot
+        self._previous_log = None
+        self._next_iteration(cpu)
+
+    def _next_iteration(self, cpu: 'Cpu') -> None:
+        self._arrival_cycles = cpu.cycles
+        self._log = []
+
+    def _patch(self, cpu: 'Cpu') -> None:
+        read = cpu.read_from_memory
+        write = cpu.write_to_memory
+
+        def logged_read(address: int) -> int:
+            value = read(address)
+            self._log.append((address, value))
+            if len(self._log) > MAX_LOOP_READS or not cpu.bus.is_idempotent(address):
+                # Repeating the read would change something, this is not a wait loop
+                self.stop()
+            return value
+
+        def logged_write(address: int, value: int) -> None:
+            # Writing has side effects, this is not a wait loop
+            self.stop()
+            write(address, value)
+
+        # Instance attributes shadow the methods, stop() removes them again
+        setattr(cpu, 'read_from_memory', logged_read)
+        setattr(cpu, 'write_to_memory', logged_write)
+        self._watching = cpu
+
+    def _skip(self, cpu: 'Cpu', iteration_cycles: int) -> None:
+        """Skip whole iterations, so the cpu ends up in the same state and cycle as if it had spun."""
+        # Spinning stops as soon as an instruction ends on or after run_until, the instruction before the branch
+        # included. So the last iteration that would actually have been reached must arrive strictly before it.
+        iterations = (cpu.run_until - cpu.cycles - 1) // iteration_cycles
+        if iterations > 0:
+            skipped = iterations * iteration_cycles
+            cpu.cycles += skipped
+            self.skipped_cycles += skipped
+
+        self.stop()
@@ -56,3 +56,55 @@ def _add_with_carry_immediate(cpu: 'Cpu', value: int) -> None:
 def _add_with_carry_absolute(cpu: 'Cpu', value: int) -> None:
     value = cpu.read_from_memory(value)
     return _add_with_carry_immediate(cpu, value)
+
+
+def nmos_add_with_carry(cpu: 'Cpu', addressing_mode: AddressingMode, data: int) -> None:
+    """Add instruction of a stock NMOS 6502, which adds binary coded decimal while the decimal flag is set.
+
+    Only carry is meaningful after a decimal add: zero comes from the binary sum, negative and overflow from the sum
+    before its high digit is adjusted.
+    """
+    if cpu.status.decimal:
+        _add_decimal(cpu, _operand(cpu, addressing_mode, data))
+    else:
+        add_with_carry(cpu, addressing_mode, data)
+
+
+def cmos_add_with_carry(cpu: 'Cpu', addressing_mode: AddressingMode, data: int) -> None:
+    """Add instruction of the 65C02. Decimal adds set negative and zero from their result, and take an extra cycle."""
+    if cpu.status.decimal:
+        _add_decimal(cpu, _operand(cpu, addressing_mode, data))
+        cpu.status.negative = bool(cpu.accumulator & 0x80)
+        cpu.status.zero = cpu.accumulator == 0
+        cpu.cycles += 1
+    else:
+        add_with_carry(cpu, addressing_mode, data)
+
+
+def _operand(cpu: 'Cpu', addressing_mode: AddressingMode, data: int) -> int:
+    if addressing_mode == AddressingMode.immediate:
+        return data
+    if addressing_mode in (AddressingMode.absolute, AddressingMode.zero_page):
+        return cpu.read_from_memory(data)
+    raise NotImplementedError()
+
+
+def _add_decimal(cpu: 'Cpu', value: int) -> None:
+    """Add two packed BCD bytes and the carry, setting flags the way the NMOS 6502 does."""
+    arg1 = cpu.accumulator
+    carry_in = int(cpu.status.carry)
+
+    low = (arg1 & 0x0F) + (value & 0x0F) + carry_in
+    if low > 0x09:
+        low = ((low + 0x06) & 0x0F) + 0x10
+    result = (arg1 & 0xF0) + (value & 0xF0) + low
+
+    # Sign flags are taken before the high digit is adjusted
+    cpu.status.negative = bool(result & 0x80)
+    cpu.status.overflow = bool(~(arg1 ^ value) & (arg1 ^ result) & 0x80)
+    cpu.status.zero = (arg1 + value + carry_in) % MAX_UNSIGNED_VALUE == 0
+
+    if result > 0x9F:
+        result += 0x60
+    cpu.status.carry = result > 0xFF
+    cpu.accumulator = result % MAX_UNSIGNED_VALUE
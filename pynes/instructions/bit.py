@@ -16,3 +16,8 @@ def bit(cpu: 'Cpu', value: int) -> None:
     cpu.status.zero = not arg1 & arg2
     cpu.status.negative = bool(1 << 7 & arg2)
     cpu.status.overflow = bool(1 << 6 & arg2)
+
+
+def bit_immediate(cpu: 'Cpu', value: int) -> None:
+    """65C02 immediate bitmask. Only sets zero, there's no memory value for negative and overflow to come from."""
+    cpu.status.zero = not cpu.accumulator & value
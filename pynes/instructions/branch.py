@@ -47,3 +47,7 @@ def branch_if_overflow_set(cpu: 'Cpu', value: int) -> None:
 def _branch(cpu: 'Cpu', predicate_for_branch: bool, value: int) -> None:
     if predicate_for_branch:
         cpu.program_counter += value
+
+        # Backward branches are how loops are made, including the wait loops that can be skipped
+        if value < 0 and cpu.idle_loop_detector is not None:
+            cpu.idle_loop_detector.backward_branch(cpu, value)
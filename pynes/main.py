@@ -1,15 +1,119 @@
 import argparse  # pragma: no cover
+import sys  # pragma: no cover
+from typing import TYPE_CHECKING  # pragma: no cover
+
+from pynes.rom import Rom  # pragma: no cover
+
+if TYPE_CHECKING:  # pragma: no cover
+    from pynes import stream
+
+# Each command imports what it needs in its handler, so --help and the lighter commands don't pay for the rest (numpy,
+# asyncio, multiprocessing)
+# pylint: disable=import-outside-toplevel
 
 
 def argparser() -> argparse.ArgumentParser:  # pragma: no cover
     parser = argparse.ArgumentParser()
-    parser.add_argument('rom', type=argparse.FileType('rb'))
+    parser.add_argument('rom', nargs='?', type=argparse.FileType('rb'))
+    parser.add_argument('--serve', action='store_true', help='Host emulator sessions over a local socket')
+    parser.add_argument('--host')
+    parser.add_argument('--port', type=int)
+    parser.add_argument('--metrics-port', type=int, help='Also serve Prometheus metrics of the sessions on this port')
+    parser.add_argument('--disassemble', action='store_true', help='Print an annotated listing of the rom and exit')
+    parser.add_argument(
+        '--recompile', action='store_true', help='Translate the rom to a Python module cached on disk, print its path'
+    )
+    parser.add_argument('--conformance', metavar='DIRECTORY', help='Run the test roms under DIRECTORY, print results')
+    parser.add_argument('--jobs', type=int, help='Worker processes for --conformance, defaults to one per cpu')
+    parser.add_argument('--frame-limit', type=int, help='Frames before a test rom times out')
+    parser.add_argument('--no-cache', action='store_true', help='Rerun test roms even if their result is cached')
+    parser.add_argument('--record-trace', metavar='PATH', help='Run the rom, saving register reads to PATH')
+    parser.add_argument('--frames', type=int, default=600, help='Frames to run for --record-trace and --dump-*')
+    parser.add_argument('--dump-video', metavar='PATH', help='Run the rom, writing raw palette index frames to PATH')
+    parser.add_argument('--dump-audio', metavar='PATH', help='Run the rom, writing raw float32 samples to PATH')
+    parser.add_argument(
+        '--replay-trace', metavar='PATH', help='Benchmark the cpu alone, replaying register reads from PATH'
+    )
     return parser
 
 
+def dump(output_stream: 'stream.OutputStream[bytes]', path: str) -> None:  # pragma: no cover
+    with open(path, 'wb') as f:
+        for item in output_stream:
+            f.write(item)
+
+
 def main() -> None:  # pragma: no cover
     parser = argparser()
-    parser.parse_args()
+    args = parser.parse_args()
+
+    if args.conformance is not None:
+        from pynes import conformance
+
+        frame_limit = conformance.DEFAULT_FRAME_LIMIT if args.frame_limit is None else args.frame_limit
+        results = conformance.run_suite(
+            args.conformance, workers=args.jobs, frame_limit=frame_limit, use_cache=not args.no_cache
+        )
+        for line in conformance.report(results):
+            print(line)
+        sys.exit(any(result.outcome != conformance.Outcome.passed for result in results))
+    elif args.replay_trace is not None:
+        from pynes import trace
+        from pynes.metrics import FRAME_RATE
+
+        io_trace = trace.IoTrace.load(args.replay_trace)
+        seconds = trace.benchmark(io_trace)
+        speed = io_trace.frames / FRAME_RATE / seconds
+        print(f'{io_trace.frames} frames in {seconds:.3f}s, {speed:.2f}x real time')
+    elif args.serve:
+        import asyncio
+
+        from pynes import server
+
+        host = server.DEFAULT_HOST if args.host is None else args.host
+        port = server.DEFAULT_PORT if args.port is None else args.port
+        asyncio.run(server.serve_forever(host, port, args.metrics_port))
+    elif args.rom is None:
+        parser.error('rom is required unless --serve is given')
+    elif args.disassemble:
+        from pynes import disassembler
+
+        rom = Rom.from_bytes(args.rom.read())
+        memory = bytearray(0x10000)
+        rom.load_into(memory)
+        for line in disassembler.listing(memory, disassembler.load_analysis(rom)):
+            print(line)
+    elif args.record_trace is not None:
+        from pynes import trace
+        from pynes.nes import Nes
+
+        nes = Nes(Rom.from_bytes(args.rom.read()))
+        trace.record(nes, args.frames).save(args.record_trace)
+    elif args.dump_video is not None or args.dump_audio is not None:
+        import threading
+
+        from pynes import stream
+        from pynes.nes import Nes
+
+        output = stream.EmulatorOutput()
+        output.emulate(Nes(Rom.from_bytes(args.rom.read())), args.frames)
+        writers = []
+        for path, output_stream in ((args.dump_video, output.video), (args.dump_audio, output.audio)):
+            if path is None:
+                output_stream.cancel()
+            else:
+                # A thread per stream, so neither fills up and stalls emulation while the other is written
+                writer = threading.Thread(target=dump, args=(output_stream, path))
+                writer.start()
+                writers.append(writer)
+        for writer in writers:
+            writer.join()
+    elif args.recompile:
+        from pynes import recompiler
+
+        rom = Rom.from_bytes(args.rom.read())
+        recompiler.recompile(rom)
+        print(recompiler.module_path(rom))
 
 
 if __name__ == '__main__':
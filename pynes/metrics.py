@@ -0,0 +1,157 @@
+import time
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Mapping
+from typing import TYPE_CHECKING
+
+from pynes.bus import ReadHandler
+from pynes.bus import WriteHandler
+
+if TYPE_CHECKING:  # pragma: no cover
+    import asyncio
+
+SUBSYSTEMS = ('cpu', 'ppu', 'apu', 'io')
+# NTSC
+FRAME_RATE = 60.0988
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 9465
+
+_HELP = {
+    'pynes_subsystem_seconds_total': ('counter', 'Host time spent emulating each subsystem.'),
+    'pynes_frames_total': ('counter', 'Frames emulated.'),
+    'pynes_speed_ratio': ('gauge', 'Emulated time over host time, above 1 is faster than real time.'),
+}
+
+
+class Metrics:
+    """Host time spent in each subsystem, accumulated over the frames emulated.
+
+    - cpu: executing instructions, not counting the time spent in I/O handlers
+    - io: memory mapped register handlers (PPU, APU, controllers), called by the cpu
+    - apu: synthesizing the frame's audio
+    - ppu: finishing the frame's video
+
+    Timing is a couple of clock reads per frame, plus two per I/O register access. That's cheap enough to leave on.
+    """
+
+    def __init__(self) -> None:
+        self.totals: Dict[str, float] = {}
+        self.last_frame: Dict[str, float] = {}
+        self.frames = 0
+        # I/O time of the frame in progress
+        self.pending_io = 0.0
+        self.reset()
+
+    @property
+    def host_time(self) -> float:
+        return sum(self.totals.values())
+
+    @property
+    def emulated_time(self) -> float:
+        return self.frames / FRAME_RATE
+
+    @property
+    def speed(self) -> float:
+        """Emulated time over host time, 0 before anything ran."""
+        host_time = self.host_time
+        return self.emulated_time / host_time if host_time else 0.0
+
+    def start_frame(self) -> None:
+        """Drop I/O time from outside of frames (e.g. the debugger stepping the cpu), so it isn't billed to this one."""
+        self.pending_io = 0.0
+
+    def record_frame(self, cpu: float, ppu: float, apu: float) -> None:
+        """Add a frame's timings. cpu includes the I/O handlers it called, which are split out."""
+        io = self.pending_io
+        self.pending_io = 0.0
+        frame = {'cpu': max(cpu - io, 0.0), 'ppu': ppu, 'apu': apu, 'io': io}
+        for subsystem, seconds in frame.items():
+            self.totals[subsystem] += seconds
+        self.last_frame = frame
+        self.frames += 1
+
+    def reset(self) -> None:
+        self.totals = dict.fromkeys(SUBSYSTEMS, 0.0)
+        self.last_frame = dict.fromkeys(SUBSYSTEMS, 0.0)
+        self.frames = 0
+        self.pending_io = 0.0
+
+    def snapshot(self) -> Dict[str, float]:
+        """Counters as a flat dict, for reporting."""
+        return {
+            **{f'{subsystem}_seconds': seconds for subsystem, seconds in self.totals.items()},
+            'frames': self.frames,
+            'host_seconds': self.host_time,
+            'emulated_seconds': self.emulated_time,
+            'speed': self.speed,
+        }
+
+    def timed_reader(self, reader: ReadHandler) -> ReadHandler:
+        clock = time.perf_counter
+
+        def timed(address: int) -> int:
+            start = clock()
+            value = reader(address)
+            self.pending_io += clock() - start
+            return value
+
+        return timed
+
+    def timed_writer(self, writer: WriteHandler) -> WriteHandler:
+        clock = time.perf_counter
+
+        def timed(address: int, value: int) -> None:
+            start = clock()
+            writer(address, value)
+            self.pending_io += clock() - start
+
+        return timed
+
+
+def exposition(metrics: Mapping[str, Metrics], label: str = 'session') -> str:
+    """Prometheus text format of several Metrics, told apart by label."""
+    samples: Dict[str, List[str]] = {name: [] for name in _HELP}
+    for value, instance in sorted(metrics.items()):
+        labels = f'{label}="{value}"'
+        for subsystem, seconds in instance.totals.items():
+            samples['pynes_subsystem_seconds_total'].append(f'{{{labels},subsystem="{subsystem}"}} {seconds!r}')
+        samples['pynes_frames_total'].append(f'{{{labels}}} {instance.frames}')
+        samples['pynes_speed_ratio'].append(f'{{{labels}}} {instance.speed!r}')
+
+    lines = []
+    for name, (kind, description) in _HELP.items():
+        lines += [f'# HELP {name} {description}', f'# TYPE {name} {kind}']
+        lines += [f'{name}{sample}' for sample in samples[name]]
+    return '\n'.join(lines) + '\n'
+
+
+async def start_endpoint(
+    render: Callable[[], str], host: str = DEFAULT_HOST, port: int = DEFAULT_PORT
+) -> 'asyncio.Server':
+    """Serve render() over HTTP at /metrics, for Prometheus to scrape. Only meant for localhost."""
+    # Deferred import, only the endpoint needs asyncio
+    import asyncio  # pylint: disable=import-outside-toplevel
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = await reader.readline()
+            # Skip the headers
+            while (await reader.readline()).strip():
+                pass
+
+            parts = request_line.split()
+            if len(parts) >= 2 and parts[0] == b'GET' and parts[1] == b'/metrics':
+                status = '200 OK'
+                body = render().encode()
+            else:
+                status = '404 Not Found'
+                body = b''
+            headers = [f'HTTP/1.0 {status}', 'Content-Type: text/plain; version=0.0.4', f'Content-Length: {len(body)}']
+            writer.write('\r\n'.join(headers + ['', '']).encode() + body)
+            await writer.drain()
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
@@ -0,0 +1,172 @@
+import bisect
+import hashlib
+import struct
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+from typing import TYPE_CHECKING
+from typing import Tuple
+
+if TYPE_CHECKING:  # pragma: no cover
+    from pynes.nes import Nes
+
+MOVIE_MAGIC = b'PNMV'
+MOVIE_VERSION = 1
+# Magic, version, sha1 of the rom, frame count
+_HEADER = struct.Struct('<4sB20sI')
+# One byte of buttons per controller
+BYTES_PER_FRAME = 2
+
+DEFAULT_CHECKPOINT_INTERVAL = 60
+
+
+class MovieFormatError(ValueError):
+    """Raised when loading a file that is not a movie, or an unsupported version of one."""
+
+
+class Movie:
+    """Controller input recorded per frame, for a specific rom.
+
+    Movies are stored as a fixed header followed by the buttons pressed on both controllers, two bytes per frame.
+    """
+
+    def __init__(self, rom_sha1: str, inputs: Optional[bytes] = None) -> None:
+        self.rom_sha1 = rom_sha1
+        self.inputs = bytearray(inputs or b'')
+
+    def __len__(self) -> int:
+        return len(self.inputs) // BYTES_PER_FRAME
+
+    def __getitem__(self, frame: int) -> Tuple[int, int]:
+        """Buttons held on both controllers during frame."""
+        if not 0 <= frame < len(self):
+            raise IndexError(f'Frame {frame} is out of range, movie has {len(self)} frames')
+
+        offset = frame * BYTES_PER_FRAME
+        return self.inputs[offset], self.inputs[offset + 1]
+
+    def record(self, controller_1: int, controller_2: int = 0) -> None:
+        """Append the next frame's input."""
+        self.inputs += bytes([controller_1, controller_2])
+
+    def to_bytes(self) -> bytes:
+        header = _HEADER.pack(MOVIE_MAGIC, MOVIE_VERSION, bytes.fromhex(self.rom_sha1), len(self))
+        return header + self.inputs
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'Movie':
+        if len(data) < _HEADER.size:
+            raise MovieFormatError('Truncated movie header')
+
+        magic, version, rom_sha1, frame_count = _HEADER.unpack_from(data)
+        if magic != MOVIE_MAGIC:
+            raise MovieFormatError('Not a movie file')
+        if version != MOVIE_VERSION:
+            raise MovieFormatError(f'Unsupported movie version {version}')
+
+        header_size = _HEADER.size
+        inputs = data[header_size:]
+        if len(inputs) != frame_count * BYTES_PER_FRAME:
+            raise MovieFormatError(f'Expected {frame_count} frames of input, got {len(inputs) // BYTES_PER_FRAME}')
+
+        return cls(rom_sha1.hex(), inputs)
+
+    def save(self, path: str) -> None:
+        with open(path, 'wb') as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path: str) -> 'Movie':
+        with open(path, 'rb') as f:
+            return cls.from_bytes(f.read())
+
+
+class FrameHashes(NamedTuple):
+    """Digests compared between builds to detect regressions."""
+
+    frame: int
+    ram: str
+    video: str
+
+
+class Replayer:
+    """Plays a movie back on a freshly powered on console.
+
+    A save state is checkpointed every checkpoint_interval frames while playing, so seeking to any frame only has to
+    emulate up to checkpoint_interval frames from the closest checkpoint. Frames skipped over while seeking are not
+    rendered.
+    """
+
+    def __init__(self, nes: 'Nes', movie: Movie, checkpoint_interval: int = DEFAULT_CHECKPOINT_INTERVAL) -> None:
+        if movie.rom_sha1 != nes.rom.sha1:
+            raise ValueError('Movie was recorded with a different rom')
+        if nes.frame_count != 0:
+            raise ValueError('Movies are played back from power on')
+        if checkpoint_interval < 1:
+            raise ValueError(f'checkpoint_interval must be positive, got {checkpoint_interval}')
+
+        self.nes = nes
+        self.movie = movie
+        self.checkpoint_interval = checkpoint_interval
+        # Checkpoint frames, kept sorted for lookup, and the state at the start of each of them
+        self._checkpoint_frames: List[int] = []
+        self._checkpoints: Dict[int, bytes] = {}
+        self._checkpoint()
+
+    @property
+    def frame(self) -> int:
+        """Number of frames played so far, which is also the index of the next frame's input."""
+        return self.nes.frame_count
+
+    def step(self) -> None:
+        """Play a single frame of the movie."""
+        buttons = self.movie[self.frame]
+        for controller, value in zip(self.nes.controllers, buttons):
+            controller.buttons = value
+
+        self.nes.run_frame()
+
+        if self.frame % self.checkpoint_interval == 0:
+            self._checkpoint()
+
+    def seek(self, frame: int) -> None:
+        """Restore the console to the state after frame frames have been played.
+
+        Only the last frame is rendered, so the frame buffer matches what playing through would have shown.
+        """
+        if not 0 <= frame <= len(self.movie):
+            raise IndexError(f'Frame {frame} is out of range, movie has {len(self.movie)} frames')
+
+        # Resume from the closest checkpoint before the frame, so the frame itself is played and rendered. Unless
+        # playing on from the current frame is closer.
+        checkpoint = self._checkpoint_frames[bisect.bisect_right(self._checkpoint_frames, max(frame - 1, 0)) - 1]
+        if not checkpoint <= self.frame <= frame:
+            self.nes.load_state(self._checkpoints[checkpoint])
+            if frame == 0:
+                # Nothing has been drawn at power on
+                self.nes.frame.pixels[:] = bytes(len(self.nes.frame.pixels))
+
+        render = self.nes.render
+        self.nes.render = False
+        try:
+            while self.frame < frame - 1:
+                self.step()
+        finally:
+            self.nes.render = render
+
+        if self.frame < frame:
+            self.step()
+
+    def play(self, until: Optional[int] = None) -> Iterator[FrameHashes]:
+        """Play the movie up to until (or its end), yielding digests after each frame."""
+        until = len(self.movie) if until is None else until
+        while self.frame < until:
+            self.step()
+            yield FrameHashes(self.frame, hashlib.sha1(self.nes.ram).hexdigest(), self.nes.frame.digest())
+
+    def _checkpoint(self) -> None:
+        if self.frame not in self._checkpoints:
+            bisect.insort(self._checkpoint_frames, self.frame)
+            self._checkpoints[self.frame] = self.nes.save_state()
@@ -0,0 +1,190 @@
+import struct
+import time
+from typing import TYPE_CHECKING
+
+from pynes.bus import PAGE_SIZE
+from pynes.controller import Controller
+from pynes.cpu import Cpu
+from pynes.idle import IdleLoopDetector
+from pynes.metrics import Metrics
+from pynes.ppu import OAM_DMA
+from pynes.ppu import OAM_DMA_CYCLES
+from pynes.ppu import REGISTERS_END as PPU_REGISTERS_END
+from pynes.ppu import REGISTERS_START as PPU_REGISTERS_START
+from pynes.ppu import Ppu
+from pynes.ppu import read_is_idempotent as ppu_read_is_idempotent
+from pynes.rom import RESET_VECTOR
+from pynes.rom import Rom
+
+if TYPE_CHECKING:  # pragma: no cover
+    import numpy.typing as npt
+
+MEMORY_SIZE = 0x10000
+RAM_SIZE = 0x800
+RAM_MIRRORS_END = 0x1FFF
+
+IO_REGISTERS_START = 0x4000
+IO_REGISTERS_END = 0x40FF
+APU_STATUS = 0x4015
+CONTROLLER_1 = 0x4016
+CONTROLLER_2 = 0x4017
+
+# NTSC: 262 scanlines of 341 ppu dots, with 3 ppu dots per cpu cycle
+CPU_CYCLES_PER_FRAME = 29781
+
+# Frame count, then both controllers
+_STATE_HEADER = struct.Struct('<Q3s3s')
+
+
+class Nes:
+    """The console: a cpu and the peripherals hanging off of its bus.
+
+    Emulation advances in frame sized slices with run_frame. With recompiled set, the rom's code runs as Python
+    translated ahead of time (see pynes.recompiler), which is cached on disk after the first time.
+    """
+
+    def __init__(self, rom: Rom, recompiled: bool = False) -> None:
+        # Importing numpy (through the APU and the renderer) is deferred until a console is created, to keep importing
+        # this module cheap
+        # pylint: disable=import-outside-toplevel
+        import numpy as np
+
+        from pynes.apu import Apu
+        from pynes.renderer import Renderer
+        from pynes.video import FrameBuffer
+
+        self.rom = rom
+        self.cpu = Cpu()
+        self.cpu.memory = bytearray(MEMORY_SIZE)
+        self.cpu.idle_loop_detector = IdleLoopDetector()
+        rom.load_into(self.cpu.memory)
+        if recompiled:
+            from pynes.recompiler import load as load_recompiled  # pylint: disable=import-outside-toplevel
+
+            self.cpu.blocks = load_recompiled(rom, self.cpu.opcodes)
+
+        self.ppu = Ppu(rom)
+        self.apu = Apu(self.cpu.read_from_memory)
+        # Samples produced by the last frame
+        self.audio: 'npt.NDArray[np.float32]' = np.zeros(0, dtype=np.float32)
+        self.controllers = (Controller(), Controller())
+        self.frame = FrameBuffer()
+        self.renderer = Renderer(self.ppu)
+        self.frame_count = 0
+        self.metrics = Metrics()
+        # Drawing into the frame buffer is skipped while False, for fast-forwarding through frames nobody looks at
+        self.render = True
+
+        # 2 KiB of internal ram is mirrored every 2 KiB up to $1FFF
+        self.cpu.bus.map(
+            RAM_SIZE, RAM_MIRRORS_END, reader=self._read_ram_mirror, writer=self._write_ram_mirror, idempotent=True
+        )
+        metrics = self.metrics
+        self.cpu.bus.map(
+            PPU_REGISTERS_START,
+            PPU_REGISTERS_END,
+            reader=metrics.timed_reader(self.ppu.read_register),
+            writer=metrics.timed_writer(self.ppu.write_register),
+            # So vblank waits polling PPUSTATUS are skipped
+            idempotent=ppu_read_is_idempotent,
+        )
+        self.cpu.bus.map(
+            IO_REGISTERS_START,
+            IO_REGISTERS_END,
+            reader=metrics.timed_reader(self._read_io),
+            writer=metrics.timed_writer(self._write_io),
+        )
+
+        self.reset()
+
+    @property
+    def ram(self) -> memoryview:
+        """The 2 KiB of internal ram, without copying."""
+        return memoryview(self.cpu.memory)[:RAM_SIZE]
+
+    def reset(self) -> None:
+        """Start executing from the address stored in the reset vector."""
+        memory = self.cpu.memory
+        self.cpu.program_counter = memory[RESET_VECTOR] | memory[RESET_VECTOR + 1] << 8
+
+    def run_frame(self) -> None:
+        clock = time.perf_counter
+        self.metrics.start_frame()
+        start = clock()
+        self.cpu.run((self.frame_count + 1) * CPU_CYCLES_PER_FRAME)
+        cpu_done = clock()
+        self.audio = self.apu.end_frame(self.cpu.cycles, synthesize=self.render)
+        apu_done = clock()
+        self.ppu.flush()
+        if self.render:
+            self.draw()
+        self.metrics.record_frame(cpu=cpu_done - start, ppu=clock() - apu_done, apu=apu_done - cpu_done)
+        self.frame_count += 1
+
+    def draw(self) -> None:
+        """Draw the frame from the PPU's state, e.g. for a frame that was run with render off."""
+        self.renderer.render(self.frame)
+        self.frame.end_frame()
+
+    def save_state(self) -> bytes:
+        """Snapshot of the console, enough to resume emulation deterministically from this frame."""
+        header = _STATE_HEADER.pack(
+            self.frame_count, self.controllers[0].save_state(), self.controllers[1].save_state()
+        )
+        return header + self.apu.save_state() + self.ppu.save_state() + self.cpu.save_state()
+
+    def load_state(self, state: bytes) -> None:
+        self.frame_count, controller_1, controller_2 = _STATE_HEADER.unpack_from(state)
+        self.controllers[0].load_state(controller_1)
+        self.controllers[1].load_state(controller_2)
+
+        apu_start = _STATE_HEADER.size
+        ppu_start = apu_start + self.apu.state_size
+        cpu_start = ppu_start + self.ppu.state_size
+        self.apu.load_state(state[apu_start:ppu_start])
+        self.ppu.load_state(state[ppu_start:cpu_start])
+        self.cpu.load_state(state[cpu_start:])
+
+    def _read_ram_mirror(self, address: int) -> int:
+        return self.cpu.memory[address % RAM_SIZE]
+
+    def _write_ram_mirror(self, address: int, value: int) -> None:
+        self.cpu.memory[address % RAM_SIZE] = value
+
+    def _read_io(self, address: int) -> int:
+        if address == CONTROLLER_1:
+            return self.controllers[0].read()
+        if address == CONTROLLER_2:
+            return self.controllers[1].read()
+        if address == APU_STATUS:
+            return self.apu.read_status(self.cpu.cycles)
+        return self.cpu.memory[address]
+
+    def _write_io(self, address: int, value: int) -> None:
+        if address == CONTROLLER_1:
+            # Strobe is wired to both controllers
+            for controller in self.controllers:
+                controller.write(value)
+        elif address == OAM_DMA:
+            self._oam_dma(value)
+        elif address <= CONTROLLER_2:
+            # Everything else up to $4017 is the APU's, the second controller's address is its frame counter
+            self.apu.write(address, value, self.cpu.cycles)
+        else:
+            self.cpu.memory[address] = value
+
+    def _oam_dma(self, page: int) -> None:
+        """Copy a page of cpu memory into OAM in one go, and stall the cpu for the duration of the transfer."""
+        start = page * PAGE_SIZE
+        reader = self.cpu.bus.readers[page]
+        if reader == self._read_ram_mirror:
+            start %= RAM_SIZE
+        if reader is None or reader == self._read_ram_mirror:
+            end = start + PAGE_SIZE
+            data = bytes(self.cpu.memory[start:end])
+        else:
+            # Registers (or watched memory), read one at a time for their side effects
+            data = bytes(self.cpu.read_from_memory(address) for address in range(start, start + PAGE_SIZE))
+
+        self.ppu.dma(data)
+        self.cpu.cycles += OAM_DMA_CYCLES + (self.cpu.cycles & 1)
@@ -0,0 +1,120 @@
+import dataclasses
+from dataclasses import dataclass
+from typing import Callable
+from typing import Dict
+from typing import TYPE_CHECKING
+
+from pynes.addressing_mode import AddressingMode
+from pynes.cpu import Variant
+from pynes.instructions import add
+from pynes.instructions import and_
+from pynes.instructions import asl
+from pynes.instructions import bit
+from pynes.instructions import branch
+from pynes.instructions import clear
+from pynes.instructions import cmp
+
+if TYPE_CHECKING:  # pragma: no cover
+    from pynes.cpu import Cpu
+
+Execute = Callable[['Cpu', int], None]
+
+
+@dataclass(frozen=True)
+class Opcode:
+    """Decoding information for a single opcode byte.
+
+    size is the instruction length in bytes, including the opcode itself. cycles is the base cycle count, extra cycles
+    for page crossing and taken branches are not accounted for.
+    """
+
+    mnemonic: str
+    addressing_mode: AddressingMode
+    size: int
+    cycles: int
+    execute: Execute
+
+
+def signed_offset(value: int) -> int:
+    """Relative addressing operands are two's complement offsets from the next instruction."""
+    return value - 0x100 if value & 0x80 else value
+
+
+def _addressed(instruction: Callable[['Cpu', AddressingMode, int], None], mode: AddressingMode) -> Execute:
+    return lambda cpu, operand: instruction(cpu, mode, operand)
+
+
+def _accumulator(instruction: Callable[['Cpu', AddressingMode], None]) -> Execute:
+    return lambda cpu, operand: instruction(cpu, AddressingMode.accumulator)
+
+
+def _relative(instruction: Callable[['Cpu', int], None]) -> Execute:
+    return lambda cpu, operand: instruction(cpu, signed_offset(operand))
+
+
+def _implied(instruction: Callable[['Cpu'], None]) -> Execute:
+    return lambda cpu, operand: instruction(cpu)
+
+
+# fmt: off
+OPCODES: Dict[int, Opcode] = {
+    0x69: Opcode('ADC', AddressingMode.immediate, 2, 2, _addressed(add.add_with_carry, AddressingMode.immediate)),
+    0x65: Opcode('ADC', AddressingMode.zero_page, 2, 3, _addressed(add.add_with_carry, AddressingMode.zero_page)),
+    0x6D: Opcode('ADC', AddressingMode.absolute, 3, 4, _addressed(add.add_with_carry, AddressingMode.absolute)),
+
+    0x29: Opcode('AND', AddressingMode.immediate, 2, 2, _addressed(and_.and_, AddressingMode.immediate)),
+    0x25: Opcode('AND', AddressingMode.zero_page, 2, 3, _addressed(and_.and_, AddressingMode.zero_page)),
+    0x2D: Opcode('AND', AddressingMode.absolute, 3, 4, _addressed(and_.and_, AddressingMode.absolute)),
+
+    0x0A: Opcode('ASL', AddressingMode.accumulator, 1, 2, _accumulator(asl.asl)),
+
+    0x24: Opcode('BIT', AddressingMode.zero_page, 2, 3, bit.bit),
+    0x2C: Opcode('BIT', AddressingMode.absolute, 3, 4, bit.bit),
+
+    0x90: Opcode('BCC', AddressingMode.relative, 2, 2, _relative(branch.branch_if_carry_clear)),
+    0xB0: Opcode('BCS', AddressingMode.relative, 2, 2, _relative(branch.branch_if_carry_set)),
+    0xF0: Opcode('BEQ', AddressingMode.relative, 2, 2, _relative(branch.branch_if_equal)),
+    0x30: Opcode('BMI', AddressingMode.relative, 2, 2, _relative(branch.branch_if_minus)),
+    0xD0: Opcode('BNE', AddressingMode.relative, 2, 2, _relative(branch.branch_if_not_equal)),
+    0x10: Opcode('BPL', AddressingMode.relative, 2, 2, _relative(branch.branch_if_positive)),
+    0x50: Opcode('BVC', AddressingMode.relative, 2, 2, _relative(branch.branch_if_overflow_clear)),
+    0x70: Opcode('BVS', AddressingMode.relative, 2, 2, _relative(branch.branch_if_overflow_set)),
+
+    0x18: Opcode('CLC', AddressingMode.implied, 1, 2, _implied(clear.clear_carry)),
+    0xD8: Opcode('CLD', AddressingMode.implied, 1, 2, _implied(clear.clear_decimal)),
+    0x58: Opcode('CLI', AddressingMode.implied, 1, 2, _implied(clear.clear_interrupt)),
+    0xB8: Opcode('CLV', AddressingMode.implied, 1, 2, _implied(clear.clear_overflow)),
+
+    # The compare instructions only support memory operands for now
+    0xC5: Opcode('CMP', AddressingMode.zero_page, 2, 3, cmp.cmp),
+    0xCD: Opcode('CMP', AddressingMode.absolute, 3, 4, cmp.cmp),
+    0xE4: Opcode('CPX', AddressingMode.zero_page, 2, 3, cmp.cpx),
+    0xEC: Opcode('CPX', AddressingMode.absolute, 3, 4, cmp.cpx),
+    0xC4: Opcode('CPY', AddressingMode.zero_page, 2, 3, cmp.cpy),
+    0xCC: Opcode('CPY', AddressingMode.absolute, 3, 4, cmp.cpy),
+}
+# fmt: on
+
+# Opcodes the 65C02 added, on top of the NMOS ones
+CMOS_OPCODES: Dict[int, Opcode] = {
+    0x89: Opcode('BIT', AddressingMode.immediate, 2, 2, bit.bit_immediate),
+}
+
+
+def opcode_table(variant: Variant) -> Dict[int, Opcode]:
+    """Opcodes of a cpu variant, built when the cpu is created.
+
+    The 2A03 gets OPCODES itself, so the NES runs binary ADC without ever looking at the decimal flag. The other
+    variants get a copy with decimal aware ADC, and the 65C02 its extra opcodes.
+    """
+    if variant == Variant.ricoh_2a03:
+        return OPCODES
+
+    adc = add.cmos_add_with_carry if variant == Variant.wdc_65c02 else add.nmos_add_with_carry
+    table = dict(OPCODES)
+    for value, opcode in OPCODES.items():
+        if opcode.mnemonic == 'ADC':
+            table[value] = dataclasses.replace(opcode, execute=_addressed(adc, opcode.addressing_mode))
+    if variant == Variant.wdc_65c02:
+        table.update(CMOS_OPCODES)
+    return table
@@ -0,0 +1,246 @@
+import struct
+from typing import Tuple
+
+from pynes.rom import CHR_ROM_BANK_SIZE
+from pynes.rom import Rom
+
+# The 8 registers are mirrored every 8 bytes up to $3FFF
+REGISTERS_START = 0x2000
+REGISTERS_END = 0x3FFF
+PPUCTRL = 0
+PPUMASK = 1
+PPUSTATUS = 2
+OAMADDR = 3
+OAMDATA = 4
+PPUSCROLL = 5
+PPUADDR = 6
+PPUDATA = 7
+
+# Writing a page number here copies that page of cpu memory into OAM
+OAM_DMA = 0x4014
+# Cycles the cpu is halted for by OAM DMA, plus one when it starts on an odd cycle
+OAM_DMA_CYCLES = 513
+
+OAM_SIZE = 0x100
+PALETTE_SIZE = 0x20
+NAME_TABLE_SIZE = 0x400
+
+# PPU address space
+ADDRESS_MASK = 0x3FFF
+NAME_TABLES_START = 0x2000
+PALETTE_START = 0x3F00
+
+CTRL_INCREMENT_32 = 0x04
+STATUS_VBLANK = 0x80
+
+# ctrl, mask, status, oam address, vram address, temporary vram address, fine x scroll, write toggle, read buffer
+_REGISTERS = struct.Struct('<BBBBHHB?B')
+
+
+def palette_index(address: int) -> int:
+    """The backdrop entries of the sprite palettes ($3F10, $3F14, $3F18, $3F1C) mirror those of the background."""
+    index = address & (PALETTE_SIZE - 1)
+    if index & 0x13 == 0x10:
+        index &= ~0x10
+    return index
+
+
+def read_is_idempotent(address: int) -> bool:
+    """PPUDATA reads advance the vram address. Other registers at most clear flags, which a second read leaves alone."""
+    return address & 0x07 != PPUDATA
+
+
+class Ppu:
+    """Picture processing unit: its registers and memory, as seen through $2000-$2007.
+
+    - Pattern tables: CHR ROM, or 8 KiB of CHR RAM when the cartridge has none
+    - 2 KiB of name tables, mirrored horizontally or vertically into the 4 name table slots
+    - 32 bytes of palette
+    - 256 bytes of OAM (sprite attributes), filled through OAMDATA or OAM DMA
+
+    Games upload name tables through long runs of PPUDATA writes, each advancing the vram address by a fixed step. The
+    writes are queued and applied as slice copies, one per contiguous run of memory, when the run ends: on any other
+    register access, or flush(). Callers looking at vram directly must flush() first.
+    """
+
+    def __init__(self, rom: Rom) -> None:
+        self.ctrl = 0
+        self.mask = 0
+        self.status = 0
+        self.oam_address = 0
+        self.oam = bytearray(OAM_SIZE)
+        self.chr_writable = not rom.chr_rom
+        self.chr = bytearray(CHR_ROM_BANK_SIZE) if self.chr_writable else bytearray(rom.chr_rom)
+        self.name_tables = bytearray(2 * NAME_TABLE_SIZE)
+        self.palette = bytearray(PALETTE_SIZE)
+        self.vertical_mirroring = rom.vertical_mirroring
+
+        # Internal registers: current (v) and temporary (t) vram address, fine x scroll and the shared write toggle of
+        # PPUSCROLL and PPUADDR
+        self.vram_address = 0
+        self.temp_address = 0
+        self.fine_x = 0
+        self._write_toggle = False
+        # PPUDATA reads return the previous read, except for palette reads
+        self._read_buffer = 0
+
+        # Queued PPUDATA writes, starting at _pending_start and _pending_step apart
+        self._pending = bytearray()
+        self._pending_start = 0
+        self._pending_step = 1
+
+    @property
+    def increment(self) -> int:
+        """How far the vram address advances after each PPUDATA access."""
+        return 32 if self.ctrl & CTRL_INCREMENT_32 else 1
+
+    @property
+    def state_size(self) -> int:
+        return len(self.save_state())
+
+    def read_register(self, address: int) -> int:
+        register = address & 0x07
+        if register == PPUSTATUS:
+            value = self.status
+            self.status &= ~STATUS_VBLANK
+            self._write_toggle = False
+            return value
+        if register == OAMDATA:
+            return self.oam[self.oam_address]
+        if register == PPUDATA:
+            return self._read_data()
+        # Write only registers
+        return 0
+
+    def write_register(self, address: int, value: int) -> None:
+        register = address & 0x07
+        if register == PPUDATA:
+            if not self._pending:
+                self._pending_start = self.vram_address
+                self._pending_step = self.increment
+            self._pending.append(value)
+            self.vram_address = (self.vram_address + self._pending_step) & 0x7FFF
+            return
+
+        self.flush()
+        if register == PPUCTRL:
+            self.ctrl = value
+            # Base name table select
+            self.temp_address = (self.temp_address & ~0x0C00) | (value & 0x03) << 10
+        elif register == PPUMASK:
+            self.mask = value
+        elif register == OAMADDR:
+            self.oam_address = value
+        elif register == OAMDATA:
+            self.oam[self.oam_address] = value
+            self.oam_address = (self.oam_address + 1) & 0xFF
+        elif register == PPUSCROLL:
+            if self._write_toggle:
+                # Fine y and coarse y
+                self.temp_address = (self.temp_address & ~0x73E0) | (value & 0x07) << 12 | (value & 0xF8) << 2
+            else:
+                self.temp_address = (self.temp_address & ~0x001F) | value >> 3
+                self.fine_x = value & 0x07
+            self._write_toggle = not self._write_toggle
+        elif register == PPUADDR:
+            if self._write_toggle:
+                self.temp_address = (self.temp_address & 0x7F00) | value
+                self.vram_address = self.temp_address
+            else:
+                self.temp_address = (self.temp_address & 0x00FF) | (value & 0x3F) << 8
+            self._write_toggle = not self._write_toggle
+
+    def dma(self, page: bytes) -> None:
+        """OAM DMA: copy a page into OAM, starting at the OAM address and wrapping around."""
+        start = self.oam_address
+        split = OAM_SIZE - start
+        self.oam[start:] = page[:split]
+        self.oam[:start] = page[split:]
+
+    def flush(self) -> None:
+        """Apply queued PPUDATA writes, a slice at a time."""
+        data = self._pending
+        if not data:
+            return
+
+        address = self._pending_start
+        step = self._pending_step
+        start = 0
+        while start < len(data):
+            address &= ADDRESS_MASK
+            memory, offset, room = self._locate(address)
+            # Number of writes landing in this stretch of memory
+            count = min(len(data) - start, -(-room // step))
+            end = start + count
+            if memory is not self.chr or self.chr_writable:
+                stop = offset + count * step
+                memory[offset:stop:step] = data[start:end]
+            address += count * step
+            start = end
+        data.clear()
+
+    def read_vram(self, address: int) -> int:
+        self.flush()
+        memory, offset, _ = self._locate(address & ADDRESS_MASK)
+        return memory[offset]
+
+    def save_state(self) -> bytes:
+        self.flush()
+        registers = _REGISTERS.pack(
+            self.ctrl,
+            self.mask,
+            self.status,
+            self.oam_address,
+            self.vram_address,
+            self.temp_address,
+            self.fine_x,
+            self._write_toggle,
+            self._read_buffer,
+        )
+        chr_ram = self.chr if self.chr_writable else b''
+        return registers + self.oam + self.name_tables + self.palette + chr_ram
+
+    def load_state(self, state: bytes) -> None:
+        self._pending.clear()
+        (
+            self.ctrl,
+            self.mask,
+            self.status,
+            self.oam_address,
+            self.vram_address,
+            self.temp_address,
+            self.fine_x,
+            self._write_toggle,
+            self._read_buffer,
+        ) = _REGISTERS.unpack_from(state)
+
+        offset = _REGISTERS.size
+        for memory in (self.oam, self.name_tables, self.palette) + ((self.chr,) if self.chr_writable else ()):
+            end = offset + len(memory)
+            memory[:] = state[offset:end]
+            offset = end
+
+    def _read_data(self) -> int:
+        address = self.vram_address & ADDRESS_MASK
+        if address >= PALETTE_START:
+            # Palette reads aren't buffered, the buffer is filled with the name table byte underneath instead
+            value = self.read_vram(address)
+            self._read_buffer = self.read_vram(address - 0x1000)
+        else:
+            value = self._read_buffer
+            self._read_buffer = self.read_vram(address)
+        self.vram_address = (self.vram_address + self.increment) & 0x7FFF
+        return value
+
+    def _locate(self, address: int) -> Tuple[bytearray, int, int]:
+        """Memory backing a ppu address: the buffer, the offset in it, and how many bytes are contiguous from there."""
+        if address < NAME_TABLES_START:
+            return self.chr, address, NAME_TABLES_START - address
+        if address < PALETTE_START:
+            # $3000-$3EFF mirrors $2000-$2EFF
+            table = (address >> 10) & 0x03
+            physical = table & 0x01 if self.vertical_mirroring else table >> 1
+            offset = address & (NAME_TABLE_SIZE - 1)
+            room = min(NAME_TABLE_SIZE - offset, PALETTE_START - address)
+            return self.name_tables, physical * NAME_TABLE_SIZE + offset, room
+        return self.palette, palette_index(address), 1
@@ -0,0 +1,154 @@
+import hashlib
+import importlib.util
+import os
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Set
+from typing import TYPE_CHECKING
+
+from pynes import cache
+from pynes.addressing_mode import AddressingMode
+from pynes.disassembler import Analysis
+from pynes.disassembler import Instruction
+from pynes.disassembler import block_exit
+from pynes.disassembler import decode
+from pynes.disassembler import load_analysis
+from pynes.disassembler import opcodes_fingerprint
+from pynes.opcodes import OPCODES
+from pynes.opcodes import signed_offset
+from pynes.rom import Rom
+
+if TYPE_CHECKING:  # pragma: no cover
+    from pynes.cpu import Cpu
+    from pynes.opcodes import Opcode
+
+# Bump when the generated code changes
+RECOMPILER_VERSION = 2
+
+Block = Callable[['Cpu', int], None]
+
+# Branches and flag instructions are translated to plain Python, everything else calls the opcode's implementation
+BRANCH_CONDITIONS = {
+    'BCC': 'not cpu.status.carry',
+    'BCS': 'cpu.status.carry',
+    'BEQ': 'cpu.status.zero',
+    'BMI': 'cpu.status.negative',
+    'BNE': 'not cpu.status.zero',
+    'BPL': 'not cpu.status.negative',
+    'BVC': 'not cpu.status.overflow',
+    'BVS': 'cpu.status.overflow',
+}
+CLEARED_FLAGS = {
+    'CLC': 'carry',
+    'CLD': 'decimal',
+    'CLI': 'interrupt_disable',
+    'CLV': 'overflow',
+}
+
+
+def _translate_instruction(instruction: Instruction, last: bool, used: Set[int]) -> List[str]:
+    opcode = OPCODES[instruction.opcode]
+    next_address = instruction.address + instruction.size
+    lines = [f'# ${instruction.address:04X}  {instruction}']
+
+    condition = BRANCH_CONDITIONS.get(instruction.mnemonic)
+    if condition is not None and instruction.addressing_mode == AddressingMode.relative:
+        offset = signed_offset(instruction.operand)
+        lines += [f'if {condition}:', f'    cpu.program_counter = {next_address + offset:#06x}']
+        if offset < 0:
+            lines += [
+                '    if cpu.idle_loop_detector is not None:',
+                f'        cpu.idle_loop_detector.backward_branch(cpu, {offset})',
+            ]
+        lines += ['else:', f'    cpu.program_counter = {next_address:#06x}']
+    elif instruction.mnemonic in CLEARED_FLAGS:
+        lines.append(f'cpu.status.{CLEARED_FLAGS[instruction.mnemonic]} = False')
+    else:
+        if block_exit(instruction) is not None:
+            # Control flow the recompiler doesn't know about, let the instruction set the program counter
+            lines.append(f'cpu.program_counter = {next_address:#06x}')
+        lines.append(f'_execute_{instruction.opcode:02X}(cpu, {instruction.operand:#x})')
+        used.add(instruction.opcode)
+
+    lines.append(f'cpu.cycles += {opcode.cycles}')
+    if not last:
+        # Stop where the interpreter would, the instruction that reaches until is the last one run
+        lines += ['if cpu.cycles >= until:', f'    cpu.program_counter = {next_address:#06x}', '    return']
+    elif block_exit(instruction) is None:
+        # Falls through into the next block
+        lines.append(f'cpu.program_counter = {next_address:#06x}')
+    return lines
+
+
+def translate(memory: bytearray, analysis: Analysis, name: str = '') -> str:
+    """Python source of a module with a function per basic block.
+
+    The module's bind(opcodes) returns the blocks by start address, calling the instruction implementations of the
+    cpu's opcode table, so every cpu variant runs its own semantics. Blocks run until they end or the cpu reaches the
+    cycle it is run until, with the same effects as interpreting them instruction by instruction. Decoding happens
+    once, here, so operands and cycle counts become constants.
+    """
+    functions = []
+    used: Set[int] = set()
+    for start, block in sorted(analysis.blocks.items()):
+        instructions = []
+        address = start
+        while address < block.end:
+            instruction = decode(memory, address)
+            assert instruction is not None, f'Undecodable instruction in block at ${address:04X}'
+            instructions.append(instruction)
+            address += instruction.size
+
+        body = []
+        for index, instruction in enumerate(instructions):
+            body += _translate_instruction(instruction, index == len(instructions) - 1, used)
+        functions += [f'def block_{start:04X}(cpu, until):'] + [f'    {line}' for line in body] + ['']
+
+    lines = [f'_execute_{opcode:02X} = opcodes[{opcode:#04x}].execute' for opcode in sorted(used)] + ['']
+    lines += functions
+    lines += ['return {'] + [f'    {start:#06x}: block_{start:04X},' for start in sorted(analysis.blocks)] + ['}']
+    header = [
+        f'# Generated by pynes.recompiler from {name or "a rom"}, do not edit',
+        f'# Recompiler version {RECOMPILER_VERSION}, opcodes {opcodes_fingerprint()}',
+        '',
+        '',
+        'def bind(opcodes):',
+    ]
+    return '\n'.join(header + [f'    {line}' if line else '' for line in lines]) + '\n'
+
+
+def module_path(rom: Rom) -> str:
+    key = hashlib.sha1(f'{RECOMPILER_VERSION}:{opcodes_fingerprint()}'.encode()).hexdigest()[:12]
+    return os.path.join(cache.cache_dir('recompiled'), f'rom_{rom.sha1}_{key}.py')
+
+
+def recompile(rom: Rom) -> str:
+    """Translate all code found by static analysis of the rom, and cache the module on disk. Returns its source."""
+    memory = bytearray(0x10000)
+    rom.load_into(memory)
+    source = translate(memory, load_analysis(rom), name=rom.sha1)
+    cache.write(module_path(rom), source.encode())
+    return source
+
+
+def load(rom: Rom, opcodes: Dict[int, 'Opcode']) -> Dict[int, Block]:
+    """Blocks of the rom's recompiled module bound to opcodes (the cpu's), translating it first if it's not cached yet.
+
+    The module is imported from the cache, so Python caches its bytecode next to it and later loads skip compiling it.
+    When the cache isn't writable, the source is compiled in memory instead.
+    """
+    path = module_path(rom)
+    if not os.path.exists(path):
+        source = recompile(rom)
+        if not os.path.exists(path):
+            namespace: Dict[str, Callable[[Dict[int, 'Opcode']], Dict[int, Block]]] = {}
+            exec(compile(source, path, 'exec'), namespace)  # pylint: disable=exec-used
+            return namespace['bind'](opcodes)
+
+    spec = importlib.util.spec_from_file_location(os.path.splitext(os.path.basename(path))[0], path)
+    assert spec is not None and spec.loader is not None
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    blocks: Dict[int, Block] = module.bind(opcodes)
+    return blocks
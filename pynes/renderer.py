@@ -0,0 +1,213 @@
+from typing import Tuple
+
+import numpy as np
+import numpy.typing as npt
+
+from pynes.ppu import NAME_TABLE_SIZE
+from pynes.ppu import Ppu
+from pynes.video import FrameBuffer
+from pynes.video import HEIGHT
+from pynes.video import WIDTH
+
+TILE_SIZE = 8
+TILES_PER_TABLE = 256
+# Tiles on a name table, the rest of it is attributes
+NAME_TABLE_COLUMNS = 32
+NAME_TABLE_ROWS = 30
+ATTRIBUTES_START = NAME_TABLE_COLUMNS * NAME_TABLE_ROWS
+# The 4 name tables, as a 2x2 grid of screens to scroll over
+WORLD_WIDTH = 2 * WIDTH
+WORLD_HEIGHT = 2 * HEIGHT
+
+CTRL_SPRITE_TABLE = 0x08
+CTRL_BACKGROUND_TABLE = 0x10
+CTRL_SPRITE_16 = 0x20
+
+MASK_GREYSCALE = 0x01
+MASK_BACKGROUND_LEFT = 0x02
+MASK_SPRITES_LEFT = 0x04
+MASK_LEFT = MASK_BACKGROUND_LEFT | MASK_SPRITES_LEFT
+MASK_BACKGROUND = 0x08
+MASK_SPRITES = 0x10
+MASK_EMPHASIS_SHIFT = 5
+
+STATUS_SPRITE_0_HIT = 0x40
+
+SPRITE_COUNT = 64
+MAX_SPRITES_PER_LINE = 8
+SPRITE_PALETTES = 0x10
+ATTRIBUTE_PALETTE = 0x03
+ATTRIBUTE_BEHIND = 0x20
+ATTRIBUTE_FLIP_X = 0x40
+ATTRIBUTE_FLIP_Y = 0x80
+
+
+def decode_patterns(chr_data: bytes) -> npt.NDArray[np.uint8]:
+    """Pattern tables as 2 bit colors, indexed by [tile, row, column]."""
+    planes = np.frombuffer(chr_data, dtype=np.uint8).reshape(-1, 2, TILE_SIZE)
+    bits = np.unpackbits(planes, axis=2).reshape(-1, 2, TILE_SIZE, TILE_SIZE)
+    return (bits[:, 0] | bits[:, 1] << 1).astype(np.uint8)
+
+
+class Renderer:
+    """Draws the PPU's picture into a FrameBuffer, one scanline at a time.
+
+    The whole frame is drawn at its end, with the scroll, pattern tables and sprites as they are at that point. Register
+    writes take effect when the cpu makes them (only PPUDATA writes are batched, see Ppu), but the PPU doesn't keep
+    track of the scanline they happen on. So effects that change registers mid-frame are lost: a status bar split off by
+    rewriting the scroll partway down is drawn with the final scroll, like the rest of the screen. Each scanline of
+    background is drawn with a handful of vectorized array operations, looking tiles up in pattern tables decoded ahead
+    of time. Sprites are then laid over the finished background. Sprite 0 hit is reported for the next frame to find.
+    """
+
+    def __init__(self, ppu: Ppu) -> None:
+        self.ppu = ppu
+        self._chr = bytes(ppu.chr)
+        self._patterns = decode_patterns(self._chr)
+        self._columns = np.arange(WIDTH)
+        self._lines = np.arange(HEIGHT)
+        # Layers, reused for every frame
+        self._background = np.zeros((HEIGHT, WIDTH), dtype=np.uint8)
+        self._sprites = np.zeros((HEIGHT, WIDTH), dtype=np.uint8)
+        self._sprites_behind = np.zeros((HEIGHT, WIDTH), dtype=np.bool_)
+
+    def render(self, frame: FrameBuffer) -> None:
+        ppu = self.ppu
+        ppu.flush()
+        pixels = np.frombuffer(frame.pixels, dtype=np.uint8).reshape(HEIGHT, WIDTH)
+        frame.emphasis = ppu.mask >> MASK_EMPHASIS_SHIFT
+        colors = self._colors()
+        ppu.status &= ~STATUS_SPRITE_0_HIT
+
+        if not ppu.mask & (MASK_BACKGROUND | MASK_SPRITES):
+            # Rendering is off, the screen shows the backdrop
+            pixels.fill(colors[0])
+            return
+
+        if ppu.chr_writable and ppu.chr != self._chr:
+            self._chr = bytes(ppu.chr)
+            self._patterns = decode_patterns(self._chr)
+
+        # Palette index of every pixel, 0 where the background is transparent
+        background = self._background
+        if ppu.mask & MASK_BACKGROUND:
+            self._draw_background(background)
+        else:
+            background.fill(0)
+
+        indices = self._draw_sprites(background) if ppu.mask & MASK_SPRITES else background
+        # Transparent pixels pick up the backdrop from color 0
+        np.take(colors, indices, out=pixels, mode='clip')
+
+    def _draw_background(self, background: npt.NDArray[np.uint8]) -> None:
+        ppu = self.ppu
+        tiles, palettes = self._world()
+        # The scroll position is the top left corner of the screen, in the world of 4 name tables
+        scroll = ppu.temp_address
+        scroll_x = (scroll & 0x1F) * TILE_SIZE + ppu.fine_x + (scroll >> 10 & 1) * WIDTH
+        scroll_y = (scroll >> 5 & 0x1F) * TILE_SIZE + (scroll >> 12 & 0x07) + (scroll >> 11 & 1) * HEIGHT
+        world_x = (scroll_x + self._columns) % WORLD_WIDTH
+        tile_columns = world_x // TILE_SIZE
+        tile_x = world_x % TILE_SIZE
+        table = TILES_PER_TABLE if ppu.ctrl & CTRL_BACKGROUND_TABLE else 0
+
+        for line in range(HEIGHT):
+            world_y = (scroll_y + line) % WORLD_HEIGHT
+            row = world_y // TILE_SIZE
+            pattern = self._patterns[table + tiles[row, tile_columns], world_y % TILE_SIZE, tile_x]
+            background[line] = np.where(pattern != 0, palettes[row, tile_columns] | pattern, 0)
+        if not ppu.mask & MASK_BACKGROUND_LEFT:
+            background[:, :TILE_SIZE] = 0
+
+    def _colors(self) -> npt.NDArray[np.uint8]:
+        """The palette as the PPU's colors, with the backdrop mirrored into color 0 of every palette."""
+        colors = np.frombuffer(self.ppu.palette, dtype=np.uint8).copy()
+        colors &= 0x3F
+        if self.ppu.mask & MASK_GREYSCALE:
+            colors &= 0x30
+        colors[::4] = colors[0]
+        return colors
+
+    def _world(self) -> Tuple[npt.NDArray[np.intp], npt.NDArray[np.intp]]:
+        """Tile numbers and palette offsets of the 4 name tables, laid out as a grid of 60x64 tiles."""
+        ppu = self.ppu
+        tiles = np.zeros((2 * NAME_TABLE_ROWS, 2 * NAME_TABLE_COLUMNS), dtype=np.intp)
+        palettes = np.zeros_like(tiles)
+        rows = np.arange(NAME_TABLE_ROWS)[:, np.newaxis]
+        columns = np.arange(NAME_TABLE_COLUMNS)[np.newaxis, :]
+        # Each attribute byte covers 4x4 tiles, 2 bits per quadrant of 2x2 tiles
+        shifts = (rows >> 1 & 1) * 4 + (columns >> 1 & 1) * 2
+        name_tables = np.frombuffer(self.ppu.name_tables, dtype=np.uint8).reshape(-1, NAME_TABLE_SIZE)
+        for table in range(4):
+            name_table = name_tables[table & 0x01 if ppu.vertical_mirroring else table >> 1]
+            attributes = name_table[ATTRIBUTES_START:].reshape(8, 8)[rows >> 2, columns >> 2]
+
+            top = (table >> 1) * NAME_TABLE_ROWS
+            left = (table & 1) * NAME_TABLE_COLUMNS
+            bottom = top + NAME_TABLE_ROWS
+            right = left + NAME_TABLE_COLUMNS
+            tiles[top:bottom, left:right] = name_table[:ATTRIBUTES_START].reshape(NAME_TABLE_ROWS, NAME_TABLE_COLUMNS)
+            palettes[top:bottom, left:right] = (attributes >> shifts & 3) << 2
+        return tiles, palettes
+
+    def _draw_sprites(self, background: npt.NDArray[np.uint8]) -> npt.NDArray[np.uint8]:
+        """Lay the sprites over the background's palette indices, in place, and return it.
+
+        Sprites are drawn one at a time into a layer covering the frame, from the back so lower numbered sprites end up
+        in front. Like the hardware, only the first 8 sprites of each scanline are drawn.
+        """
+        ppu = self.ppu
+        layer = self._sprites
+        behind = self._sprites_behind
+        layer.fill(0)
+
+        sprites = np.frombuffer(ppu.oam, dtype=np.uint8).reshape(SPRITE_COUNT, 4).astype(np.intp)
+        height = 2 * TILE_SIZE if ppu.ctrl & CTRL_SPRITE_16 else TILE_SIZE
+        # Row of each sprite on each scanline. Sprites are drawn one line below their y coordinate.
+        offsets = self._lines - 1 - sprites[:, :1]
+        on_line = (offsets >= 0) & (offsets < height)
+        on_line &= np.cumsum(on_line, axis=0) <= MAX_SPRITES_PER_LINE
+
+        for number in np.flatnonzero(on_line.any(axis=1))[::-1]:
+            _, tile, attributes, x = sprites[number]
+            lines = np.flatnonzero(on_line[number])
+            rows = offsets[number, lines]
+            if attributes & ATTRIBUTE_FLIP_Y:
+                rows = height - 1 - rows
+            if height == TILE_SIZE:
+                tiles = tile + (TILES_PER_TABLE if ppu.ctrl & CTRL_SPRITE_TABLE else 0)
+            else:
+                # 8x16 sprites pick their pattern table with bit 0, and are two tiles stacked
+                tiles = (tile & 1) * TILES_PER_TABLE + (tile & 0xFE) + (rows >= TILE_SIZE)
+            end = min(x + TILE_SIZE, WIDTH)
+            pattern = self._patterns[tiles, rows % TILE_SIZE]
+            if attributes & ATTRIBUTE_FLIP_X:
+                pattern = pattern[:, ::-1]
+            pattern = pattern[:, : end - x]
+
+            opaque = pattern != 0
+            block = layer[lines, x:end]
+            block[opaque] = SPRITE_PALETTES | (attributes & ATTRIBUTE_PALETTE) << 2 | pattern[opaque]
+            layer[lines, x:end] = block
+            block_behind = behind[lines, x:end]
+            block_behind[opaque] = bool(attributes & ATTRIBUTE_BEHIND)
+            behind[lines, x:end] = block_behind
+
+            if number == 0:
+                self._sprite_0_hit(opaque & (background[lines, x:end] != 0), x, end)
+
+        if not ppu.mask & MASK_SPRITES_LEFT:
+            layer[:, :TILE_SIZE] = 0
+        # Sprites behind the background only show through its transparent pixels
+        shown = (layer != 0) & ~(behind & (background != 0))
+        np.copyto(background, layer, where=shown)
+        return background
+
+    def _sprite_0_hit(self, hits: npt.NDArray[np.bool_], start: int, end: int) -> None:
+        """Sprite 0 hit is set where an opaque pixel of it overlaps an opaque background pixel, except at x = 255."""
+        columns = self._columns[start:end]
+        hits = hits & (columns != WIDTH - 1)
+        if self.ppu.mask & MASK_LEFT != MASK_LEFT:
+            hits &= columns >= TILE_SIZE
+        if hits.any():
+            self.ppu.status |= STATUS_SPRITE_0_HIT
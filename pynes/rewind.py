@@ -0,0 +1,110 @@
+import collections
+import zlib
+from typing import Deque
+from typing import Optional
+from typing import Tuple
+
+import numpy as np
+
+from pynes.nes import Nes
+
+# 10 captures a second at 60 fps
+DEFAULT_INTERVAL = 6
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+# Deltas are mostly zeros, the fastest level compresses them about as well as the slowest
+COMPRESSION_LEVEL = 1
+
+
+def xor(a: bytes, b: bytes) -> bytes:
+    return np.bitwise_xor(np.frombuffer(a, dtype=np.uint8), np.frombuffer(b, dtype=np.uint8)).tobytes()
+
+
+class RewindBuffer:
+    """History of save states, for stepping back through recent gameplay.
+
+    A state is captured every interval frames. Only the latest state is kept in full, every older state is stored as
+    the XOR against the state after it, compressed. Consecutive states differ in a handful of bytes, so deltas
+    compress to a few hundred bytes. Stepping back is a single decompress and XOR, and the oldest states are dropped
+    by simply discarding their deltas once the history grows past max_bytes.
+    """
+
+    def __init__(self, nes: Nes, interval: int = DEFAULT_INTERVAL, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        if interval < 1:
+            raise ValueError(f'interval must be positive, got {interval}')
+
+        self.nes = nes
+        self.interval = interval
+        self.max_bytes = max_bytes
+        self._latest: Optional[bytes] = None
+        self._latest_frame = 0
+        # (frame, compressed XOR against the next newer state), oldest first
+        self._deltas: Deque[Tuple[int, bytes]] = collections.deque()
+        self._delta_bytes = 0
+
+    def __len__(self) -> int:
+        """Number of states that can be rewound to."""
+        return len(self._deltas) + (self._latest is not None)
+
+    @property
+    def nbytes(self) -> int:
+        return self._delta_bytes + (len(self._latest) if self._latest is not None else 0)
+
+    @property
+    def oldest_frame(self) -> Optional[int]:
+        if self._deltas:
+            return self._deltas[0][0]
+        return self._latest_frame if self._latest is not None else None
+
+    def capture(self) -> None:
+        """Called after every frame, keeps the state if it falls on the capture interval."""
+        if self.nes.frame_count % self.interval == 0:
+            self._push(self.nes.save_state())
+
+    def rewind(self) -> int:
+        """Restore the latest captured state before the current frame, if already at it drop it and go back one further.
+
+        The restored state stays in the history, until rewinding again from it. Returns the restored frame number.
+        Raises IndexError when there is no history left.
+        """
+        latest = self._latest
+        if latest is not None and self._latest_frame == self.nes.frame_count:
+            # Already at the latest state, go back to the one before it
+            latest = self._pop(latest)
+        if latest is None:
+            raise IndexError('No states left to rewind to')
+
+        self.nes.load_state(latest)
+        return self._latest_frame
+
+    def clear(self) -> None:
+        self._latest = None
+        self._deltas.clear()
+        self._delta_bytes = 0
+
+    def _push(self, state: bytes) -> None:
+        if self._latest is not None:
+            if len(state) != len(self._latest):
+                raise ValueError(f'State is {len(state)} bytes, history has {len(self._latest)} byte states')
+
+            delta = zlib.compress(xor(self._latest, state), COMPRESSION_LEVEL)
+            self._deltas.append((self._latest_frame, delta))
+            self._delta_bytes += len(delta)
+
+        self._latest = state
+        self._latest_frame = self.nes.frame_count
+
+        while self._deltas and self.nbytes > self.max_bytes:
+            _, delta = self._deltas.popleft()
+            self._delta_bytes -= len(delta)
+
+    def _pop(self, latest: bytes) -> Optional[bytes]:
+        """Drop the latest state, reconstructing the one before it from its delta."""
+        if not self._deltas:
+            self._latest = None
+            return None
+
+        frame, delta = self._deltas.pop()
+        self._delta_bytes -= len(delta)
+        self._latest = xor(latest, zlib.decompress(delta))
+        self._latest_frame = frame
+        return self._latest
@@ -0,0 +1,83 @@
+import hashlib
+from dataclasses import dataclass
+
+INES_MAGIC = b'NES\x1a'
+HEADER_SIZE = 16
+TRAINER_SIZE = 512
+PRG_ROM_BANK_SIZE = 0x4000
+CHR_ROM_BANK_SIZE = 0x2000
+
+PRG_ROM_START = 0x8000
+
+NMI_VECTOR = 0xFFFA
+RESET_VECTOR = 0xFFFC
+IRQ_VECTOR = 0xFFFE
+
+
+class RomFormatError(ValueError):
+    """Raised when a file is not a valid iNES image."""
+
+
+@dataclass(frozen=True)
+class Rom:
+    """Cartridge contents, parsed from an iNES image.
+
+    - 16 byte header: magic, PRG ROM size in 16 KiB banks, CHR ROM size in 8 KiB banks, flags
+    - optional 512 byte trainer, which is skipped
+    - PRG ROM (program code), mapped into the cpu address space from $8000
+    - CHR ROM (pattern tables), mapped into the ppu address space
+    """
+
+    prg_rom: bytes
+    chr_rom: bytes
+    mapper: int
+    vertical_mirroring: bool
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'Rom':
+        if data[:4] != INES_MAGIC:
+            raise RomFormatError('Missing iNES header')
+
+        prg_rom_size = data[4] * PRG_ROM_BANK_SIZE
+        chr_rom_size = data[5] * CHR_ROM_BANK_SIZE
+        flags6 = data[6]
+        flags7 = data[7]
+
+        prg_rom_start = HEADER_SIZE + (TRAINER_SIZE if flags6 & 0x04 else 0)
+        chr_rom_start = prg_rom_start + prg_rom_size
+        chr_rom_end = chr_rom_start + chr_rom_size
+        if len(data) < chr_rom_end:
+            raise RomFormatError('Image is smaller than the sizes declared in its header')
+
+        return cls(
+            prg_rom=bytes(data[prg_rom_start:chr_rom_start]),
+            chr_rom=bytes(data[chr_rom_start:chr_rom_end]),
+            # Mapper number is split across the high nibbles of flags 6 and 7
+            mapper=(flags7 & 0xF0) | (flags6 >> 4),
+            vertical_mirroring=bool(flags6 & 0x01),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> 'Rom':
+        with open(path, 'rb') as f:
+            return cls.from_bytes(f.read())
+
+    @property
+    def sha1(self) -> str:
+        """Identifies the cartridge contents, regardless of header quirks."""
+        return hashlib.sha1(self.prg_rom + self.chr_rom).hexdigest()
+
+    def load_into(self, memory: bytearray) -> None:
+        """Map PRG ROM into cpu memory.
+
+        Only NROM (mapper 0) is supported: 16 KiB images are mirrored to fill $8000-$FFFF, 32 KiB images fill it as is.
+        """
+        if self.mapper != 0:
+            raise NotImplementedError(f'Mapper {self.mapper} is not supported')
+
+        bank_count = len(self.prg_rom) // PRG_ROM_BANK_SIZE
+        if bank_count not in (1, 2):
+            raise NotImplementedError(f'NROM supports 1 or 2 PRG ROM banks, got {bank_count}')
+
+        prg_rom = self.prg_rom * (2 // bank_count)
+        memory[PRG_ROM_START:] = prg_rom
@@ -0,0 +1,175 @@
+import asyncio
+import base64
+import itertools
+import json
+from concurrent.futures import Executor
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+from typing import Dict
+from typing import Optional
+
+from pynes import metrics
+from pynes.nes import Nes
+from pynes.rom import Rom
+from pynes.video import FrameOutput
+from pynes.video import OutputFormat
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 6502
+
+Message = Dict[str, Any]
+
+
+class ProtocolError(Exception):
+    """Malformed or invalid request from a client, reported back to it instead of dropping the connection."""
+
+
+class Session:
+    """An emulator instance hosted by the server.
+
+    The lock serializes commands on the session, while other sessions keep making progress.
+    """
+
+    def __init__(self, session_id: int, nes: Nes) -> None:
+        self.id = session_id
+        self.nes = nes
+        self.lock = asyncio.Lock()
+        # Created on the first screenshot in each format, then reused
+        self.outputs: Dict[OutputFormat, FrameOutput] = {}
+
+    def output(self, output_format: OutputFormat) -> FrameOutput:
+        if output_format not in self.outputs:
+            self.outputs[output_format] = FrameOutput(output_format)
+        return self.outputs[output_format]
+
+
+class SessionServer:
+    """Hosts many emulator sessions in a single process.
+
+    Clients speak newline delimited JSON over a local socket. Each request is an object with a "command" key, each
+    response is an object with "ok" set, plus either the command's result or an "error" message:
+
+    - open {"rom": path, "recompiled": bool} -> {"session": id}
+    - input {"session": id, "buttons": bitmask, "port": 0 or 1} -> {}
+    - step {"session": id, "frames": count} -> {"frame": frame_count, "hash": frame digest}
+    - screenshot {"session": id, "format": "indexed", "rgb24" or "rgba32"} -> {"frame": frame_count, "pixels": base64}
+    - metrics {"session": id} -> {"metrics": host time per subsystem, frames and speed, see Metrics.snapshot}
+    - close {"session": id} -> {}
+
+    Emulation runs in the executor one frame at a time, so the event loop stays responsive and sessions stepping
+    concurrently are interleaved frame by frame.
+    """
+
+    def __init__(self, executor: Optional[Executor] = None) -> None:
+        self.executor = executor or ThreadPoolExecutor()
+        self.sessions: Dict[int, Session] = {}
+        self._session_ids = itertools.count(1)
+
+    async def start(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> asyncio.Server:
+        return await asyncio.start_server(self._handle_connection, host, port)
+
+    def exposition(self) -> str:
+        """Metrics of all sessions, in Prometheus text format."""
+        return metrics.exposition({str(session.id): session.nes.metrics for session in self.sessions.values()})
+
+    async def handle(self, request: Message) -> Message:
+        """Dispatch a single request, errors are turned into responses."""
+        try:
+            if not isinstance(request, dict):
+                raise ProtocolError('Request must be a JSON object')
+            command = request.get('command')
+            handler = getattr(self, f'_command_{command}', None)
+            if handler is None:
+                raise ProtocolError(f'Unknown command: {command}')
+
+            result = await handler(request)
+        except (ProtocolError, OSError, LookupError, TypeError, ValueError, NotImplementedError) as e:
+            return {'ok': False, 'error': f'{type(e).__name__}: {e}'}
+
+        return {'ok': True, **result}
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    response: Message = {'ok': False, 'error': 'Request is not valid JSON'}
+                else:
+                    response = await self.handle(request)
+
+                writer.write(json.dumps(response).encode() + b'\n')
+                await writer.drain()
+        finally:
+            writer.close()
+
+    def _session(self, request: Message) -> Session:
+        try:
+            return self.sessions[request['session']]
+        except KeyError:
+            raise ProtocolError(f'Unknown session: {request.get("session")}') from None
+
+    async def _command_open(self, request: Message) -> Message:
+        path = request.get('rom')
+        # Anything else would reach open(), where an int is taken as one of the server's file descriptors
+        if not isinstance(path, str):
+            raise ProtocolError(f'Invalid rom path: {path!r}')
+        loop = asyncio.get_running_loop()
+        rom = await loop.run_in_executor(self.executor, Rom.load, path)
+        # Recompiling the rom the first time it is opened takes a while
+        nes = await loop.run_in_executor(self.executor, Nes, rom, bool(request.get('recompiled', False)))
+        session = Session(next(self._session_ids), nes)
+        self.sessions[session.id] = session
+        return {'session': session.id}
+
+    async def _command_input(self, request: Message) -> Message:
+        session = self._session(request)
+        port = request.get('port', 0)
+        if port not in range(len(session.nes.controllers)):
+            raise ProtocolError(f'Invalid controller port: {port}')
+        async with session.lock:
+            session.nes.controllers[port].buttons = int(request['buttons']) & 0xFF
+        return {}
+
+    async def _command_step(self, request: Message) -> Message:
+        session = self._session(request)
+        frames = int(request.get('frames', 1))
+        loop = asyncio.get_running_loop()
+
+        async with session.lock:
+            for _ in range(frames):
+                await loop.run_in_executor(self.executor, session.nes.run_frame)
+            return {'frame': session.nes.frame_count, 'hash': session.nes.frame.digest()}
+
+    async def _command_screenshot(self, request: Message) -> Message:
+        session = self._session(request)
+        # Palette indices by default, as the PPU outputs them
+        output_format = OutputFormat[request.get('format', OutputFormat.indexed.name)]
+        async with session.lock:
+            pixels = base64.b64encode(session.output(output_format).convert(session.nes.frame).data).decode()
+            return {'frame': session.nes.frame_count, 'pixels': pixels}
+
+    async def _command_metrics(self, request: Message) -> Message:
+        session = self._session(request)
+        return {'metrics': session.nes.metrics.snapshot()}
+
+    async def _command_close(self, request: Message) -> Message:
+        session = self._session(request)
+        async with session.lock:
+            del self.sessions[session.id]
+        return {}
+
+
+async def serve_forever(
+    host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, metrics_port: Optional[int] = None
+) -> None:  # pragma: no cover
+    session_server = SessionServer()
+    server = await session_server.start(host, port)
+    if metrics_port is not None:
+        await metrics.start_endpoint(session_server.exposition, host, metrics_port)
+    async with server:
+        await server.serve_forever()
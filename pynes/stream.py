@@ -0,0 +1,181 @@
+import asyncio
+import collections
+import itertools
+import threading
+from typing import AsyncIterator
+from typing import Callable
+from typing import Deque
+from typing import Generic
+from typing import Iterator
+from typing import Optional
+from typing import TYPE_CHECKING
+from typing import TypeVar
+from typing import cast
+
+if TYPE_CHECKING:  # pragma: no cover
+    from pynes.nes import Nes
+
+T = TypeVar('T')
+
+DEFAULT_VIDEO_QUEUE_SIZE = 4
+DEFAULT_AUDIO_QUEUE_SIZE = 16
+
+# Marks the end of the stream when handing items across threads
+_END = object()
+
+
+class EndOfStream(Exception):
+    """Raised by OutputStream.get once the producer has finished and the queue is drained."""
+
+
+class OutputStream(Generic[T]):
+    """Bounded queue between the emulator thread (producer) and a single consumer.
+
+    put() blocks while the queue is full, so a slow consumer pauses emulation instead of growing memory. A consumer
+    that goes away calls cancel(); anything produced afterwards is dropped so the producer is never left blocked.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        if maxsize < 1:
+            raise ValueError(f'maxsize must be positive, got {maxsize}')
+
+        self.maxsize = maxsize
+        self._items: Deque[T] = collections.deque()
+        self._condition = threading.Condition()
+        self._finished = False
+        self._cancelled = False
+        self._error: Optional[BaseException] = None
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+    def put(self, item: T) -> None:
+        """Hand an item to the consumer, blocking the producer while the queue is full."""
+        with self._condition:
+            while len(self._items) >= self.maxsize and not self._cancelled:
+                self._condition.wait()
+
+            if self._cancelled:
+                # Nobody is listening anymore, drop it on the floor
+                return
+
+            self._items.append(item)
+            self._condition.notify_all()
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        """Producer side: no more items are coming. If error is set, it is re-raised to the consumer."""
+        with self._condition:
+            self._finished = True
+            self._error = error
+            self._condition.notify_all()
+
+    def cancel(self) -> None:
+        """Consumer side: stop listening and release a producer that may be blocked on a full queue."""
+        with self._condition:
+            self._cancelled = True
+            self._items.clear()
+            self._condition.notify_all()
+
+    def get(self) -> T:
+        """Block until the next item is available. Raises EndOfStream once the stream is exhausted."""
+        item = self._get()
+        if item is _END:
+            raise EndOfStream()
+        return cast(T, item)
+
+    def _get(self) -> object:
+        with self._condition:
+            while not self._items and not self._finished and not self._cancelled:
+                self._condition.wait()
+
+            if not self._items:
+                if self._error is not None:
+                    raise self._error
+                return _END
+
+            item = self._items.popleft()
+            self._condition.notify_all()
+            return item
+
+    def __iter__(self) -> Iterator[T]:
+        try:
+            while True:
+                try:
+                    yield self.get()
+                except EndOfStream:
+                    return
+        finally:
+            # Consumer broke out early (or is done), don't leave the producer hanging
+            self.cancel()
+
+    def __aiter__(self) -> AsyncIterator[T]:
+        return self._aiter()
+
+    async def _aiter(self) -> AsyncIterator[T]:
+        """Async variant of __iter__. The blocking get() runs in the default executor to keep the event loop free."""
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                item = await loop.run_in_executor(None, self._get)
+                if item is _END:
+                    return
+                yield cast(T, item)
+        finally:
+            self.cancel()
+
+
+class EmulatorOutput:
+    """Video and audio output of an emulator running on its own thread.
+
+    Frames and sample buffers are pulled from the video and audio streams by consumers (encoders, network streamers,
+    hashing in tests). A stream that nobody consumes should be cancelled, otherwise it fills up and pauses emulation.
+    """
+
+    def __init__(
+        self, video_maxsize: int = DEFAULT_VIDEO_QUEUE_SIZE, audio_maxsize: int = DEFAULT_AUDIO_QUEUE_SIZE
+    ) -> None:
+        self.video: OutputStream[bytes] = OutputStream(video_maxsize)
+        self.audio: OutputStream[bytes] = OutputStream(audio_maxsize)
+
+    @property
+    def active(self) -> bool:
+        """Whether any consumer is still listening. Producers should stop emulating once this is False."""
+        return not (self.video.cancelled and self.audio.cancelled)
+
+    def start(self, produce: Callable[['EmulatorOutput'], None]) -> threading.Thread:
+        """Run produce(self) on a daemon thread. Both streams are finished when it returns or raises."""
+
+        def target() -> None:
+            error: Optional[BaseException] = None
+            try:
+                produce(self)
+            except BaseException as e:  # pylint: disable=broad-except
+                error = e
+            finally:
+                self.video.finish(error)
+                self.audio.finish(error)
+
+        thread = threading.Thread(target=target, name='pynes-emulator', daemon=True)
+        thread.start()
+        return thread
+
+    def emulate(self, nes: 'Nes', frames: Optional[int] = None) -> threading.Thread:
+        """Run the console on the emulator thread, for frames or until every consumer has gone away.
+
+        Each frame's pixels (palette indices) go to the video stream and its samples (float32) to the audio stream. Both
+        are copied, as the console reuses its buffers for the next frame.
+        """
+
+        def produce(output: 'EmulatorOutput') -> None:
+            for _ in itertools.count() if frames is None else range(frames):
+                if not output.active:
+                    break
+                nes.run_frame()
+                output.video.put(bytes(nes.frame.pixels))
+                output.audio.put(nes.audio.tobytes())
+
+        return self.start(produce)
@@ -0,0 +1,284 @@
+import hashlib
+import struct
+import time
+import zlib
+from typing import Callable
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from pynes.bus import PAGE_SIZE
+from pynes.bus import ReadHandler
+from pynes.bus import WriteHandler
+from pynes.cpu import Cpu
+from pynes.idle import IdleLoopDetector
+from pynes.nes import CPU_CYCLES_PER_FRAME
+from pynes.nes import IO_REGISTERS_END
+from pynes.nes import MEMORY_SIZE
+from pynes.nes import Nes
+from pynes.nes import RAM_MIRRORS_END
+from pynes.nes import RAM_SIZE
+from pynes.ppu import REGISTERS_END as PPU_REGISTERS_END
+from pynes.ppu import REGISTERS_START as PPU_REGISTERS_START
+from pynes.ppu import read_is_idempotent as ppu_read_is_idempotent
+
+TRACE_MAGIC = b'PNIO'
+TRACE_VERSION = 1
+# Magic, version, sha1 of the rom, first frame, frame count, digest of the cpu after the last frame
+_HEADER = struct.Struct('<4sB20sII20s')
+# Kind, address, value
+_EVENT = struct.Struct('<BHH')
+
+# Pages traced: the PPU registers and the APU and controller I/O registers, which are contiguous
+TRACED_START = PPU_REGISTERS_START
+TRACED_END = IO_REGISTERS_END
+
+# A value the cpu read from a register
+READ = 0
+# Cycles a register access stalled the cpu for, e.g. OAM DMA. Follows the access.
+STALL = 1
+
+Event = Tuple[int, int, int]
+
+
+class TraceFormatError(ValueError):
+    """Raised when loading a file that is not an I/O trace, or an unsupported version of one."""
+
+
+class TraceMismatchError(RuntimeError):
+    """Raised when a replayed cpu accesses registers differently than the recorded one did."""
+
+
+def _traced_pages() -> range:
+    return range(TRACED_START // PAGE_SIZE, TRACED_END // PAGE_SIZE + 1)
+
+
+def cpu_digest(cpu: Cpu) -> bytes:
+    """Digest of the cpu's registers and memory, leaving out the traced pages that only peripherals back."""
+    memory = cpu.memory
+    state = cpu.save_state()
+    registers_size = len(state) - len(memory)
+    after_traced = TRACED_END + 1
+    return hashlib.sha1(state[:registers_size] + memory[:TRACED_START] + memory[after_traced:]).digest()
+
+
+class IoTrace:
+    """Everything the cpu read from memory mapped I/O over a number of frames, to replay it without peripherals.
+
+    The trace starts from a snapshot of the cpu. Events are the values of register reads, plus the cycles a register
+    access stalled the cpu for. Stored as a fixed header followed by the zlib compressed snapshot and events. Polling
+    loops read the same values over and over, so traces compress well.
+    """
+
+    def __init__(
+        self, rom_sha1: str, start_frame: int, frames: int, state: bytes, events: List[Event], digest: bytes
+    ) -> None:
+        self.rom_sha1 = rom_sha1
+        self.start_frame = start_frame
+        self.frames = frames
+        # Cpu.save_state() at the start of the first frame
+        self.state = state
+        self.events = events
+        # cpu_digest() after the last frame
+        self.digest = digest
+
+    def to_bytes(self) -> bytes:
+        header = _HEADER.pack(
+            TRACE_MAGIC, TRACE_VERSION, bytes.fromhex(self.rom_sha1), self.start_frame, self.frames, self.digest
+        )
+        events = b''.join(_EVENT.pack(*event) for event in self.events)
+        return header + zlib.compress(struct.pack('<I', len(self.state)) + self.state + events)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'IoTrace':
+        if len(data) < _HEADER.size:
+            raise TraceFormatError('Truncated trace header')
+
+        magic, version, rom_sha1, start_frame, frames, digest = _HEADER.unpack_from(data)
+        if magic != TRACE_MAGIC:
+            raise TraceFormatError('Not an I/O trace file')
+        if version != TRACE_VERSION:
+            raise TraceFormatError(f'Unsupported trace version {version}')
+
+        try:
+            header_size = _HEADER.size
+            body = zlib.decompress(data[header_size:])
+            (state_size,) = struct.unpack_from('<I', body)
+            state_end = 4 + state_size
+            events = list(_EVENT.iter_unpack(body[state_end:]))
+        except (zlib.error, struct.error) as e:
+            raise TraceFormatError(f'Corrupt trace: {e}') from e
+        return cls(rom_sha1.hex(), start_frame, frames, body[4:state_end], events, digest)
+
+    def save(self, path: str) -> None:
+        with open(path, 'wb') as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path: str) -> 'IoTrace':
+        with open(path, 'rb') as f:
+            return cls.from_bytes(f.read())
+
+
+def record(nes: Nes, frames: int, before_frame: Optional[Callable[[Nes], None]] = None) -> IoTrace:
+    """Run the console for frames, logging what the cpu reads from its registers.
+
+    before_frame is called with the console before each frame, e.g. to press buttons. Only accesses made by the cpu
+    itself are logged, not the ones a register makes while handling an access (e.g. OAM DMA reading a page).
+    """
+    cpu = nes.cpu
+    bus = cpu.bus
+    events: List[Event] = []
+    # Set while a traced handler runs
+    handling = False
+
+    def traced_reader(reader: ReadHandler) -> ReadHandler:
+        def read(address: int) -> int:
+            nonlocal handling
+            if handling:
+                return reader(address)
+            handling = True
+            start = cpu.cycles
+            try:
+                value = reader(address)
+            finally:
+                handling = False
+            events.append((READ, address, value))
+            if cpu.cycles != start:
+                events.append((STALL, address, cpu.cycles - start))
+            return value
+
+        return read
+
+    def traced_writer(writer: WriteHandler) -> WriteHandler:
+        def write(address: int, value: int) -> None:
+            nonlocal handling
+            if handling:
+                writer(address, value)
+                return
+            handling = True
+            start = cpu.cycles
+            try:
+                writer(address, value)
+            finally:
+                handling = False
+            if cpu.cycles != start:
+                events.append((STALL, address, cpu.cycles - start))
+
+        return write
+
+    readers = list(bus.readers)
+    writers = list(bus.writers)
+    for page in _traced_pages():
+        reader = readers[page]
+        writer = writers[page]
+        if reader is not None:
+            bus.readers[page] = traced_reader(reader)
+        if writer is not None:
+            bus.writers[page] = traced_writer(writer)
+
+    start_frame = nes.frame_count
+    state = cpu.save_state()
+    try:
+        for _ in range(frames):
+            if before_frame is not None:
+                before_frame(nes)
+            nes.run_frame()
+    finally:
+        bus.readers[:] = readers
+        bus.writers[:] = writers
+    return IoTrace(nes.rom.sha1, start_frame, frames, state, events, cpu_digest(cpu))
+
+
+class Replay:
+    """A lone cpu, fed a trace's register reads in place of the peripherals.
+
+    There is no PPU, APU or controller to emulate, so timing run() measures the cpu core alone: opcode dispatch,
+    addressing and the ALU. Writes to registers go nowhere, apart from the stalls they caused when recorded. The
+    cpu has the console's ram mirroring and idle loop detection, so it takes the same path as the recorded one. To
+    replay recompiled code, set cpu.blocks before running.
+    """
+
+    def __init__(self, trace: IoTrace) -> None:
+        self.trace = trace
+        self.cpu = Cpu()
+        self.cpu.memory = bytearray(MEMORY_SIZE)
+        self.cpu.idle_loop_detector = IdleLoopDetector()
+        self.position = 0
+
+        bus = self.cpu.bus
+        bus.map(RAM_SIZE, RAM_MIRRORS_END, reader=self._read_ram_mirror, writer=self._write_ram_mirror, idempotent=True)
+        # Idempotent where the console's are, so wait loops are skipped the same way they were when recorded
+        bus.map(
+            TRACED_START, PPU_REGISTERS_END, reader=self._read, writer=self._write, idempotent=ppu_read_is_idempotent
+        )
+        bus.map(PPU_REGISTERS_END + 1, TRACED_END, reader=self._read, writer=self._write)
+        self.rewind()
+
+    def rewind(self) -> None:
+        """Go back to the start of the trace, to replay it again."""
+        self.cpu.load_state(self.trace.state)
+        self.position = 0
+
+    def run(self) -> float:
+        """Replay every frame of the trace. Returns the host seconds it took.
+
+        Raises TraceMismatchError if the cpu strays from the recording, i.e. the core behaves differently than the one
+        that recorded the trace.
+        """
+        cpu = self.cpu
+        first = self.trace.start_frame
+        start = time.perf_counter()
+        for frame in range(first, first + self.trace.frames):
+            cpu.run((frame + 1) * CPU_CYCLES_PER_FRAME)
+        elapsed = time.perf_counter() - start
+
+        if self.position != len(self.trace.events):
+            raise TraceMismatchError(f'Replay ended {len(self.trace.events) - self.position} events early')
+        if cpu_digest(cpu) != self.trace.digest:
+            raise TraceMismatchError('Replay ended in a different state than the recording')
+        return elapsed
+
+    def _next(self) -> Event:
+        events = self.trace.events
+        if self.position >= len(events):
+            raise TraceMismatchError(f'Replay ran past the end of the trace, at {self.cpu.program_counter:#06x}')
+        event = events[self.position]
+        self.position += 1
+        return event
+
+    def _stall(self, address: int) -> None:
+        events = self.trace.events
+        position = self.position
+        if position < len(events) and events[position][0] == STALL and events[position][1] == address:
+            self.cpu.cycles += events[position][2]
+            self.position += 1
+
+    def _read(self, address: int) -> int:
+        kind, recorded_address, value = self._next()
+        if kind != READ or recorded_address != address:
+            raise TraceMismatchError(
+                f'Read of {address:#06x} at cycle {self.cpu.cycles}, recorded event {self.position - 1} is a '
+                f'{"read" if kind == READ else "stall"} of {recorded_address:#06x}'
+            )
+        self._stall(address)
+        return value
+
+    def _write(self, address: int, value: int) -> None:
+        self._stall(address)
+
+    def _read_ram_mirror(self, address: int) -> int:
+        return self.cpu.memory[address % RAM_SIZE]
+
+    def _write_ram_mirror(self, address: int, value: int) -> None:
+        self.cpu.memory[address % RAM_SIZE] = value
+
+
+def benchmark(trace: IoTrace, repeat: int = 3) -> float:
+    """Best host seconds out of repeat replays of the trace, the best being the one least disturbed by the host."""
+    replay = Replay(trace)
+    timings = []
+    for _ in range(repeat):
+        replay.rewind()
+        timings.append(replay.run())
+    return min(timings)
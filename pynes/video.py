@@ -0,0 +1,157 @@
+import enum
+import functools
+import hashlib
+from typing import List
+from typing import Tuple
+from typing import Union
+
+import numpy as np
+import numpy.typing as npt
+
+WIDTH = 256
+HEIGHT = 240
+
+# Rows from start up to end (exclusive)
+Region = Tuple[int, int]
+
+# RGB of the 64 colors of the NTSC PPU
+# fmt: off
+NTSC_PALETTE = bytes.fromhex(
+    '7c7c7c' '0000fc' '0000bc' '4428bc' '940084' 'a80020' 'a81000' '881400'
+    '503000' '007800' '006800' '005800' '004058' '000000' '000000' '000000'
+    'bcbcbc' '0078f8' '0058f8' '6844fc' 'd800cc' 'e40058' 'f83800' 'e45c10'
+    'ac7c00' '00b800' '00a800' '00a844' '008888' '000000' '000000' '000000'
+    'f8f8f8' '3cbcfc' '6888fc' '9878f8' 'f878f8' 'f85898' 'f87858' 'fca044'
+    'f8b800' 'b8f818' '58d854' '58f898' '00e8d8' '787878' '000000' '000000'
+    'fcfcfc' 'a4e4fc' 'b8b8f8' 'd8b8f8' 'f8b8f8' 'f8a4c0' 'f0d0b0' 'fce0a8'
+    'f8d878' 'd8f878' 'b8f8b8' 'b8f8d8' '00fcfc' 'f8d8f8' '000000' '000000'
+)
+# fmt: on
+COLOR_COUNT = 64
+# The 3 emphasis bits of PPUMASK, red, green and blue from the lowest
+EMPHASIS_COUNT = 8
+# Each emphasis bit dims the two channels it doesn't emphasize
+EMPHASIS_ATTENUATION = 0.816
+
+
+class OutputFormat(enum.Enum):
+    """Pixel formats frames can be output in. The value is the number of bytes per pixel."""
+
+    # Colors as the PPU outputs them, 0-63. Nothing to convert.
+    indexed = 1
+    rgb24 = 3
+    rgba32 = 4
+
+
+def _rows(pixels: Union[bytes, bytearray, memoryview]) -> npt.NDArray[np.uint8]:
+    return np.frombuffer(pixels, dtype=np.uint8).reshape(HEIGHT, WIDTH)
+
+
+def _regions(rows: npt.NDArray[np.intp]) -> List[Region]:
+    """Merge row indices into runs of consecutive rows."""
+    if not len(rows):
+        return []
+
+    breaks = np.flatnonzero(np.diff(rows) != 1) + 1
+    starts = np.concatenate(([rows[0]], rows[breaks]))
+    ends = np.concatenate((rows[breaks - 1], [rows[-1]])) + 1
+    return [(int(start), int(end)) for start, end in zip(starts, ends)]
+
+
+@functools.lru_cache(maxsize=None)
+def palette_lut(output_format: OutputFormat) -> npt.NDArray[np.uint8]:
+    """Pixel value of every color under every emphasis, indexed by [emphasis, color]. Built once per format."""
+    if output_format == OutputFormat.indexed:
+        raise ValueError('Indexed output has no lookup table')
+
+    rgb = np.frombuffer(NTSC_PALETTE, dtype=np.uint8).reshape(COLOR_COUNT, 3).astype(np.float64)
+    emphasis = np.arange(EMPHASIS_COUNT)
+    emphasized = (emphasis[:, np.newaxis] >> np.arange(3)) & 1
+    # Times each channel is dimmed: once for every emphasis bit set, other than its own
+    dimmed = emphasized.sum(axis=1, keepdims=True) - emphasized
+    lut = np.full((EMPHASIS_COUNT, COLOR_COUNT, output_format.value), 0xFF, dtype=np.uint8)
+    lut[..., :3] = np.rint(rgb[np.newaxis] * EMPHASIS_ATTENUATION ** dimmed[:, np.newaxis])
+    lut.flags.writeable = False
+    return lut
+
+
+class FrameBuffer:
+    """Picture output by the PPU.
+
+    One byte per pixel, row major. Pixels are the PPU's colors (0-63), conversion to RGB is left to FrameOutput.
+    emphasis holds the emphasis bits of PPUMASK the frame was drawn with.
+
+    Most of the screen is usually static between frames, so changes are tracked per scanline. end_frame() records
+    which rows changed since the previous frame, for displays to only redraw those. digest() keeps a hash per row and
+    only rehashes rows that changed since it was last called. Changes are found by comparing against a snapshot, which
+    is a lot cheaper than hashing, so writers don't need to report what they touch.
+    """
+
+    def __init__(self) -> None:
+        # A bytearray, or a view onto memory shared with other processes (see env.VectorEnv)
+        self.pixels: Union[bytearray, memoryview] = bytearray(WIDTH * HEIGHT)
+        self.emphasis = 0
+        self.dirty_rows: npt.NDArray[np.intp] = np.zeros(0, dtype=np.intp)
+        self._previous_frame = bytes(self.pixels)
+        self._hashed = bytes(self.pixels)
+        blank_row = hashlib.sha1(bytes(WIDTH)).digest()
+        self._row_digests = [blank_row] * HEIGHT
+
+    def end_frame(self) -> None:
+        """Record the rows that changed since the last call."""
+        self.dirty_rows = self._changed_rows(self._previous_frame)
+        self._previous_frame = bytes(self.pixels)
+
+    def dirty_regions(self) -> List[Region]:
+        """Spans of rows that changed in the last frame."""
+        return _regions(self.dirty_rows)
+
+    def row_digests(self) -> List[str]:
+        """sha1 hex digest of each row, for locating differences."""
+        self._update_digests()
+        return [digest.hex() for digest in self._row_digests]
+
+    def digest(self) -> str:
+        """Digest of the whole frame, combined from the row digests."""
+        self._update_digests()
+        return hashlib.sha1(b''.join(self._row_digests)).hexdigest()
+
+    def _changed_rows(self, reference: bytes) -> npt.NDArray[np.intp]:
+        if self.pixels == reference:
+            return np.zeros(0, dtype=np.intp)
+        return np.flatnonzero((_rows(self.pixels) != _rows(reference)).any(axis=1))
+
+    def _update_digests(self) -> None:
+        changed = self._changed_rows(self._hashed)
+        if not len(changed):
+            return
+
+        pixels = memoryview(self.pixels)
+        for row in changed:
+            start = row * WIDTH
+            end = start + WIDTH
+            self._row_digests[row] = hashlib.sha1(pixels[start:end]).digest()
+        self._hashed = bytes(self.pixels)
+
+
+class FrameOutput:
+    """Converts frames to an output format, into an array allocated once and reused for every frame.
+
+    Conversion is a single take() of the frame's colors from palette_lut(). Indexed output skips it entirely, and
+    returns a view onto the frame itself. Either way, the result is overwritten by the next convert(), copy it to hold
+    on to a frame.
+    """
+
+    def __init__(self, output_format: OutputFormat = OutputFormat.rgb24) -> None:
+        self.format = output_format
+        shape = (HEIGHT, WIDTH) if output_format == OutputFormat.indexed else (HEIGHT, WIDTH, output_format.value)
+        self.buffer = np.zeros(shape, dtype=np.uint8)
+
+    def convert(self, frame: FrameBuffer) -> npt.NDArray[np.uint8]:
+        colors = _rows(frame.pixels)
+        if self.format == OutputFormat.indexed:
+            return colors
+
+        # mode='clip' lets take() write straight into the buffer, instead of going through a temporary
+        np.take(palette_lut(self.format)[frame.emphasis], colors, axis=0, out=self.buffer, mode='clip')
+        return self.buffer
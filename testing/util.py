@@ -4,6 +4,11 @@ from typing import Tuple
 
 import pytest
 
+from pynes import rom
+
+# Spins forever: CLC; BCC -3
+IDLE_PROGRAM = bytes([0x18, 0x90, 0xFD])
+
 
 def named_parametrize(argnames: Tuple[str, ...], id_and_argvalues: List[Tuple[Any, ...]]) -> Any:
     single_param = False
@@ -23,3 +28,18 @@ def named_parametrize(argnames: Tuple[str, ...], id_and_argvalues: List[Tuple[An
         ],
         ids=[param[0] for param in id_and_argvalues],
     )
+
+
+def make_rom(program: bytes = IDLE_PROGRAM, chr_rom: bytes = b'') -> bytes:
+    """Build a 16 KiB NROM iNES image with program at $8000, which the reset vector points to."""
+    prg_rom = bytearray(program.ljust(rom.PRG_ROM_BANK_SIZE, b'\x00'))
+
+    # Vectors live at the end of the bank, which is mirrored up to $FFFF
+    reset_vector = rom.RESET_VECTOR - rom.PRG_ROM_START - rom.PRG_ROM_BANK_SIZE
+    prg_rom[reset_vector] = rom.PRG_ROM_START & 0xFF
+    prg_rom[reset_vector + 1] = rom.PRG_ROM_START >> 8
+
+    chr_banks = -(-len(chr_rom) // rom.CHR_ROM_BANK_SIZE)
+    chr_rom = chr_rom.ljust(chr_banks * rom.CHR_ROM_BANK_SIZE, b'\x00')
+    header = rom.INES_MAGIC + bytes([1, chr_banks]) + bytes(10)
+    return header + bytes(prg_rom) + chr_rom
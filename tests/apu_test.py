@@ -0,0 +1,591 @@
+# pylint: disable=no-self-use
+import os
+from typing import List
+from typing import Tuple
+from unittest import mock
+
+import numpy as np
+import pytest
+
+from pynes import apu
+from pynes import cache
+from testing.util import named_parametrize
+
+
+@pytest.fixture
+def memory():
+    yield bytearray(0x10000)
+
+
+@pytest.fixture
+def test_apu(memory):
+    yield apu.Apu(memory.__getitem__)
+
+
+def write_all(test_apu: apu.Apu, writes: List[Tuple[int, int]], cycle: int = 0) -> None:
+    for address, value in writes:
+        test_apu.write(address, value, cycle)
+
+
+def dominant_frequency(samples: np.ndarray, sample_rate: int = apu.DEFAULT_SAMPLE_RATE) -> float:
+    spectrum = np.abs(np.fft.rfft(samples - samples.mean()))
+    return np.argmax(spectrum) * sample_rate / len(samples)
+
+
+def test_step_kernel():
+    kernel = apu.step_kernel()
+
+    assert kernel.shape == (apu.KERNEL_PHASES, apu.KERNEL_TAPS)
+    np.testing.assert_allclose(kernel.sum(axis=1), 1)
+
+
+@named_parametrize(
+    ('mode', 'length'),
+    [
+        ('long', False, 32767),
+        ('short', True, 93),
+    ],
+)
+def test_noise_cycles(mode, length):
+    cycles, cycle_of, position = apu.noise_cycles(mode)
+    cycle = cycles[cycle_of[1]]
+
+    assert len(cycle) == length
+    assert cycle[position[1]] == 1
+    # Every state is on exactly one cycle
+    assert sum(len(cycle) for cycle in cycles) == 1 << 15
+
+
+class TestNoiseCyclesCache:
+    @pytest.fixture(autouse=True)
+    def uncached(self):
+        apu.noise_cycles.cache_clear()
+        yield
+        apu.noise_cycles.cache_clear()
+
+    def test_cached(self):
+        expected = apu.noise_cycles(True)
+        apu.noise_cycles.cache_clear()
+
+        with mock.patch.object(apu, '_build_noise_cycles') as build:
+            cycles, cycle_of, position = apu.noise_cycles(True)
+
+        build.assert_not_called()
+        assert len(cycles) == len(expected[0])
+        assert all(np.array_equal(cycle, other) for cycle, other in zip(cycles, expected[0]))
+        np.testing.assert_array_equal(cycle_of, expected[1])
+        np.testing.assert_array_equal(position, expected[2])
+
+    def test_corrupt(self):
+        path = os.path.join(cache.cache_dir('tables'), f'noise-short-v{apu.TABLES_VERSION}.npz')
+        cache.write(path, b'garbage')
+
+        cycles, _, _ = apu.noise_cycles(True)
+
+        assert sum(len(cycle) for cycle in cycles) == 1 << 15
+        assert cache.read(path) != b'garbage'
+
+
+class TestBandLimitedBuffer:
+    def test_step(self):
+        buffer = apu.BandLimitedBuffer()
+        samples = buffer.render(np.array([10.25]), np.array([4.0]), 40)
+
+        np.testing.assert_allclose(samples[:5], 0, atol=1e-9)
+        np.testing.assert_allclose(samples[30:], 4)
+        # Band-limited, so the step is smeared over a few samples
+        assert 0 < samples[17] < 4
+
+    def test_tail_carried_over(self):
+        buffer = apu.BandLimitedBuffer()
+        first = buffer.render(np.array([18.0]), np.array([1.0]), 20)
+        second = buffer.render(np.zeros(0), np.zeros(0), 20)
+
+        assert first[-1] < 1
+        assert buffer.target == 1
+        np.testing.assert_allclose(second[-1], 1)
+
+    def test_empty(self):
+        buffer = apu.BandLimitedBuffer(level=2)
+
+        assert buffer.render(np.zeros(0), np.zeros(0), 0).size == 0
+        assert buffer.level == 2
+
+    def test_skip(self):
+        buffer = apu.BandLimitedBuffer()
+        buffer.render(np.array([18.0]), np.array([1.0]), 20)
+        buffer.skip(3)
+        assert buffer.target == 3
+
+        np.testing.assert_allclose(buffer.render(np.zeros(0), np.zeros(0), 20), 3)
+
+
+def test_incomplete_channel():
+    """Channels missing part of the interface fail when they're created, not in the middle of a frame."""
+
+    class Incomplete(apu.Channel):  # pylint: disable=abstract-method
+        """Implements none of output, run and write."""
+
+    with pytest.raises(TypeError):
+        Incomplete()  # type: ignore  # pylint: disable=abstract-class-instantiated
+
+
+class TestEnvelope:
+    def test_decay(self):
+        envelope = apu.Envelope()
+        envelope.write(0x01)
+        envelope.start = True
+        volumes = []
+        for _ in range(6):
+            envelope.clock()
+            volumes.append(envelope.volume)
+
+        # Decays every other clock, with a period of 1
+        assert volumes == [15, 15, 14, 14, 13, 13]
+
+    def test_loop(self):
+        envelope = apu.Envelope()
+        envelope.write(0x20)
+        envelope.start = True
+        for _ in range(16):
+            envelope.clock()
+
+        assert envelope.volume == 0
+        envelope.clock()
+        assert envelope.volume == 15
+
+    def test_no_loop(self):
+        envelope = apu.Envelope()
+        envelope.start = True
+        for _ in range(20):
+            envelope.clock()
+
+        assert envelope.volume == 0
+
+    def test_constant_volume(self):
+        envelope = apu.Envelope()
+        envelope.write(0x17)
+        envelope.start = True
+        envelope.clock()
+
+        assert envelope.volume == 7
+
+
+class TestPulse:
+    @pytest.fixture
+    def pulse(self):
+        pulse = apu.Pulse(ones_complement_sweep=False)
+        pulse.set_enabled(True)
+        pulse.write(0, 0xBF)
+        pulse.write(2, 0x00)
+        pulse.write(3, 0x09)
+        yield pulse
+
+    def test_registers(self, pulse):
+        assert pulse.duty == 2
+        assert pulse.length_halt
+        assert pulse.timer_period == 0x100
+        assert pulse.length_counter == apu.LENGTH_TABLE[1]
+        assert pulse.envelope.start
+
+    def test_run(self, pulse):
+        period = (0x100 + 1) * 2
+        pulse.run(0, 8 * period)
+        times, levels = pulse.take_transitions()
+
+        np.testing.assert_array_equal(times, np.arange(8) * period)
+        np.testing.assert_array_equal(levels, [15, 15, 15, 15, 0, 0, 0, 0])
+        assert pulse.take_transitions()[0].size == 0
+
+    def test_silent(self, pulse):
+        pulse.set_enabled(False)
+        pulse.run(0, 10000)
+
+        assert pulse.take_transitions()[0].size == 0
+        assert pulse.length_counter == 0
+
+    def test_length_not_loaded_while_disabled(self, pulse):
+        pulse.set_enabled(False)
+        pulse.write(3, 0x08)
+
+        assert pulse.length_counter == 0
+
+    @named_parametrize(
+        ('ones_complement', 'target'),
+        [
+            ('pulse_1', True, 0x100 - 0x20 - 1),
+            ('pulse_2', False, 0x100 - 0x20),
+        ],
+    )
+    def test_sweep_negate(self, ones_complement, target):
+        pulse = apu.Pulse(ones_complement_sweep=ones_complement)
+        pulse.write(1, 0x8B)
+        pulse.write(2, 0x00)
+        pulse.write(3, 0x01)
+
+        assert pulse.sweep_target() == target
+
+    def test_sweep(self, pulse):
+        pulse.write(1, 0x81)
+        pulse.half_frame()
+
+        assert pulse.timer_period == 0x180
+        assert pulse.sweep_divider == 0
+
+    def test_sweep_divider(self, pulse):
+        pulse.write(1, 0xA1)
+        pulse.half_frame()
+        pulse.half_frame()
+
+        # Only the first half frame updates the period, then the divider counts down from 2
+        assert pulse.timer_period == 0x180
+        assert pulse.sweep_divider == 1
+
+    def test_sweep_overflow_mutes(self, pulse):
+        pulse.write(3, 0x07)
+        pulse.write(1, 0x00)
+
+        assert pulse.muted()
+        assert pulse.output() == 0
+
+    def test_length_counter(self, pulse):
+        pulse.write(0, 0x9F)
+        pulse.write(3, 0x18)
+        pulse.half_frame()
+
+        assert pulse.length_counter == 1
+        pulse.half_frame()
+        pulse.half_frame()
+        assert pulse.length_counter == 0
+
+    def test_state(self, pulse):
+        pulse.quarter_frame()
+        state = pulse.save_state()
+
+        restored = apu.Pulse(ones_complement_sweep=False)
+        restored.load_state(state)
+
+        assert restored.save_state() == state
+        assert restored.envelope.decay == 15
+
+
+class TestTriangle:
+    @pytest.fixture
+    def triangle(self):
+        triangle = apu.Triangle()
+        triangle.set_enabled(True)
+        triangle.write(0, 0x10)
+        triangle.write(2, 0x0F)
+        triangle.write(3, 0x08)
+        triangle.quarter_frame()
+        yield triangle
+
+    def test_run(self, triangle):
+        triangle.run(0, 32 * 16)
+        times, levels = triangle.take_transitions()
+
+        np.testing.assert_array_equal(times, np.arange(32) * 16)
+        np.testing.assert_array_equal(levels, np.roll(apu.TRIANGLE_SEQUENCE, -1))
+
+    def test_unused_register(self, triangle):
+        state = triangle.save_state()
+        triangle.write(1, 0xFF)
+
+        assert triangle.save_state() == state
+
+    def test_no_steps(self, triangle):
+        triangle.run(0, 0)
+
+        assert triangle.take_transitions()[0].size == 0
+
+    def test_linear_counter(self, triangle):
+        assert triangle.linear_counter == 0x10
+        assert not triangle.linear_reload
+
+        triangle.quarter_frame()
+        assert triangle.linear_counter == 0x0F
+
+    def test_linear_counter_control(self, triangle):
+        triangle.write(0, 0x90)
+        triangle.write(3, 0x08)
+        triangle.quarter_frame()
+        triangle.quarter_frame()
+
+        assert triangle.linear_counter == 0x10
+        assert triangle.linear_reload
+
+    @named_parametrize(
+        ('register', 'value'),
+        [
+            ('linear_counter', 0, 0x00),
+            ('ultrasonic', 2, 0x01),
+        ],
+    )
+    def test_holds(self, triangle, register, value):
+        triangle.write(register, value)
+        triangle.write(3, 0x08)
+        triangle.quarter_frame()
+        triangle.run(0, 10000)
+
+        assert triangle.take_transitions()[0].size == 0
+        assert triangle.next_step == 10000
+
+
+class TestNoise:
+    def test_run(self):
+        noise = apu.Noise()
+        noise.set_enabled(True)
+        noise.write(0, 0x1F)
+        noise.write(2, 0x80)
+        noise.write(3, 0x08)
+        noise.run(0, 93 * 4 * 2)
+        _, levels = noise.take_transitions()
+
+        assert set(levels) == {0, 15}
+        # Short mode repeats every 93 steps
+        np.testing.assert_array_equal(levels[:93], levels[93:])
+
+    def test_unused_register(self):
+        noise = apu.Noise()
+        state = noise.save_state()
+        noise.write(1, 0xFF)
+
+        assert noise.save_state() == state
+
+    def test_silent(self):
+        noise = apu.Noise()
+        noise.run(0, 1000)
+
+        assert noise.take_transitions()[0].size == 0
+        assert noise.shift_register != 1
+
+    def test_state(self):
+        noise = apu.Noise()
+        noise.write(0, 0x1F)
+        noise.run(0, 1000)
+        state = noise.save_state()
+
+        restored = apu.Noise()
+        restored.load_state(state)
+
+        assert restored.save_state() == state
+
+
+class TestDmc:
+    @pytest.fixture
+    def dmc(self, memory):
+        dmc = apu.Dmc(memory.__getitem__)
+        dmc.write(0, 0x0F)
+        dmc.write(1, 0x40)
+        dmc.write(2, 0x00)
+        dmc.write(3, 0x00)
+        yield dmc
+
+    def test_registers(self, dmc):
+        dmc.write(2, 0x02)
+        dmc.write(3, 0x03)
+
+        assert dmc.period == 54
+        assert dmc.output_level == 0x40
+        assert dmc.sample_address == 0xC080
+        assert dmc.sample_length == 0x31
+
+    def test_play(self, dmc, memory):
+        memory[0xC000] = 0x0F
+        dmc.set_enabled(True)
+        dmc.run(0, 16 * 54)
+        _, levels = dmc.take_transitions()
+
+        # Nothing is output until the first byte is shifted in
+        assert list(levels[:8]) == [0x40] * 8
+        assert list(levels[8:]) == [0x42, 0x44, 0x46, 0x48, 0x46, 0x44, 0x42, 0x40]
+        assert not dmc.active
+
+    def test_clamp(self, dmc, memory):
+        memory[0xC000] = 0xFF
+        dmc.write(1, 0x7E)
+        dmc.set_enabled(True)
+        dmc.run(0, 16 * 54)
+
+        assert dmc.output_level == 0x7E
+
+    def test_irq(self, dmc):
+        dmc.write(0, 0x8F)
+        dmc.set_enabled(True)
+
+        assert dmc.irq
+        dmc.write(0, 0x0F)
+        assert not dmc.irq
+
+    def test_loop(self, dmc):
+        dmc.write(0, 0x4F)
+        dmc.set_enabled(True)
+
+        assert dmc.active
+        assert dmc.current_address == 0xC000
+
+    def test_address_wraps(self, dmc, memory):
+        memory[0xFFFF] = 0x12
+        memory[0x8000] = 0x34
+        # 65 bytes from $FFC0
+        dmc.write(2, 0xFF)
+        dmc.write(3, 0x04)
+        dmc.set_enabled(True)
+        dmc.run(0, 64 * 8 * 54)
+
+        assert dmc.current_address == 0x8001
+        assert dmc.sample_buffer == 0x34
+
+    def test_enable_while_playing(self, dmc):
+        dmc.write(3, 0x01)
+        dmc.set_enabled(True)
+        dmc.set_enabled(True)
+
+        assert dmc.bytes_remaining == 16
+
+    def test_disable(self, dmc):
+        dmc.write(3, 0x01)
+        dmc.set_enabled(True)
+        dmc.set_enabled(False)
+
+        assert not dmc.active
+
+    def test_idle(self, dmc):
+        dmc.run(0, 3 * 54)
+
+        assert dmc.take_transitions()[0].size == 0
+        assert dmc.bits_remaining == 5
+
+    def test_state(self, dmc, memory):
+        dmc.set_enabled(True)
+        state = dmc.save_state()
+
+        restored = apu.Dmc(memory.__getitem__)
+        restored.load_state(state)
+
+        assert restored.save_state() == state
+        assert restored.sample_buffer_full
+
+
+class TestApu:
+    def test_pulse_tone(self, test_apu):
+        write_all(test_apu, [(apu.STATUS, 0x01), (0x4000, 0xBF), (0x4002, 0xFD), (0x4003, 0x08)])
+        samples = np.concatenate([test_apu.end_frame((frame + 1) * 29781) for frame in range(30)])
+
+        expected = apu.CPU_CLOCK_RATE / (16 * (0xFD + 1))
+        assert abs(dominant_frequency(samples) - expected) < 2
+
+    def test_mix(self, test_apu):
+        write_all(test_apu, [(0x4011, 0x7F)])
+        samples = test_apu.end_frame(29781)
+
+        # The triangle holds at the top of its sequence while silent
+        settled = apu.KERNEL_TAPS
+        np.testing.assert_allclose(samples[settled:], apu.TND_MIX[3 * 15 + 0x7F], rtol=1e-6)
+
+    def test_transition_at_frame_end(self, test_apu):
+        """A level change right before the end of a frame is still underway when the next frame starts."""
+        test_apu.write(0x4011, 0x7F, 29781 - 20)
+        test_apu.end_frame(29781)
+        test_apu.write(0x4011, 0x00, 29781 + 100)
+        samples = test_apu.end_frame(2 * 29781)
+
+        settled = 100 * apu.DEFAULT_SAMPLE_RATE // apu.CPU_CLOCK_RATE + apu.KERNEL_TAPS
+        np.testing.assert_allclose(samples[settled:], apu.TND_MIX[3 * 15], rtol=1e-6)
+
+    def test_sample_count(self, test_apu):
+        counts = [len(test_apu.end_frame((frame + 1) * 29781)) for frame in range(60)]
+
+        # Fractional samples are carried over between frames
+        assert set(counts) == {733, 734}
+        assert sum(counts) == 60 * 29781 * apu.DEFAULT_SAMPLE_RATE // apu.CPU_CLOCK_RATE
+
+    def test_write_timing(self, test_apu):
+        write_all(test_apu, [(apu.STATUS, 0x01), (0x4000, 0xBF), (0x4002, 0xFD), (0x4003, 0x08)], cycle=20000)
+        samples = test_apu.end_frame(29781)
+
+        # Silent until the write, 20000 cpu cycles in
+        silent = 20000 * apu.DEFAULT_SAMPLE_RATE // apu.CPU_CLOCK_RATE
+        np.testing.assert_allclose(samples[:silent], apu.TND_MIX[3 * 15], rtol=1e-6)
+        playing = silent + apu.KERNEL_TAPS
+        assert samples[playing:].max() > apu.TND_MIX[3 * 15]
+
+    def test_no_synthesis(self, test_apu):
+        write_all(test_apu, [(apu.STATUS, 0x01), (0x4000, 0xBF), (0x4002, 0xFD), (0x4003, 0x08)])
+
+        assert test_apu.end_frame(29781, synthesize=False).size == 0
+        assert test_apu.end_frame(2 * 29781).size == 734
+
+    def test_status(self, test_apu):
+        write_all(test_apu, [(0x4013, 0x01), (apu.STATUS, 0x1F), (0x4003, 0x08), (0x400B, 0x08)])
+
+        assert test_apu.read_status(10) == 0x15
+
+    def test_status_disable(self, test_apu):
+        write_all(test_apu, [(apu.STATUS, 0x01), (0x4003, 0x08)])
+        test_apu.write(apu.STATUS, 0x00, 10)
+
+        assert test_apu.read_status(5) == 0x01
+        assert test_apu.read_status(10) == 0x00
+
+    def test_unmapped_register(self, test_apu):
+        state = test_apu.save_state()
+        test_apu.write(0x4014, 0xFF, 0)
+        test_apu.read_status(0)
+
+        assert test_apu.save_state() == state
+
+    def test_dmc_irq_status(self, test_apu):
+        write_all(test_apu, [(0x4010, 0x80), (apu.STATUS, 0x10)])
+
+        assert test_apu.read_status(10) == 0x80
+
+    def test_frame_irq(self, test_apu):
+        assert test_apu.read_status(29828) == 0
+        assert test_apu.read_status(29829) == 0x40
+        # Reading clears the flag
+        assert test_apu.read_status(29830) == 0
+
+    def test_frame_irq_inhibit(self, test_apu):
+        test_apu.write(apu.FRAME_COUNTER, 0x40, 0)
+
+        assert test_apu.read_status(40000) == 0
+
+    def test_frame_irq_inhibit_clears_flag(self, test_apu):
+        test_apu.end_frame(29830)
+        test_apu.write(apu.FRAME_COUNTER, 0x40, 29831)
+
+        assert test_apu.read_status(29831) == 0
+
+    def test_length_counters_clocked(self, test_apu):
+        # Length index 3 loads 2, which runs out after two half frames
+        write_all(test_apu, [(apu.STATUS, 0x01), (0x4003, 0x18)])
+
+        assert test_apu.read_status(14913) == 0x01
+        # Along with the frame interrupt
+        assert test_apu.read_status(29829) == 0x40
+
+    def test_five_step_mode(self, test_apu):
+        write_all(test_apu, [(apu.STATUS, 0x01), (0x4003, 0x18)])
+        test_apu.write(apu.FRAME_COUNTER, 0x80, 100)
+
+        # Switching clocks a half frame immediately, and the 5 step sequence never raises the interrupt
+        assert test_apu.read_status(100) == 0x01
+        assert test_apu.read_status(100 + 14913) == 0x00
+        assert test_apu.read_status(100 + 2 * apu.FIVE_STEP_PERIOD) == 0x00
+
+    def test_state(self, test_apu, memory):
+        write_all(test_apu, [(apu.STATUS, 0x0F), (0x4000, 0xBF), (0x4002, 0xFD), (0x4003, 0x08)])
+        test_apu.write(apu.FRAME_COUNTER, 0x80, 10)
+        test_apu.end_frame(29781)
+        state = test_apu.save_state()
+        expected = test_apu.end_frame(2 * 29781)
+
+        restored = apu.Apu(memory.__getitem__)
+        restored.load_state(state)
+
+        assert len(state) == restored.state_size
+        assert restored.save_state() == state
+        # Audio picks up from the restored levels, after the first few samples
+        settled = apu.KERNEL_TAPS
+        np.testing.assert_allclose(restored.end_frame(2 * 29781)[settled:], expected[settled:])
@@ -130,3 +130,15 @@ class TestBranch:
         branch.branch_if_overflow_set(test_cpu, 10)
 
         branch_.assert_called_with(test_cpu, overflow_flag, 10)
+
+
+class TestIdleLoopDetection:
+    @pytest.mark.parametrize(('predicate', 'value', 'called'), [(True, -2, True), (True, 2, False), (False, -2, False)])
+    def test_backward_branch(self, predicate, value, called):
+        test_cpu = cpu.Cpu()
+        test_cpu.program_counter = 100
+        test_cpu.idle_loop_detector = mock.Mock()
+
+        branch._branch(test_cpu, predicate, value)
+
+        assert test_cpu.idle_loop_detector.backward_branch.called == called
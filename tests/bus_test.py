@@ -0,0 +1,53 @@
+# pylint: disable=no-self-use
+from unittest import mock
+
+from pynes import bus
+
+
+class TestBus:
+    def test_unmapped(self):
+        test_bus = bus.Bus()
+
+        assert test_bus.readers == [None] * bus.PAGE_COUNT
+        assert test_bus.writers == [None] * bus.PAGE_COUNT
+
+    def test_map(self):
+        test_bus = bus.Bus()
+        test_bus.map(0x2000, 0x3FFF, reader=mock.sentinel.reader, writer=mock.sentinel.writer)
+
+        assert test_bus.readers[0x1F] is None
+        assert test_bus.readers[0x20:0x40] == [mock.sentinel.reader] * 0x20
+        assert test_bus.writers[0x20:0x40] == [mock.sentinel.writer] * 0x20
+        assert test_bus.readers[0x40] is None
+
+    def test_idempotent(self):
+        test_bus = bus.Bus()
+        test_bus.map(0x0800, 0x08FF, reader=mock.sentinel.reader, idempotent=True)
+        test_bus.map(0x4000, 0x40FF, reader=mock.sentinel.reader)
+        test_bus.map(0x5000, 0x50FF, writer=mock.sentinel.writer)
+
+        assert test_bus.idempotent[0x00]
+        assert test_bus.idempotent[0x08]
+        assert not test_bus.idempotent[0x40]
+        assert test_bus.idempotent[0x50], 'Reads from plain memory have no side effects'
+
+    def test_idempotency_check(self):
+        test_bus = bus.Bus()
+        test_bus.map(0x2000, 0x20FF, reader=mock.sentinel.reader, idempotent=lambda address: address == 0x2002)
+
+        assert not test_bus.idempotent[0x20]
+        assert test_bus.is_idempotent(0x2002)
+        assert not test_bus.is_idempotent(0x2007)
+        assert test_bus.is_idempotent(0x0000)
+
+        # Back to plain memory, the check goes too
+        test_bus.map(0x2000, 0x20FF, idempotent=lambda address: False)
+        assert test_bus.is_idempotent(0x2007)
+
+    def test_unmap(self):
+        test_bus = bus.Bus()
+        test_bus.map(0x4000, 0x40FF, reader=mock.sentinel.reader, writer=mock.sentinel.writer)
+        test_bus.map(0x4000, 0x40FF)
+
+        assert test_bus.readers[0x40] is None
+        assert test_bus.writers[0x40] is None
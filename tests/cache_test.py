@@ -0,0 +1,54 @@
+import os
+from unittest import mock
+
+from pynes import cache
+
+
+def test_cache_dir():
+    with mock.patch.dict(os.environ, {'XDG_CACHE_HOME': '/tmp/cache'}):
+        assert cache.cache_dir('tables') == '/tmp/cache/pynes/tables'
+
+
+def test_cache_dir_home():
+    with mock.patch.dict(os.environ, {'XDG_CACHE_HOME': ''}), mock.patch.object(
+        os.path, 'expanduser', return_value='/home/user'
+    ):
+        assert cache.cache_dir('tables') == '/home/user/.cache/pynes/tables'
+
+
+def test_round_trip(tmpdir):
+    path = str(tmpdir.join('nested', 'entry'))
+    cache.write(path, b'data')
+
+    assert cache.read(path) == b'data'
+    assert os.listdir(str(tmpdir.join('nested'))) == ['entry']
+
+
+def test_missing(tmpdir):
+    assert cache.read(str(tmpdir.join('entry'))) is None
+
+
+def test_unwritable(tmpdir):
+    not_a_directory = tmpdir.join('file')
+    not_a_directory.write('')
+    path = str(not_a_directory.join('entry'))
+    cache.write(path, b'data')
+
+    assert cache.read(path) is None
+
+
+def test_failed_write_cleaned_up(tmpdir):
+    path = str(tmpdir.join('entry'))
+    with mock.patch.object(os, 'replace', side_effect=OSError):
+        cache.write(path, b'data')
+
+    assert cache.read(path) is None
+    assert os.listdir(str(tmpdir)) == []
+
+
+def test_failed_cleanup(tmpdir):
+    path = str(tmpdir.join('entry'))
+    with mock.patch.object(os, 'replace', side_effect=OSError), mock.patch.object(os, 'unlink', side_effect=OSError):
+        cache.write(path, b'data')
+
+    assert cache.read(path) is None
@@ -0,0 +1,226 @@
+# pylint: disable=no-self-use
+from unittest import mock
+
+import pytest
+
+from pynes import conformance
+from pynes.conformance import Outcome
+from pynes.conformance import Result
+from pynes.nes import Nes
+from pynes.rom import Rom
+from testing.util import make_rom
+
+FRAME_LIMIT = 3
+
+
+@pytest.fixture
+def nes():
+    yield Nes(Rom.from_bytes(make_rom()))
+
+
+@pytest.fixture
+def rom_directory(tmp_path):
+    (tmp_path / 'cpu').mkdir()
+    (tmp_path / 'cpu' / 'idle.nes').write_bytes(make_rom())
+    # BRK isn't implemented
+    (tmp_path / 'cpu' / 'brk.NES').write_bytes(make_rom(b'\x00'))
+    (tmp_path / 'broken.nes').write_bytes(b'not a rom')
+    (tmp_path / 'readme.txt').write_text('Not a rom')
+    yield str(tmp_path)
+
+
+def report_status(nes: Nes, status: int, message: bytes = b'') -> None:
+    # Status, signature and message follow each other
+    record = bytes([status]) + conformance.SIGNATURE + message + b'\x00'
+    start = conformance.RESULT_STATUS
+    end = start + len(record)
+    nes.cpu.memory[start:end] = record
+
+
+def test_find_roms(rom_directory):
+    assert conformance.find_roms(rom_directory) == ['broken.nes', 'cpu/brk.NES', 'cpu/idle.nes']
+
+
+def test_code_fingerprint(tmp_path):
+    (tmp_path / '__pycache__').mkdir()
+    (tmp_path / 'conformance.py').write_text('VERSION = 1\n')
+    with mock.patch.object(conformance, '__file__', str(tmp_path / 'conformance.py')):
+        fingerprint = conformance.code_fingerprint()
+        (tmp_path / '__pycache__' / 'conformance.pyc').write_bytes(b'bytecode')
+        (tmp_path / 'notes.txt').write_text('Not code')
+        assert conformance.code_fingerprint() == fingerprint
+
+        (tmp_path / 'conformance.py').write_text('VERSION = 2\n')
+        assert conformance.code_fingerprint() != fingerprint
+
+
+class TestReadResult:
+    def test_running(self, nes):
+        assert conformance.read_result(nes) is None
+
+        report_status(nes, conformance.STATUS_RUNNING)
+        assert conformance.read_result(nes) is None
+
+    def test_passed(self, nes):
+        report_status(nes, 0, b'All tests passed\n')
+
+        assert conformance.read_result(nes) == (Outcome.passed, 'All tests passed')
+
+    def test_failed(self, nes):
+        report_status(nes, 3, b'Wrong flags\n')
+
+        assert conformance.read_result(nes) == (Outcome.failed, 'Wrong flags')
+
+    def test_unterminated_message(self, nes):
+        report_status(nes, 0)
+        start = conformance.RESULT_MESSAGE
+        nes.cpu.memory[start:] = b'a' * (len(nes.cpu.memory) - start)
+
+        result = conformance.read_result(nes)
+
+        assert result is not None
+        assert result[0] == Outcome.passed
+        assert result[1].startswith('aaa')
+
+    @pytest.mark.parametrize(
+        ('text', 'expected'),
+        [(b'Passed', (Outcome.passed, 'Passed')), (b'Failed #2', (Outcome.failed, 'Failed #2')), (b'Testing', None)],
+    )
+    def test_screen(self, nes, text, expected):
+        start = 4 * conformance.SCREEN_COLUMNS + 2
+        end = start + len(text)
+        nes.ppu.name_tables[start:end] = text
+
+        assert conformance.read_result(nes) == expected
+
+
+class TestRunNes:
+    def test_result(self, nes):
+        with mock.patch.object(conformance, 'read_result', side_effect=[None, (Outcome.passed, 'ok')]):
+            assert conformance.run_nes(nes, FRAME_LIMIT) == (Outcome.passed, 'ok', 2)
+
+    def test_timeout(self, nes):
+        assert conformance.run_nes(nes, FRAME_LIMIT) == (Outcome.timeout, '', FRAME_LIMIT)
+
+    def test_reset(self, nes):
+        """Reset is pressed a while after the rom asks for it."""
+        report_status(nes, conformance.STATUS_RESET_REQUIRED)
+
+        with mock.patch.object(nes, 'reset', side_effect=lambda: report_status(nes, 0)) as reset:
+            assert conformance.run_nes(nes) == (Outcome.passed, '', conformance.RESET_DELAY_FRAMES + 2)
+
+        reset.assert_called_once_with()
+
+    def test_reset_withdrawn(self, nes):
+        report_status(nes, conformance.STATUS_RESET_REQUIRED)
+        nes.run_frame()
+
+        with mock.patch.object(nes, 'reset') as reset:
+            nes.cpu.memory[conformance.RESULT_STATUS] = conformance.STATUS_RUNNING
+            conformance.run_nes(nes, conformance.RESET_DELAY_FRAMES + 3)
+
+        reset.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    ('rom', 'expected', 'expected_message'),
+    [
+        ('cpu/idle.nes', Outcome.timeout, ''),
+        ('cpu/brk.NES', Outcome.error, 'NotImplementedError: Unsupported opcode 0x00 at 0x8000'),
+        ('broken.nes', Outcome.error, 'RomFormatError: Missing iNES header'),
+    ],
+)
+def test_run_rom(rom_directory, rom, expected, expected_message):
+    result = conformance.run_rom(rom_directory, rom, FRAME_LIMIT)
+
+    assert result.rom == rom
+    assert result.outcome == expected
+    assert result.message == expected_message
+
+
+def test_run_rom_crash(rom_directory):
+    """Bugs in the emulator are reported as the rom's error."""
+    with mock.patch.object(conformance, 'run_nes', side_effect=IndexError('bytearray index out of range')):
+        result = conformance.run_rom(rom_directory, 'cpu/idle.nes', FRAME_LIMIT)
+
+    assert result == Result('cpu/idle.nes', Outcome.error, 'IndexError: bytearray index out of range', 0)
+
+
+class TestRunSuite:
+    def test_results(self, rom_directory):
+        results = conformance.run_suite(rom_directory, workers=2, frame_limit=FRAME_LIMIT)
+
+        assert [(result.rom, result.outcome) for result in results] == [
+            ('broken.nes', Outcome.error),
+            ('cpu/brk.NES', Outcome.error),
+            ('cpu/idle.nes', Outcome.timeout),
+        ]
+
+    def test_cached(self, rom_directory):
+        expected = conformance.run_suite(rom_directory, workers=2, frame_limit=FRAME_LIMIT)
+
+        with mock.patch.object(conformance, 'ProcessPoolExecutor') as executor:
+            assert conformance.run_suite(rom_directory, frame_limit=FRAME_LIMIT) == expected
+
+        executor.assert_not_called()
+
+    @pytest.mark.parametrize(
+        'rerun',
+        [
+            {'frame_limit': FRAME_LIMIT + 1},
+            {'frame_limit': FRAME_LIMIT, 'use_cache': False},
+        ],
+        ids=['Frame limit changed', 'Cache disabled'],
+    )
+    def test_not_cached(self, rom_directory, rerun):
+        conformance.run_suite(rom_directory, workers=1, frame_limit=FRAME_LIMIT)
+
+        results = conformance.run_suite(rom_directory, workers=1, **rerun)
+
+        assert results[2].frames == rerun['frame_limit']
+
+    @pytest.mark.parametrize(
+        'entry',
+        [b'not json', b'5', b'{}', b'["idle.nes", "bogus", "", 3]', b'["idle.nes", "passed"]'],
+        ids=['Not JSON', 'Not a list', 'Not a result', 'Unknown outcome', 'Missing fields'],
+    )
+    def test_corrupt_cache_entry(self, rom_directory, entry):
+        expected = conformance.run_suite(rom_directory, workers=1, frame_limit=FRAME_LIMIT)
+        path = conformance._cache_path(rom_directory, 'cpu/idle.nes', conformance.code_fingerprint(), FRAME_LIMIT)
+        assert path is not None
+        with open(path, 'wb') as f:
+            f.write(entry)
+
+        assert conformance.run_suite(rom_directory, workers=1, frame_limit=FRAME_LIMIT) == expected
+        with open(path, 'rb') as f:
+            assert Result.from_json(f.read()) == expected[2]
+
+    def test_code_changed(self, rom_directory):
+        conformance.run_suite(rom_directory, workers=1, frame_limit=FRAME_LIMIT)
+
+        with mock.patch.object(conformance, 'code_fingerprint', return_value='changed'):
+            with mock.patch.object(conformance, 'ProcessPoolExecutor') as executor:
+                conformance.run_suite(rom_directory, frame_limit=FRAME_LIMIT)
+
+        executor.assert_called_once_with(max_workers=None)
+
+    def test_unreadable(self, rom_directory, tmp_path):
+        """Roms that can't be read are reported as errors, every run."""
+        (tmp_path / 'missing.nes').symlink_to(tmp_path / 'nowhere')
+        conformance.run_suite(rom_directory, workers=1, frame_limit=FRAME_LIMIT)
+
+        results = conformance.run_suite(rom_directory, workers=1, frame_limit=FRAME_LIMIT)
+
+        assert results[3].rom == 'missing.nes'
+        assert results[3].outcome == Outcome.error
+        assert results[3].message.startswith('FileNotFoundError')
+
+
+def test_report():
+    results = [Result('a.nes', Outcome.passed, '', 10), Result('b.nes', Outcome.failed, 'Failed #2', 20)]
+
+    assert conformance.report(results) == [
+        'PASSED   a.nes',
+        'FAILED   b.nes: Failed #2',
+        '1 passed, 1 failed, 0 timeout, 0 error',
+    ]
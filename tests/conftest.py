@@ -0,0 +1,11 @@
+import os
+from unittest import mock
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def cache_home(tmpdir_factory):
+    """Keep tests from reading or writing the user's cache."""
+    with mock.patch.dict(os.environ, {'XDG_CACHE_HOME': str(tmpdir_factory.mktemp('cache'))}):
+        yield
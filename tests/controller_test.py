@@ -0,0 +1,52 @@
+# pylint: disable=no-self-use
+from pynes import controller
+from pynes.controller import Button
+
+
+class TestController:
+    def test_read_serially(self):
+        test_controller = controller.Controller()
+        test_controller.buttons = Button.a | Button.start | Button.right
+        test_controller.write(1)
+        test_controller.write(0)
+
+        assert [test_controller.read() for _ in range(8)] == [1, 0, 0, 1, 0, 0, 0, 1]
+
+    def test_read_after_all_buttons(self):
+        """Official controllers return 1 once all buttons are read."""
+        test_controller = controller.Controller()
+        test_controller.write(1)
+        test_controller.write(0)
+
+        assert [test_controller.read() for _ in range(10)] == [0] * 8 + [1, 1]
+
+    def test_strobe_held(self):
+        """While strobe is high, the A button is read over and over."""
+        test_controller = controller.Controller()
+        test_controller.buttons = Button.a | Button.b
+        test_controller.write(1)
+
+        assert [test_controller.read() for _ in range(3)] == [1, 1, 1]
+
+    def test_buttons_latched_on_strobe(self):
+        test_controller = controller.Controller()
+        test_controller.write(1)
+        test_controller.write(0)
+        test_controller.buttons = Button.a
+
+        assert test_controller.read() == 0
+
+
+def test_state():
+    test_controller = controller.Controller()
+    test_controller.buttons = Button.a | Button.b
+    test_controller.write(1)
+    test_controller.write(0)
+    test_controller.read()
+    state = test_controller.save_state()
+
+    restored = controller.Controller()
+    restored.load_state(state)
+
+    assert restored.buttons == test_controller.buttons
+    assert [restored.read() for _ in range(3)] == [1, 0, 0]
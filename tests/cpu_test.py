@@ -1,4 +1,8 @@
 # pylint: disable=no-self-use
+from unittest import mock
+
+import pytest
+
 from pynes import cpu
 
 
@@ -12,3 +16,161 @@ class TestDecodeInstruction:
     def test_placeholder(self):
         cpu_instance = cpu.Cpu()
         cpu_instance.decode_instruction('PLACEHOLDER')  # type: ignore
+
+
+class TestStep:
+    @staticmethod
+    def make_cpu(program: bytes) -> cpu.Cpu:
+        test_cpu = cpu.Cpu()
+        test_cpu.memory = bytearray(0x100)
+        test_cpu.memory[: len(program)] = program
+        return test_cpu
+
+    def test_immediate(self):
+        """ADC #$05"""
+        test_cpu = self.make_cpu(b'\x69\x05')
+
+        assert test_cpu.step() == 2
+        assert test_cpu.accumulator == 5
+        assert test_cpu.program_counter == 2
+        assert test_cpu.cycles == 2
+
+    def test_absolute_operand_is_little_endian(self):
+        """ADC $0004"""
+        test_cpu = self.make_cpu(b'\x6d\x04\x00\x00\x07')
+        test_cpu.step()
+
+        assert test_cpu.accumulator == 7
+        assert test_cpu.program_counter == 3
+        assert test_cpu.cycles == 4
+
+    def test_implied(self):
+        """CLC"""
+        test_cpu = self.make_cpu(b'\x18')
+        test_cpu.status.carry = True
+        test_cpu.step()
+
+        assert not test_cpu.status.carry
+        assert test_cpu.program_counter == 1
+
+    def test_backward_branch(self):
+        """CLC; BCC -3 loops back to CLC."""
+        test_cpu = self.make_cpu(b'\x18\x90\xfd')
+        test_cpu.step()
+        test_cpu.step()
+
+        assert test_cpu.program_counter == 0
+
+    def test_unsupported_opcode(self):
+        test_cpu = self.make_cpu(b'\xff')
+
+        with pytest.raises(NotImplementedError):
+            test_cpu.step()
+
+
+def test_run():
+    test_cpu = cpu.Cpu()
+    test_cpu.memory = bytearray(b'\x18\x90\xfd')
+    test_cpu.run(9)
+
+    # CLC and BCC take 2 cycles each, so the last instruction overshoots
+    assert test_cpu.cycles == 10
+
+
+@pytest.mark.parametrize(
+    ('variant', 'expected', 'expected_cycles'),
+    [(cpu.Variant.ricoh_2a03, 0x0A, 2), (cpu.Variant.nmos_6502, 0x10, 2), (cpu.Variant.wdc_65c02, 0x10, 3)],
+)
+def test_variant(variant, expected, expected_cycles):
+    """ADC #$01 with the decimal flag set. The NES's cpu has no decimal mode."""
+    test_cpu = cpu.Cpu(variant)
+    test_cpu.memory = bytearray(b'\x69\x01')
+    test_cpu.accumulator = 0x09
+    test_cpu.status.decimal = True
+
+    assert test_cpu.step() == expected_cycles
+    assert test_cpu.variant == variant
+    assert test_cpu.accumulator == expected
+
+
+class TestMemory:
+    def test_read_unmapped(self):
+        test_cpu = cpu.Cpu()
+        test_cpu.memory = bytearray(b'\x00\x05')
+
+        assert test_cpu.read_from_memory(1) == 5
+
+    def test_write_unmapped(self):
+        test_cpu = cpu.Cpu()
+        test_cpu.memory = bytearray(2)
+        test_cpu.write_to_memory(1, 5)
+
+        assert test_cpu.memory == b'\x00\x05'
+
+    def test_read_mapped(self):
+        test_cpu = cpu.Cpu()
+        reader = mock.Mock(return_value=5)
+        test_cpu.bus.map(0x2000, 0x20FF, reader=reader)
+
+        assert test_cpu.read_from_memory(0x2002) == 5
+        reader.assert_called_once_with(0x2002)
+
+    def test_write_mapped(self):
+        test_cpu = cpu.Cpu()
+        writer = mock.Mock()
+        test_cpu.bus.map(0x2000, 0x20FF, writer=writer)
+        test_cpu.write_to_memory(0x2006, 5)
+
+        writer.assert_called_once_with(0x2006, 5)
+
+
+class TestStatusRegister:
+    def test_pack(self):
+        status = cpu.StatusRegister(carry=True, decimal=True, negative=True)
+
+        assert status.pack() == 0b10101001
+
+    @pytest.mark.parametrize('value', [0b00100000, 0b11111111, 0b10101001, 0b01110110])
+    def test_round_trip(self, value):
+        assert cpu.StatusRegister.unpack(value).pack() == value | 0b00100000
+
+
+class TestState:
+    def test_round_trip(self):
+        test_cpu = cpu.Cpu()
+        test_cpu.memory = bytearray(b'\x01\x02\x03')
+        test_cpu.program_counter = 0x8000
+        test_cpu.accumulator = 1
+        test_cpu.register_x = 2
+        test_cpu.register_y = 3
+        test_cpu.status.carry = True
+        test_cpu.cycles = 100
+        state = test_cpu.save_state()
+
+        restored = cpu.Cpu()
+        restored.memory = bytearray(3)
+        restored.load_state(state)
+
+        assert restored.save_state() == state
+        assert restored.status == test_cpu.status
+        assert restored.memory == b'\x01\x02\x03'
+
+    def test_memory_is_restored_in_place(self):
+        test_cpu = cpu.Cpu()
+        test_cpu.memory = bytearray(2)
+        view = memoryview(test_cpu.memory)
+        state = test_cpu.save_state()
+
+        test_cpu.memory[0] = 5
+        test_cpu.load_state(state)
+
+        assert view[0] == 0
+
+    def test_memory_size_mismatch(self):
+        test_cpu = cpu.Cpu()
+        test_cpu.memory = bytearray(2)
+        state = test_cpu.save_state()
+        test_cpu.memory = bytearray(3)
+
+        with pytest.raises(ValueError):
+            test_cpu.load_state(state)
@@ -0,0 +1,173 @@
+# pylint: disable=no-self-use
+from unittest import mock
+
+import pytest
+
+from pynes import debugger
+from pynes import opcodes
+from pynes.addressing_mode import AddressingMode
+from pynes.nes import CPU_CYCLES_PER_FRAME
+from pynes.nes import Nes
+from pynes.opcodes import Opcode
+from pynes.rom import Rom
+from testing.util import IDLE_PROGRAM
+from testing.util import make_rom
+
+# The cpu has no store instructions yet
+STORE_OPCODES = {
+    0x85: Opcode(
+        'STA', AddressingMode.zero_page, 2, 3, lambda cpu, operand: cpu.write_to_memory(operand, cpu.accumulator)
+    ),
+}
+
+# $8000: CLC; ADC $10; STA $20; BCC $8000
+LOOP_PROGRAM = bytes([0x18, 0x65, 0x10, 0x85, 0x20, 0x90, 0xF9])
+LOOP_CYCLES = 2 + 3 + 3 + 2
+
+
+@pytest.fixture
+def test_nes():
+    with mock.patch.dict(opcodes.OPCODES, STORE_OPCODES):
+        test_nes = Nes(Rom.from_bytes(make_rom(LOOP_PROGRAM)))
+        test_nes.cpu.idle_loop_detector = None
+        test_nes.cpu.accumulator = 7
+        yield test_nes
+
+
+@pytest.fixture
+def test_debugger(test_nes):
+    yield debugger.Debugger(test_nes.cpu)
+
+
+def test_inactive(test_debugger):
+    with mock.patch.object(test_debugger.cpu, 'run') as run:
+        assert test_debugger.run(1000) is None
+
+    run.assert_called_once_with(1000)
+    assert not test_debugger.active
+
+
+class TestBreakpoints:
+    def test_hit(self, test_debugger):
+        test_debugger.add_breakpoint(0x8003)
+
+        assert test_debugger.run(1000) == debugger.Hit(debugger.Access.breakpoint, 0x8003, None)
+        assert test_debugger.cpu.program_counter == 0x8003
+        assert test_debugger.cpu.cycles == 5
+
+    def test_resume(self, test_debugger):
+        test_debugger.add_breakpoint(0x8003)
+        test_debugger.run(1000)
+
+        assert test_debugger.run(1000) == debugger.Hit(debugger.Access.breakpoint, 0x8003, None)
+        assert test_debugger.cpu.cycles == 5 + LOOP_CYCLES
+
+    def test_block_start(self, test_debugger):
+        # Execution starts at the breakpoint, which is treated as resuming from it
+        test_debugger.add_breakpoint(0x8000)
+
+        assert test_debugger.run(1000) == debugger.Hit(debugger.Access.breakpoint, 0x8000, None)
+        assert test_debugger.cpu.cycles == LOOP_CYCLES
+
+    def test_removed(self, test_debugger):
+        test_debugger.add_breakpoint(0x8003)
+        test_debugger.remove_breakpoint(0x8003)
+        test_debugger.watch(0x30)
+
+        assert test_debugger.run(1000) is None
+        assert 1000 <= test_debugger.cpu.cycles < 1000 + LOOP_CYCLES
+
+    def test_until_mid_block(self, test_debugger):
+        test_debugger.add_breakpoint(0x8005)
+
+        assert test_debugger.run(3) is None
+        assert test_debugger.cpu.program_counter == 0x8003
+
+
+class TestWatchpoints:
+    def test_read(self, test_debugger):
+        test_debugger.cpu.memory[0x10] = 0x42
+        test_debugger.watch(0x10)
+
+        assert test_debugger.run(1000) == debugger.Hit(debugger.Access.read, 0x10, 0x42)
+        # Stops after the instruction that read
+        assert test_debugger.cpu.program_counter == 0x8003
+
+    def test_write(self, test_debugger):
+        test_debugger.watch(0x20, read=False)
+
+        assert test_debugger.run(1000) == debugger.Hit(debugger.Access.write, 0x20, 7)
+        assert test_debugger.cpu.memory[0x20] == 7
+
+    def test_read_only(self, test_debugger):
+        test_debugger.watch(0x20, write=False)
+
+        assert test_debugger.run(100) is None
+        assert test_debugger.cpu.memory[0x20] == 7
+
+    def test_handlers_wrapped(self, test_nes, test_debugger):
+        test_debugger.watch(0x4016)
+        test_nes.controllers[0].buttons = 1
+        test_nes.cpu.write_to_memory(0x4016, 1)
+
+        assert test_nes.cpu.read_from_memory(0x4016) == 1
+        assert test_debugger._hit == debugger.Hit(debugger.Access.read, 0x4016, 1)
+
+    def test_unwatch(self, test_nes, test_debugger):
+        reader = test_nes.cpu.bus.readers[0x40]
+        writer = test_nes.cpu.bus.writers[0x40]
+        test_debugger.watch(0x4016)
+        test_debugger.watch(0x4017)
+
+        test_debugger.unwatch(0x4016)
+        assert test_nes.cpu.bus.readers[0x40] is not reader
+
+        test_debugger.unwatch(0x4017)
+        assert test_nes.cpu.bus.readers[0x40] is reader
+        assert test_nes.cpu.bus.writers[0x40] is writer
+        assert not test_debugger.active
+
+    def test_unwatch_unknown(self, test_nes, test_debugger):
+        test_debugger.unwatch(0x10)
+
+        assert test_nes.cpu.bus.readers[0] is None
+
+
+def test_idle_loop():
+    """Wait loops aren't skipped while debugging, every iteration reaches the breakpoint in them."""
+    test_nes = Nes(Rom.from_bytes(make_rom(IDLE_PROGRAM)))
+    detector = test_nes.cpu.idle_loop_detector
+    test_debugger = debugger.Debugger(test_nes.cpu)
+    test_debugger.add_breakpoint(0x8000)
+
+    hits = 0
+    while test_debugger.run(CPU_CYCLES_PER_FRAME) is not None:
+        hits += 1
+
+    # CLC; BCC back to it, 4 cycles an iteration
+    assert hits == CPU_CYCLES_PER_FRAME // 4
+    assert test_nes.cpu.idle_loop_detector is detector
+    assert detector is not None and detector.skipped_cycles == 0
+
+
+def test_clear(test_nes, test_debugger):
+    test_debugger.add_breakpoint(0x8003)
+    test_debugger.watch(0x10)
+    test_debugger.watch(0x4016)
+    test_debugger.clear()
+
+    assert not test_debugger.active
+    assert test_nes.cpu.bus.readers[0] is None
+    assert test_nes.cpu.bus.writers[0] is None
+
+
+class TestBlocks:
+    def test_size_limit(self, test_debugger):
+        test_debugger.cpu.memory[0x9000:0x9064] = bytes([0x18]) * 100
+
+        assert len(test_debugger._decode_block(0x9000)) == debugger.MAX_BLOCK_SIZE
+
+    def test_unknown_opcode(self, test_debugger):
+        test_debugger.cpu.memory[0x9000:0x9002] = bytes([0x18, 0xEA])
+
+        assert test_debugger._decode_block(0x9000) == [0x9000, 0x9001]
@@ -0,0 +1,216 @@
+# pylint: disable=no-self-use
+import json
+import os
+from unittest import mock
+
+import pytest
+
+from pynes import disassembler
+from pynes import opcodes
+from pynes.addressing_mode import AddressingMode
+from pynes.opcodes import Opcode
+from pynes.rom import Rom
+from testing.util import make_rom
+from testing.util import named_parametrize
+
+# Control flow instructions the cpu doesn't implement yet
+FLOW_OPCODES = {
+    0x4C: Opcode('JMP', AddressingMode.absolute, 3, 3, mock.Mock()),
+    # Stand-in for an indirect jump, the destination isn't known statically
+    0x6C: Opcode('JMP', AddressingMode.zero_page, 2, 5, mock.Mock()),
+    0x20: Opcode('JSR', AddressingMode.absolute, 3, 6, mock.Mock()),
+    0x60: Opcode('RTS', AddressingMode.implied, 1, 6, mock.Mock()),
+}
+
+# $8000: CLC; BCC $8005; ADC #$01; $8005: CMP $10; BNE $8000; then an unknown opcode
+LOOP_PROGRAM = bytes([0x18, 0x90, 0x02, 0x69, 0x01, 0xC5, 0x10, 0xD0, 0xF7, 0xEA])
+
+
+@pytest.fixture
+def flow_opcodes():
+    with mock.patch.dict(opcodes.OPCODES, FLOW_OPCODES):
+        yield
+
+
+def load(program: bytes) -> bytearray:
+    memory = bytearray(0x10000)
+    Rom.from_bytes(make_rom(program)).load_into(memory)
+    return memory
+
+
+class TestDecode:
+    @named_parametrize(
+        ('program', 'text'),
+        [
+            ('immediate', bytes([0x69, 0x05]), 'ADC #$05'),
+            ('zero_page', bytes([0x65, 0x10]), 'ADC $10'),
+            ('absolute', bytes([0x6D, 0x34, 0x12]), 'ADC $1234'),
+            ('accumulator', bytes([0x0A]), 'ASL A'),
+            ('relative', bytes([0x90, 0xFE]), 'BCC $8000'),
+            ('implied', bytes([0x18]), 'CLC'),
+        ],
+    )
+    def test_format(self, program, text):
+        assert str(disassembler.decode(load(program), 0x8000)) == text
+
+    def test_instruction(self):
+        instruction = disassembler.decode(load(bytes([0x6D, 0x34, 0x12])), 0x8000)
+
+        assert instruction == disassembler.Instruction(0x8000, 0x6D, 'ADC', AddressingMode.absolute, 3, 0x1234)
+        assert instruction is not None
+        assert instruction.target is None
+
+    def test_unknown(self):
+        assert disassembler.decode(load(bytes([0xEA])), 0x8000) is None
+
+    @named_parametrize(
+        ('program', 'target'),
+        [
+            ('branch', bytes([0x90, 0x10]), 0x8012),
+            ('jump', bytes([0x4C, 0x00, 0x90]), 0x9000),
+        ],
+    )
+    def test_target(self, flow_opcodes, program, target):
+        instruction = disassembler.decode(load(program), 0x8000)
+
+        assert instruction is not None
+        assert instruction.target == target
+
+
+def test_opcodes_fingerprint(flow_opcodes):
+    fingerprint = disassembler.opcodes_fingerprint()
+
+    with mock.patch.dict(opcodes.OPCODES, {0xEA: FLOW_OPCODES[0x60]}):
+        assert disassembler.opcodes_fingerprint() != fingerprint
+
+
+class TestAnalyze:
+    def test_loop(self):
+        analysis = disassembler.analyze(load(LOOP_PROGRAM))
+
+        assert analysis.entry_points == {'nmi': 0, 'reset': 0x8000, 'irq': 0}
+        assert analysis.blocks == {
+            0x8000: disassembler.BasicBlock(0x8000, 0x8003, (0x8005, 0x8003)),
+            # Falls through into the branch target
+            0x8003: disassembler.BasicBlock(0x8003, 0x8005, (0x8005,)),
+            0x8005: disassembler.BasicBlock(0x8005, 0x8009, (0x8000, 0x8009)),
+        }
+        assert analysis.jump_targets == {0x8000, 0x8005}
+        assert analysis.unknown == {0x8009}
+
+    def test_code_map(self):
+        analysis = disassembler.analyze(load(LOOP_PROGRAM))
+
+        assert list(analysis.code_map[:10]) == [1, 1, 2, 1, 2, 1, 2, 1, 2, 0]
+        assert analysis.is_code(0x8002)
+        assert not analysis.is_instruction(0x8002)
+        assert analysis.is_instruction(0x8003)
+        assert not analysis.is_code(0x8009)
+        assert not analysis.is_code(0x0000)
+
+    def test_block_at(self):
+        analysis = disassembler.analyze(load(LOOP_PROGRAM))
+
+        assert analysis.block_at(0x8006) == analysis.blocks[0x8005]
+        assert analysis.block_at(0x7FFF) is None
+        assert analysis.block_at(0x8009) is None
+
+    def test_subroutine(self, flow_opcodes):
+        # JSR $8007; JMP $8000; (data) ; $8007: CLC; RTS
+        analysis = disassembler.analyze(load(bytes([0x20, 0x07, 0x80, 0x4C, 0x00, 0x80, 0xFF, 0x18, 0x60])))
+
+        assert analysis.blocks == {
+            0x8000: disassembler.BasicBlock(0x8000, 0x8003, (0x8007, 0x8003)),
+            0x8003: disassembler.BasicBlock(0x8003, 0x8006, (0x8000,)),
+            0x8007: disassembler.BasicBlock(0x8007, 0x8009, ()),
+        }
+        assert analysis.jump_targets == {0x8000, 0x8007}
+        assert not analysis.is_code(0x8006)
+        assert not analysis.unknown
+
+    def test_indirect_jump(self, flow_opcodes):
+        analysis = disassembler.analyze(load(bytes([0x6C, 0x10, 0x18])))
+
+        assert analysis.blocks == {0x8000: disassembler.BasicBlock(0x8000, 0x8002, ())}
+        assert not analysis.is_code(0x8002)
+
+    def test_leaving_rom(self):
+        # BCC to ram isn't followed
+        analysis = disassembler.analyze(load(bytes([0x90, 0x80, 0xEA])))
+
+        assert analysis.jump_targets == {0x7F82}
+        assert analysis.unknown == {0x8002}
+        assert analysis.block_at(0x7F82) is None
+
+    def test_json(self, flow_opcodes):
+        analysis = disassembler.analyze(load(bytes([0x20, 0x07, 0x80, 0x4C, 0x00, 0x80, 0xFF, 0x18, 0x60])))
+        data = json.loads(json.dumps(analysis.to_json()))
+
+        assert disassembler.Analysis.from_json(data) == analysis
+
+
+def test_listing():
+    memory = load(LOOP_PROGRAM)
+    lines = list(disassembler.listing(memory, disassembler.analyze(memory)))
+
+    assert lines[:9] == [
+        'L8000:',
+        '    $8000  CLC',
+        '    $8001  BCC $8005',
+        '    $8003  ADC #$01',
+        'L8005:',
+        '    $8005  CMP $10',
+        '    $8007  BNE $8000',
+        '    $8009  .byte $EA',
+        '    $800A  .byte $00',
+    ]
+    # Labels, instructions and a line for every other byte
+    assert len(lines) == 2 + 5 + 0x8000 - 9
+
+
+class TestCache:
+    @pytest.fixture
+    def rom(self):
+        yield Rom.from_bytes(make_rom(LOOP_PROGRAM))
+
+    def test_cached(self, rom, tmpdir):
+        analysis = disassembler.load_analysis(rom, str(tmpdir))
+
+        assert os.listdir(str(tmpdir)) == [f'{rom.sha1}.json']
+        with mock.patch.object(disassembler, 'analyze') as analyze:
+            assert disassembler.load_analysis(rom, str(tmpdir)) == analysis
+        assert not analyze.called
+
+    @pytest.mark.parametrize(
+        'contents',
+        ['{', json.dumps({'version': 0}), json.dumps({'version': disassembler.ANALYSIS_VERSION})],
+        ids=['corrupt', 'old_version', 'missing_keys'],
+    )
+    def test_recomputed(self, rom, tmpdir, contents):
+        tmpdir.join(f'{rom.sha1}.json').write(contents)
+
+        analysis = disassembler.load_analysis(rom, str(tmpdir))
+
+        assert analysis.entry_points['reset'] == 0x8000
+        assert json.loads(tmpdir.join(f'{rom.sha1}.json').read())['version'] == disassembler.ANALYSIS_VERSION
+
+    def test_opcodes_changed(self, rom, tmpdir, flow_opcodes):
+        tmpdir.join(f'{rom.sha1}.json').write(json.dumps({'version': disassembler.ANALYSIS_VERSION, 'opcodes': ''}))
+
+        with mock.patch.object(disassembler, 'analyze', wraps=disassembler.analyze) as analyze:
+            disassembler.load_analysis(rom, str(tmpdir))
+        assert analyze.called
+
+    def test_unwritable(self, rom, tmpdir):
+        not_a_directory = tmpdir.join('file')
+        not_a_directory.write('')
+
+        analysis = disassembler.load_analysis(rom, str(not_a_directory))
+
+        assert analysis.entry_points['reset'] == 0x8000
+
+    def test_default_dir(self, rom, tmpdir):
+        with mock.patch.dict(os.environ, {'XDG_CACHE_HOME': str(tmpdir)}):
+            disassembler.load_analysis(rom)
+
+        assert tmpdir.join('pynes', 'analysis', f'{rom.sha1}.json').check()
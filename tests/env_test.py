@@ -0,0 +1,195 @@
+# pylint: disable=no-self-use
+import ctypes
+import multiprocessing
+from multiprocessing.sharedctypes import RawArray
+from typing import Tuple
+
+import numpy as np
+import pytest
+
+from pynes import env
+from pynes.controller import Button
+from pynes.nes import MEMORY_SIZE
+from pynes.nes import Nes
+from pynes.nes import RAM_SIZE
+from pynes.rom import Rom
+from pynes.video import HEIGHT
+from pynes.video import WIDTH
+from testing.util import make_rom
+
+ROM = Rom.from_bytes(make_rom())
+
+
+def held_a(nes: Nes) -> float:
+    return float(nes.controllers[0].buttons & Button.a)
+
+
+def stamp_frame(nes: Nes) -> float:
+    """Leave the frame number in ram, to tell observations apart."""
+    nes.cpu.memory[0] = nes.frame_count
+    return 0.0
+
+
+def third_frame(nes: Nes) -> bool:
+    return nes.frame_count == 3
+
+
+@pytest.fixture
+def test_env():
+    yield env.NesEnv(ROM, reward=held_a, done=third_frame)
+
+
+def test_invalid_frame_skip():
+    with pytest.raises(ValueError):
+        env.NesEnv(ROM, frame_skip=0)
+
+
+def test_defaults():
+    test_env = env.NesEnv(ROM, max_frames=2)
+
+    assert test_env.step(Button.a)[1:3] == (0.0, False)
+    assert test_env.step(Button.a)[1:3] == (0.0, True)
+
+
+class TestNesEnv:
+    def test_views(self, test_env):
+        observation = test_env.reset()
+        test_env.nes.cpu.memory[0x10] = 5
+        test_env.nes.frame.pixels[WIDTH + 2] = 7
+
+        assert observation.ram.shape == (RAM_SIZE,)
+        assert observation.ram[0x10] == 5
+        assert observation.pixels[1, 2] == 7
+        assert not observation.pixels.flags.writeable
+
+    def test_step(self, test_env):
+        test_env.reset()
+        observation, reward, done, info = test_env.step(Button.a | Button.b)
+
+        assert observation is test_env.observation
+        assert reward == 1.0
+        assert not done
+        assert info == {'frame': 1}
+        assert test_env.nes.controllers[0].buttons == Button.a | Button.b
+
+    def test_done(self, test_env):
+        results = [test_env.step(0)[2] for _ in range(3)]
+
+        assert results == [False, False, True]
+
+    def test_reset(self, test_env):
+        initial_state = test_env.nes.save_state()
+        test_env.step(Button.a)
+        test_env.nes.frame.pixels[0] = 1
+
+        observation = test_env.reset()
+
+        assert test_env.nes.save_state() == initial_state
+        assert observation.pixels[0, 0] == 0
+
+    def test_frame_skip(self):
+        test_env = env.NesEnv(ROM, frame_skip=4, reward=held_a, done=third_frame)
+
+        _, reward, done, info = test_env.step(Button.a)
+
+        # Stops early when done
+        assert (reward, done, info) == (3.0, True, {'frame': 3})
+        assert test_env.nes.render
+
+    def test_skipped_frames_not_drawn(self):
+        test_env = env.NesEnv(ROM, frame_skip=3)
+        rendered = []
+        original = test_env.nes.run_frame
+
+        def run_frame() -> None:
+            rendered.append(test_env.nes.render)
+            original()
+
+        test_env.nes.run_frame = run_frame  # type: ignore
+        test_env.step(0)
+
+        assert rendered == [False, False, True]
+
+    def test_last_frame_drawn(self):
+        """The frame that ends the episode is drawn, even if it was going to be skipped."""
+        test_env = env.NesEnv(ROM, frame_skip=4, done=third_frame)
+        test_env.nes.ppu.palette[0] = 0x21
+
+        observation, _, done, _ = test_env.step(0)
+
+        assert done
+        assert (observation.pixels == 0x21).all()
+
+    def test_move_to(self, test_env):
+        pixels = memoryview(bytearray(HEIGHT * WIDTH))
+        memory = memoryview(bytearray(MEMORY_SIZE))
+        test_env.nes.cpu.memory[0] = 5
+
+        test_env._move_to(pixels, memory)
+        test_env.nes.ppu.palette[0] = 0x21
+        test_env.step(0)
+
+        # The console runs on the buffers, the observation is a view onto them
+        assert test_env.nes.cpu.memory is memory
+        assert memory[0] == 5
+        assert pixels[0] == 0x21
+        assert test_env.observation.pixels[0, 0] == 0x21
+        test_env.nes.cpu.memory[1] = 7
+        assert test_env.observation.ram[1] == 7
+
+
+SharedArrays = Tuple['ctypes.Array[ctypes.c_uint8]', 'ctypes.Array[ctypes.c_uint8]']
+
+
+def shared_arrays(count: int) -> SharedArrays:
+    return RawArray(ctypes.c_uint8, count * HEIGHT * WIDTH), RawArray(ctypes.c_uint8, count * MEMORY_SIZE)
+
+
+def test_worker():
+    """Runs the worker loop in this process, with the commands queued up front."""
+    pixels, memory = shared_arrays(2)
+    connection, worker_connection = multiprocessing.Pipe()
+    for command in [('reset', None)] + [('step', 0)] * 4 + [('close', None)]:
+        connection.send(command)
+
+    env._worker(worker_connection, pixels, memory, 1, (ROM, 1, stamp_frame, third_frame, None))
+
+    results = [connection.recv() for _ in range(5)]
+    assert results[0] is None
+    assert [done for _, done, _ in results[1:]] == [False, False, True, False]
+    observation = env._shared_observations(pixels, memory)
+    # Reset after the third frame, so this is the first frame of the next episode
+    assert observation.ram[1, 0] == 1
+    assert not observation.ram[0].any()
+
+
+class TestVectorEnv:
+    def test_step(self):
+        with env.VectorEnv(ROM, 2, reward=held_a, done=third_frame) as vector_env:
+            observation = vector_env.reset()
+            assert observation.pixels.shape == (2, HEIGHT, WIDTH)
+            assert observation.ram.shape == (2, RAM_SIZE)
+
+            for _ in range(2):
+                _, rewards, dones, infos = vector_env.step([Button.a, 0])
+            np.testing.assert_array_equal(rewards, [1.0, 0.0])
+            np.testing.assert_array_equal(dones, [False, False])
+            assert infos == [{'frame': 2}, {'frame': 2}]
+
+            _, _, dones, _ = vector_env.step([0, 0])
+            np.testing.assert_array_equal(dones, [True, True])
+
+        assert not vector_env._processes
+
+    def test_shared_observations(self):
+        with env.VectorEnv(ROM, 2, reward=stamp_frame) as vector_env:
+            vector_env.reset()
+            vector_env.step([0, 0])
+            observation, _, _, _ = vector_env.step([0, 0])
+
+            np.testing.assert_array_equal(observation.ram[:, 0], [2, 2])
+
+    def test_wrong_action_count(self):
+        with env.VectorEnv(ROM, 1) as vector_env:
+            with pytest.raises(ValueError):
+                vector_env.step([0, 0])
@@ -0,0 +1,139 @@
+# pylint: disable=no-self-use
+from typing import Tuple
+
+import pytest
+
+from pynes import cpu
+from pynes import idle
+from pynes.nes import CPU_CYCLES_PER_FRAME
+from pynes.nes import Nes
+from pynes.rom import Rom
+from testing.util import make_rom
+
+
+def make_cpu(program: bytes) -> Tuple[cpu.Cpu, idle.IdleLoopDetector]:
+    test_cpu = cpu.Cpu()
+    test_cpu.memory = bytearray(0x100)
+    test_cpu.memory[: len(program)] = program
+    detector = idle.IdleLoopDetector()
+    test_cpu.idle_loop_detector = detector
+    return test_cpu, detector
+
+
+def run_both_ways(program: bytes, frames: int = 2) -> int:
+    """Run with and without idle loop skipping, which must end up in the exact same state.
+
+    Returns the number of cycles skipped.
+    """
+    skipping = Nes(Rom.from_bytes(make_rom(program)))
+    detector = idle.IdleLoopDetector()
+    skipping.cpu.idle_loop_detector = detector
+    spinning = Nes(skipping.rom)
+    spinning.cpu.idle_loop_detector = None
+
+    for _ in range(frames):
+        skipping.run_frame()
+        spinning.run_frame()
+
+    assert skipping.save_state() == spinning.save_state()
+    return detector.skipped_cycles
+
+
+class TestSkip:
+    def test_branch_only(self):
+        """CLC; BCC -3"""
+        assert run_both_ways(bytes([0x18, 0x90, 0xFD])) > CPU_CYCLES_PER_FRAME
+
+    def test_polling(self):
+        """BIT $10; BPL -4: polls a flag in ram, the way games wait for vblank."""
+        assert run_both_ways(bytes([0x24, 0x10, 0x10, 0xFC])) > CPU_CYCLES_PER_FRAME
+
+    def test_polling_mirrored_ram(self):
+        """BIT $0810; BPL -5: reads through a bus handler that has no side effects."""
+        assert run_both_ways(bytes([0x2C, 0x10, 0x08, 0x10, 0xFB])) > CPU_CYCLES_PER_FRAME
+
+    @pytest.mark.parametrize('cycles', [100, 101, 102, 103])
+    def test_cycle_exact(self, cycles):
+        """Skipping must stop at the exact same cycle as spinning, whatever the remainder."""
+        skipping, _ = make_cpu(bytes([0x18, 0x90, 0xFD]))
+        spinning, _ = make_cpu(bytes([0x18, 0x90, 0xFD]))
+        spinning.idle_loop_detector = None
+
+        skipping.run(cycles)
+        spinning.run(cycles)
+
+        assert skipping.save_state() == spinning.save_state()
+
+
+class TestNotIdle:
+    def test_read_with_side_effects(self):
+        """BIT $4016; BPL -5: every controller read shifts to the next button, even when the values repeat."""
+        assert run_both_ways(bytes([0x2C, 0x16, 0x40, 0x10, 0xFB]), frames=1) == 0
+
+    def test_counting_loop(self):
+        """ADC #$01; BCC -4: the accumulator changes every iteration."""
+        test_cpu, detector = make_cpu(bytes([0x69, 0x01, 0x90, 0xFC]))
+        test_cpu.run(1000)
+
+        assert detector.skipped_cycles == 0
+
+    def test_changing_reads(self):
+        """AND $10; BPL -4, with the value read changing under the loop."""
+        test_cpu, detector = make_cpu(bytes([0x2D, 0x10, 0x00, 0x10, 0xFB]))
+        for i in range(20):
+            # Value changes every iteration (two instructions)
+            test_cpu.memory[0x10] = i // 2 % 2
+            test_cpu.step()
+            test_cpu.run_until = 1000
+
+        assert detector.skipped_cycles == 0
+
+    def test_write(self):
+        test_cpu, _ = make_cpu(bytes([0x18, 0x90, 0xFD]))
+        test_cpu.run(6)
+        assert 'write_to_memory' in vars(test_cpu), 'Loop should be watched'
+
+        test_cpu.write_to_memory(0x10, 1)
+
+        assert 'write_to_memory' not in vars(test_cpu)
+        assert test_cpu.memory[0x10] == 1
+
+    def test_too_many_reads(self):
+        test_cpu, _ = make_cpu(bytes([0x18, 0x90, 0xFD]))
+        test_cpu.run(6)
+
+        for _ in range(idle.MAX_LOOP_READS + 1):
+            test_cpu.read_from_memory(0x10)
+
+        assert 'read_from_memory' not in vars(test_cpu)
+
+    def test_long_branch(self):
+        test_cpu, detector = make_cpu(b'')
+        detector.backward_branch(test_cpu, -1)
+        assert 'read_from_memory' in vars(test_cpu)
+
+        detector.backward_branch(test_cpu, -idle.MAX_LOOP_SIZE - 1)
+
+        assert 'read_from_memory' not in vars(test_cpu)
+
+    def test_not_run(self):
+        """Without a run target, there is nothing to skip ahead to."""
+        test_cpu, detector = make_cpu(bytes([0x18, 0x90, 0xFD]))
+        for _ in range(10):
+            test_cpu.step()
+
+        assert detector.skipped_cycles == 0
+        assert test_cpu.cycles == 20
+
+
+def test_other_cpu():
+    """Moving on to a different cpu stops watching the previous one."""
+    detector = idle.IdleLoopDetector()
+    first, _ = make_cpu(b'')
+    second, _ = make_cpu(b'')
+
+    detector.backward_branch(first, -1)
+    detector.backward_branch(second, -1)
+
+    assert 'read_from_memory' not in vars(first)
+    assert 'read_from_memory' in vars(second)
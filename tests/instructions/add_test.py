@@ -136,3 +136,84 @@ def test_zero_page():
         add.add_with_carry(test_cpu, cpu.AddressingMode.zero_page, 2)
 
     assert mock_add.called, 'zero_page addressing mode should be identical to absolute mode'
+
+
+class TestDecimal:
+    @staticmethod
+    def make_cpu(accumulator: int, carry: bool = False) -> cpu.Cpu:
+        test_cpu = cpu.Cpu()
+        test_cpu.accumulator = accumulator
+        test_cpu.status.carry = carry
+        test_cpu.status.decimal = True
+        return test_cpu
+
+    @named_parametrize(
+        ('accumulator_state', 'immediate', 'carry', 'expected', 'expected_carry'),
+        [
+            ('Digits', 0x12, 0x34, False, 0x46, False),
+            ('Low digit carries', 0x09, 0x01, False, 0x10, False),
+            ('Carry in', 0x58, 0x46, True, 0x05, True),
+            ('Carry out', 0x99, 0x01, False, 0x00, True),
+        ],
+    )
+    @pytest.mark.parametrize('instruction', [add.nmos_add_with_carry, add.cmos_add_with_carry])
+    def test_adding(self, instruction, accumulator_state, immediate, carry, expected, expected_carry):
+        test_cpu = self.make_cpu(accumulator_state, carry)
+
+        instruction(test_cpu, cpu.AddressingMode.immediate, immediate)
+
+        assert test_cpu.accumulator == expected
+        assert test_cpu.status.carry == expected_carry
+
+    def test_nmos_flags(self):
+        """Zero comes from the binary sum, negative from the sum before the high digit is adjusted."""
+        test_cpu = self.make_cpu(0x99)
+
+        add.nmos_add_with_carry(test_cpu, cpu.AddressingMode.immediate, 0x01)
+
+        assert not test_cpu.status.zero
+        assert test_cpu.status.negative
+        assert not test_cpu.status.overflow
+        assert test_cpu.cycles == 0
+
+    def test_cmos_flags(self):
+        """The 65C02 sets negative and zero from the result, and takes an extra cycle."""
+        test_cpu = self.make_cpu(0x99)
+
+        add.cmos_add_with_carry(test_cpu, cpu.AddressingMode.immediate, 0x01)
+
+        assert test_cpu.status.zero
+        assert not test_cpu.status.negative
+        assert test_cpu.cycles == 1
+
+    def test_overflow(self):
+        test_cpu = self.make_cpu(0x79)
+
+        add.nmos_add_with_carry(test_cpu, cpu.AddressingMode.immediate, 0x01)
+
+        assert test_cpu.accumulator == 0x80
+        assert test_cpu.status.overflow
+
+    @pytest.mark.parametrize('instruction', [add.nmos_add_with_carry, add.cmos_add_with_carry])
+    def test_binary(self, instruction):
+        """Without the decimal flag, it's the binary add."""
+        test_cpu = self.make_cpu(0x09)
+        test_cpu.status.decimal = False
+
+        instruction(test_cpu, cpu.AddressingMode.immediate, 0x01)
+
+        assert test_cpu.accumulator == 0x0A
+        assert test_cpu.cycles == 0
+
+    @pytest.mark.parametrize('mode', [cpu.AddressingMode.absolute, cpu.AddressingMode.zero_page])
+    def test_memory_operand(self, mode):
+        test_cpu = self.make_cpu(0x15)
+        test_cpu.memory = bytearray(b'\x00\x00\x05\x00')
+
+        add.nmos_add_with_carry(test_cpu, mode, 2)
+
+        assert test_cpu.accumulator == 0x20
+
+    def test_unsupported_mode(self):
+        with pytest.raises(NotImplementedError):
+            add.nmos_add_with_carry(self.make_cpu(0), cpu.AddressingMode.accumulator, 0)
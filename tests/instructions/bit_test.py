@@ -83,3 +83,19 @@ class TestBit:
         assert test_cpu.status.interrupt_disable == flag_state
         assert test_cpu.status.decimal == flag_state
         assert test_cpu.status.break_ == flag_state
+
+
+@named_parametrize(
+    ('accumulator_state', 'immediate', 'expected'),
+    [('No match', 0x0F, 0xF0, True), ('Match', 0xFF, 0x01, False)],
+)
+def test_bit_immediate(accumulator_state, immediate, expected):
+    """Only zero is set, negative and overflow are left alone."""
+    test_cpu = cpu.Cpu()
+    test_cpu.accumulator = accumulator_state
+
+    bit.bit_immediate(test_cpu, immediate)
+
+    assert test_cpu.status.zero == expected
+    assert not test_cpu.status.negative
+    assert not test_cpu.status.overflow
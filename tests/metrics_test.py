@@ -0,0 +1,112 @@
+# pylint: disable=no-self-use
+import asyncio
+from typing import Tuple
+from unittest import mock
+
+import pytest
+
+from pynes import metrics
+
+
+@pytest.fixture
+def test_metrics():
+    yield metrics.Metrics()
+
+
+class TestMetrics:
+    def test_record_frame(self, test_metrics):
+        test_metrics.pending_io = 0.25
+        test_metrics.record_frame(cpu=1.0, ppu=0.5, apu=0.125)
+        test_metrics.record_frame(cpu=1.0, ppu=0.5, apu=0.125)
+
+        assert test_metrics.totals == {'cpu': 1.75, 'ppu': 1.0, 'apu': 0.25, 'io': 0.25}
+        assert test_metrics.last_frame == {'cpu': 1.0, 'ppu': 0.5, 'apu': 0.125, 'io': 0.0}
+        assert test_metrics.frames == 2
+        assert test_metrics.host_time == 3.25
+
+    def test_start_frame(self, test_metrics):
+        test_metrics.pending_io = 0.25
+        test_metrics.start_frame()
+        test_metrics.record_frame(cpu=1.0, ppu=0.5, apu=0.125)
+
+        assert test_metrics.last_frame['io'] == 0.0
+
+    def test_speed(self, test_metrics):
+        assert test_metrics.speed == 0.0
+
+        test_metrics.record_frame(cpu=1 / metrics.FRAME_RATE / 2, ppu=0.0, apu=0.0)
+        assert test_metrics.speed == pytest.approx(2.0)
+
+    def test_reset(self, test_metrics):
+        test_metrics.pending_io = 1.0
+        test_metrics.record_frame(cpu=1.0, ppu=1.0, apu=1.0)
+        test_metrics.reset()
+
+        assert test_metrics.snapshot() == {
+            'cpu_seconds': 0.0,
+            'ppu_seconds': 0.0,
+            'apu_seconds': 0.0,
+            'io_seconds': 0.0,
+            'frames': 0,
+            'host_seconds': 0.0,
+            'emulated_seconds': 0.0,
+            'speed': 0.0,
+        }
+
+    def test_timed_handlers(self, test_metrics):
+        memory = bytearray(2)
+        with mock.patch.object(metrics.time, 'perf_counter', side_effect=[1.0, 1.5, 2.0, 2.25]):
+            reader = test_metrics.timed_reader(memory.__getitem__)
+            writer = test_metrics.timed_writer(memory.__setitem__)
+            writer(1, 5)
+            assert reader(1) == 5
+
+        assert test_metrics.pending_io == 0.75
+
+
+def test_exposition():
+    first = metrics.Metrics()
+    first.record_frame(cpu=0.5, ppu=0.25, apu=0.125)
+
+    text = metrics.exposition({'2': metrics.Metrics(), '1': first})
+
+    assert text.endswith('\n')
+    lines = text.splitlines()
+    assert '# TYPE pynes_subsystem_seconds_total counter' in lines
+    assert 'pynes_subsystem_seconds_total{session="1",subsystem="cpu"} 0.5' in lines
+    assert 'pynes_subsystem_seconds_total{session="2",subsystem="io"} 0.0' in lines
+    assert 'pynes_frames_total{session="1"} 1' in lines
+    # Sorted by label
+    assert lines.index('pynes_frames_total{session="1"} 1') < lines.index('pynes_frames_total{session="2"} 0')
+    assert any(line.startswith('pynes_speed_ratio{session="1"}') for line in lines)
+
+
+class TestEndpoint:
+    @staticmethod
+    def fetch(request: bytes) -> Tuple[bytes, bytes]:
+        async def scenario() -> bytes:
+            server = await metrics.start_endpoint(lambda: 'pynes_frames_total 1\n', port=0)
+            port = server.sockets[0].getsockname()[1]
+            async with server:
+                reader, writer = await asyncio.open_connection(metrics.DEFAULT_HOST, port)
+                writer.write(request)
+                response = await reader.read()
+                writer.close()
+                return response
+
+        header, _, body = asyncio.run(scenario()).partition(b'\r\n\r\n')
+        return header, body
+
+    def test_metrics(self):
+        header, body = self.fetch(b'GET /metrics HTTP/1.1\r\nHost: localhost\r\n\r\n')
+
+        assert header.startswith(b'HTTP/1.0 200 OK')
+        assert b'version=0.0.4' in header
+        assert body == b'pynes_frames_total 1\n'
+
+    @pytest.mark.parametrize('request_line', [b'GET / HTTP/1.1', b'POST /metrics HTTP/1.1', b''])
+    def test_not_found(self, request_line):
+        header, body = self.fetch(request_line + b'\r\n\r\n')
+
+        assert header.startswith(b'HTTP/1.0 404 Not Found')
+        assert body == b''
@@ -0,0 +1,156 @@
+# pylint: disable=no-self-use
+from unittest import mock
+
+import pytest
+
+from pynes import movie
+from pynes.nes import Nes
+from pynes.rom import Rom
+from testing.util import make_rom
+
+
+@pytest.fixture
+def test_nes():
+    yield Nes(Rom.from_bytes(make_rom()))
+
+
+@pytest.fixture
+def test_movie(test_nes):
+    test_movie = movie.Movie(test_nes.rom.sha1)
+    for frame in range(10):
+        test_movie.record(frame, 0xFF - frame)
+
+    yield test_movie
+
+
+class TestMovie:
+    def test_record(self, test_movie):
+        assert len(test_movie) == 10
+        assert test_movie[3] == (3, 0xFC)
+
+    @pytest.mark.parametrize('frame', [-1, 10])
+    def test_out_of_range(self, test_movie, frame):
+        with pytest.raises(IndexError):
+            test_movie[frame]  # pylint: disable=pointless-statement
+
+    def test_round_trip(self, test_movie, tmp_path):
+        path = str(tmp_path / 'test.pnmv')
+        test_movie.save(path)
+        loaded = movie.Movie.load(path)
+
+        assert loaded.rom_sha1 == test_movie.rom_sha1
+        assert loaded.inputs == test_movie.inputs
+
+    def test_header_size(self, test_movie):
+        assert len(test_movie.to_bytes()) == 29 + 10 * movie.BYTES_PER_FRAME
+
+    @pytest.mark.parametrize(
+        'mangle',
+        [
+            lambda data: data[:10],
+            lambda data: b'XXXX' + data[4:],
+            lambda data: data[:4] + b'\x02' + data[5:],
+            lambda data: data[:-1],
+        ],
+        ids=['Truncated header', 'Bad magic', 'Unsupported version', 'Truncated input'],
+    )
+    def test_invalid(self, test_movie, mangle):
+        with pytest.raises(movie.MovieFormatError):
+            movie.Movie.from_bytes(mangle(test_movie.to_bytes()))
+
+
+class TestReplayer:
+    def test_wrong_rom(self, test_nes):
+        with pytest.raises(ValueError):
+            movie.Replayer(test_nes, movie.Movie('00' * 20))
+
+    def test_not_from_power_on(self, test_nes, test_movie):
+        test_nes.run_frame()
+
+        with pytest.raises(ValueError):
+            movie.Replayer(test_nes, test_movie)
+
+    def test_invalid_interval(self, test_nes, test_movie):
+        with pytest.raises(ValueError):
+            movie.Replayer(test_nes, test_movie, checkpoint_interval=0)
+
+    def test_step_applies_input(self, test_nes, test_movie):
+        replayer = movie.Replayer(test_nes, test_movie)
+        replayer.step()
+        replayer.step()
+
+        assert replayer.frame == 2
+        assert test_nes.controllers[0].buttons == 1
+        assert test_nes.controllers[1].buttons == 0xFE
+
+    def test_checkpoints(self, test_nes, test_movie):
+        replayer = movie.Replayer(test_nes, test_movie, checkpoint_interval=4)
+        list(replayer.play())
+        # Playing over an existing checkpoint again keeps the first one
+        replayer.seek(2)
+        list(replayer.play(until=5))
+
+        assert replayer._checkpoint_frames == [0, 4, 8]
+
+    def test_play(self, test_nes, test_movie):
+        hashes = list(movie.Replayer(test_nes, test_movie).play(until=3))
+
+        assert [frame_hashes.frame for frame_hashes in hashes] == [1, 2, 3]
+        assert hashes[0].ram == hashes[2].ram
+
+    @pytest.mark.parametrize('target', [0, 3, 4, 7, 10])
+    def test_seek_matches_playing_through(self, test_nes, test_movie, target):
+        expected = Nes(test_nes.rom)
+        list(movie.Replayer(expected, test_movie).play(until=target))
+
+        replayer = movie.Replayer(test_nes, test_movie, checkpoint_interval=4)
+        # Play to the end first so seeking has to go backwards through checkpoints
+        list(replayer.play())
+        replayer.seek(target)
+
+        assert replayer.frame == target
+        assert test_nes.save_state() == expected.save_state()
+        assert test_nes.frame.pixels == expected.frame.pixels
+
+    @pytest.mark.parametrize('target', [0, 4])
+    def test_seek_back_redraws(self, test_nes, test_movie, target):
+        """Seeking back to a checkpoint still draws the frame, instead of leaving the later one on screen."""
+        replayer = movie.Replayer(test_nes, test_movie, checkpoint_interval=4)
+        replayer.seek(8)
+        # Whatever frame 8 showed
+        test_nes.frame.pixels[0] = 0x30
+
+        replayer.seek(target)
+
+        assert replayer.frame == target
+        assert test_nes.frame.pixels == Nes(test_nes.rom).frame.pixels
+
+    def test_seek_forward_plays_on(self, test_nes, test_movie):
+        replayer = movie.Replayer(test_nes, test_movie, checkpoint_interval=4)
+        replayer.seek(5)
+
+        with mock.patch.object(test_nes, 'load_state') as load_state:
+            replayer.seek(7)
+
+        assert not load_state.called, 'Playing on from frame 5 is closer than the checkpoint at 4'
+        assert replayer.frame == 7
+
+    def test_seek_only_renders_last_frame(self, test_nes, test_movie):
+        replayer = movie.Replayer(test_nes, test_movie)
+        rendered = []
+        run_frame = test_nes.run_frame
+
+        def record_render():
+            rendered.append(test_nes.render)
+            run_frame()
+
+        with mock.patch.object(test_nes, 'run_frame', side_effect=record_render):
+            replayer.seek(4)
+
+        assert rendered == [False, False, False, True]
+        assert test_nes.render
+
+    @pytest.mark.parametrize('frame', [-1, 11])
+    def test_seek_out_of_range(self, test_nes, test_movie, frame):
+        with pytest.raises(IndexError):
+            movie.Replayer(test_nes, test_movie).seek(frame)
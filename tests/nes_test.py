@@ -0,0 +1,211 @@
+# pylint: disable=no-self-use
+from unittest import mock
+
+import pytest
+
+from pynes import apu
+from pynes import nes
+from pynes import video
+from pynes.controller import Button
+from pynes.renderer import MASK_BACKGROUND
+from pynes.renderer import MASK_LEFT
+from pynes.rom import Rom
+from testing.util import make_rom
+from testing.util import named_parametrize
+
+
+@pytest.fixture
+def test_nes():
+    yield nes.Nes(Rom.from_bytes(make_rom()))
+
+
+def test_reset(test_nes):
+    assert test_nes.cpu.program_counter == 0x8000
+
+
+def test_run_frame(test_nes):
+    test_nes.run_frame()
+    test_nes.run_frame()
+
+    assert test_nes.frame_count == 2
+    assert test_nes.cpu.cycles >= 2 * nes.CPU_CYCLES_PER_FRAME
+    # Overshoot is carried over, frames don't drift
+    assert test_nes.cpu.cycles < 2 * nes.CPU_CYCLES_PER_FRAME + 7
+
+
+def test_audio(test_nes):
+    test_nes.run_frame()
+    assert len(test_nes.audio) == 733
+
+    # Not synthesized while fast-forwarding
+    test_nes.render = False
+    test_nes.run_frame()
+    assert len(test_nes.audio) == 0
+
+
+def test_ram(test_nes):
+    test_nes.cpu.memory[0x10] = 5
+
+    assert len(test_nes.ram) == nes.RAM_SIZE
+    assert test_nes.ram[0x10] == 5
+
+
+class TestRamMirrors:
+    def test_read(self, test_nes):
+        test_nes.cpu.memory[0x10] = 5
+
+        assert test_nes.cpu.read_from_memory(0x0810) == 5
+        assert test_nes.cpu.read_from_memory(0x1810) == 5
+
+    def test_write(self, test_nes):
+        test_nes.cpu.write_to_memory(0x1810, 5)
+
+        assert test_nes.cpu.memory[0x10] == 5
+
+
+class TestIo:
+    def test_controllers(self, test_nes):
+        test_nes.controllers[0].buttons = Button.a
+        test_nes.controllers[1].buttons = Button.b
+        test_nes.cpu.write_to_memory(nes.CONTROLLER_1, 1)
+        test_nes.cpu.write_to_memory(nes.CONTROLLER_1, 0)
+
+        assert test_nes.cpu.read_from_memory(nes.CONTROLLER_1) == 1
+        assert test_nes.cpu.read_from_memory(nes.CONTROLLER_2) == 0
+        assert test_nes.cpu.read_from_memory(nes.CONTROLLER_2) == 1
+
+    def test_other_registers(self, test_nes):
+        test_nes.cpu.write_to_memory(0x4018, 5)
+
+        assert test_nes.cpu.read_from_memory(0x4018) == 5
+
+    def test_apu(self, test_nes):
+        test_nes.cpu.write_to_memory(0x4015, 0x01)
+        test_nes.cpu.write_to_memory(0x4003, 0x08)
+
+        assert test_nes.cpu.read_from_memory(0x4015) == 0x01
+        assert test_nes.apu.pulse_1.length_counter == 254
+
+    def test_apu_registers(self, test_nes):
+        with mock.patch.object(test_nes.apu, 'write') as write:
+            for address in range(nes.IO_REGISTERS_START, 0x4019):
+                test_nes.cpu.write_to_memory(address, 0)
+
+        written = [call.args[0] for call in write.call_args_list]
+        assert written == list(range(apu.APU_REGISTERS_START, apu.APU_REGISTERS_END + 1)) + [
+            apu.STATUS,
+            apu.FRAME_COUNTER,
+        ]
+        assert nes.APU_STATUS == apu.STATUS
+
+
+class TestPpu:
+    def test_registers(self, test_nes):
+        test_nes.cpu.write_to_memory(0x2006, 0x20)
+        test_nes.cpu.write_to_memory(0x2006, 0x00)
+        test_nes.cpu.write_to_memory(0x3FFF, 5)
+        test_nes.run_frame()
+
+        # Queued writes are flushed by the end of the frame
+        assert test_nes.ppu.name_tables[0] == 5
+
+    @named_parametrize(
+        ('page', 'start'),
+        [
+            ('ram', 0x02, 0x0200),
+            ('ram mirror', 0x0A, 0x0200),
+            ('rom', 0x80, 0x8000),
+        ],
+    )
+    def test_dma(self, test_nes, page, start):
+        end = start + 0x100
+        test_nes.cpu.memory[start:end] = bytes(range(256))
+        test_nes.cpu.write_to_memory(nes.OAM_DMA, page)
+
+        assert test_nes.ppu.oam == bytes(range(256))
+
+    def test_dma_from_registers(self, test_nes):
+        test_nes.controllers[0].buttons = Button.a
+        test_nes.cpu.write_to_memory(nes.CONTROLLER_1, 1)
+        test_nes.cpu.write_to_memory(nes.OAM_DMA, 0x40)
+
+        # Read through the bus, with side effects
+        assert test_nes.ppu.oam[nes.CONTROLLER_1 & 0xFF] == 1
+
+    @pytest.mark.parametrize('cycles', [0, 1], ids=['even', 'odd'])
+    def test_dma_stall(self, test_nes, cycles):
+        test_nes.cpu.cycles = cycles
+        test_nes.cpu.write_to_memory(nes.OAM_DMA, 0x02)
+
+        assert test_nes.cpu.cycles == 2 * cycles + 513
+
+
+def test_vblank_wait_skipped():
+    # BIT $2002; BPL back to the BIT
+    test_nes = nes.Nes(Rom.from_bytes(make_rom(bytes([0x2C, 0x02, 0x20, 0x10, 0xFB]))))
+    test_nes.run_frame()
+
+    assert test_nes.cpu.idle_loop_detector is not None
+    assert test_nes.cpu.idle_loop_detector.skipped_cycles > nes.CPU_CYCLES_PER_FRAME * 0.9
+
+
+def test_recompiled():
+    test_nes = nes.Nes(Rom.from_bytes(make_rom()), recompiled=True)
+    test_nes.run_frame()
+
+    assert test_nes.cpu.blocks
+    assert test_nes.frame_count == 1
+
+
+def test_state(test_nes):
+    test_nes.controllers[1].buttons = Button.start
+    test_nes.ppu.name_tables[0] = 3
+    test_nes.run_frame()
+    state = test_nes.save_state()
+
+    restored = nes.Nes(test_nes.rom)
+    restored.load_state(state)
+
+    assert restored.frame_count == 1
+    assert restored.controllers[1].buttons == Button.start
+    assert restored.ppu.name_tables[0] == 3
+    assert restored.save_state() == state
+
+
+def test_metrics():
+    # BIT $4016; BPL back to the BIT, polling the controller through the I/O handlers
+    test_nes = nes.Nes(Rom.from_bytes(make_rom(bytes([0x2C, 0x16, 0x40, 0x10, 0xFB]))))
+    test_nes.run_frame()
+    test_nes.run_frame()
+
+    assert test_nes.metrics.frames == 2
+    assert test_nes.metrics.last_frame['io'] > 0
+    assert all(seconds > 0 for seconds in test_nes.metrics.totals.values())
+
+
+def test_metrics_outside_frames(test_nes):
+    """I/O from running the cpu outside of run_frame isn't billed to the next frame."""
+    # As if the debugger had spent a while in I/O handlers
+    test_nes.metrics.pending_io = 100.0
+    test_nes.run_frame()
+
+    assert test_nes.metrics.last_frame['io'] < 100.0
+    assert test_nes.metrics.totals['cpu'] > 0
+
+
+def test_dirty_regions(test_nes):
+    # A solid tile at the start of the second row of the name table
+    test_nes.ppu.chr[16:24] = b'\xff' * 8
+    test_nes.ppu.name_tables[32] = 1
+    test_nes.ppu.palette[1] = 0x16
+    test_nes.ppu.mask = MASK_BACKGROUND | MASK_LEFT
+    test_nes.run_frame()
+    assert test_nes.frame.dirty_regions() == [(8, 16)]
+    assert test_nes.frame.pixels[8 * video.WIDTH] == 0x16
+
+    # Not drawn or tracked while fast-forwarding
+    test_nes.ppu.name_tables[32] = 0
+    test_nes.render = False
+    test_nes.run_frame()
+    assert test_nes.frame.dirty_regions() == [(8, 16)]
+    assert test_nes.frame.pixels[8 * video.WIDTH] == 0x16
@@ -0,0 +1,84 @@
+# pylint: disable=no-self-use
+from unittest import mock
+
+import pytest
+
+from pynes import cpu
+from pynes import opcodes
+from pynes.addressing_mode import AddressingMode
+
+
+@pytest.mark.parametrize(('value', 'expected'), [(0x00, 0), (0x7F, 127), (0x80, -128), (0xFD, -3), (0xFF, -1)])
+def test_signed_offset(value, expected):
+    assert opcodes.signed_offset(value) == expected
+
+
+@pytest.mark.parametrize('opcode', sorted(opcodes.OPCODES))
+def test_size_matches_addressing_mode(opcode):
+    """Operand size is determined entirely by addressing mode."""
+    sizes = {
+        AddressingMode.implied: 1,
+        AddressingMode.accumulator: 1,
+        AddressingMode.immediate: 2,
+        AddressingMode.zero_page: 2,
+        AddressingMode.relative: 2,
+        AddressingMode.absolute: 3,
+    }
+    instruction = opcodes.OPCODES[opcode]
+
+    assert instruction.size == sizes[instruction.addressing_mode]
+
+
+class TestExecute:
+    def test_addressed(self):
+        test_cpu = cpu.Cpu()
+        with mock.patch.object(opcodes.add, 'add_with_carry') as add_with_carry:
+            opcodes._addressed(add_with_carry, AddressingMode.zero_page)(test_cpu, 0x10)
+
+        add_with_carry.assert_called_once_with(test_cpu, AddressingMode.zero_page, 0x10)
+
+    def test_accumulator(self):
+        test_cpu = cpu.Cpu()
+        instruction = mock.Mock()
+        opcodes._accumulator(instruction)(test_cpu, 0)
+
+        instruction.assert_called_once_with(test_cpu, AddressingMode.accumulator)
+
+    def test_relative(self):
+        test_cpu = cpu.Cpu()
+        instruction = mock.Mock()
+        opcodes._relative(instruction)(test_cpu, 0xFE)
+
+        instruction.assert_called_once_with(test_cpu, -2)
+
+    def test_implied(self):
+        test_cpu = cpu.Cpu()
+        instruction = mock.Mock()
+        opcodes._implied(instruction)(test_cpu, 0)
+
+        instruction.assert_called_once_with(test_cpu)
+
+
+class TestOpcodeTable:
+    def test_ricoh_2a03(self):
+        """The NES's table is OPCODES itself, with the plain binary ADC."""
+        assert opcodes.opcode_table(cpu.Variant.ricoh_2a03) is opcodes.OPCODES
+
+    @pytest.mark.parametrize(
+        ('variant', 'instruction'),
+        [(cpu.Variant.nmos_6502, 'nmos_add_with_carry'), (cpu.Variant.wdc_65c02, 'cmos_add_with_carry')],
+    )
+    def test_decimal_add(self, variant, instruction):
+        test_cpu = cpu.Cpu()
+
+        with mock.patch.object(opcodes.add, instruction) as add_with_carry:
+            table = opcodes.opcode_table(variant)
+            table[0x65].execute(test_cpu, 0x10)
+
+        add_with_carry.assert_called_once_with(test_cpu, AddressingMode.zero_page, 0x10)
+        assert table[0x65].cycles == opcodes.OPCODES[0x65].cycles
+        assert table[0x29] is opcodes.OPCODES[0x29]
+
+    @pytest.mark.parametrize(('variant', 'expected'), [(cpu.Variant.nmos_6502, False), (cpu.Variant.wdc_65c02, True)])
+    def test_cmos_opcodes(self, variant, expected):
+        assert (0x89 in opcodes.opcode_table(variant)) == expected
@@ -0,0 +1,221 @@
+# pylint: disable=no-self-use
+from typing import List
+from typing import Tuple
+
+import pytest
+
+from pynes import ppu
+from pynes.rom import Rom
+from testing.util import make_rom
+from testing.util import named_parametrize
+
+
+@pytest.fixture
+def test_ppu():
+    yield ppu.Ppu(Rom.from_bytes(make_rom()))
+
+
+def write_all(test_ppu: ppu.Ppu, writes: List[Tuple[int, int]]) -> None:
+    for register, value in writes:
+        test_ppu.write_register(ppu.REGISTERS_START + register, value)
+
+
+def set_address(test_ppu: ppu.Ppu, address: int) -> None:
+    write_all(test_ppu, [(ppu.PPUADDR, address >> 8), (ppu.PPUADDR, address & 0xFF)])
+
+
+@named_parametrize(
+    ('address', 'index'),
+    [
+        ('background', 0x3F01, 0x01),
+        ('sprite', 0x3F11, 0x11),
+        ('sprite backdrop', 0x3F14, 0x04),
+        ('mirrored', 0x3FF0, 0x00),
+    ],
+)
+def test_palette_index(address, index):
+    assert ppu.palette_index(address) == index
+
+
+def test_read_is_idempotent():
+    assert ppu.read_is_idempotent(0x2002)
+    assert ppu.read_is_idempotent(0x3FFA)
+    assert not ppu.read_is_idempotent(0x2007)
+
+
+class TestRegisters:
+    def test_status(self, test_ppu):
+        test_ppu.status = ppu.STATUS_VBLANK
+        test_ppu.write_register(ppu.REGISTERS_START + ppu.PPUADDR, 0x21)
+
+        assert test_ppu.read_register(ppu.REGISTERS_START + ppu.PPUSTATUS) == ppu.STATUS_VBLANK
+        assert test_ppu.status == 0
+        # Resets the write toggle, the next PPUADDR write is the high byte again
+        set_address(test_ppu, 0x2345)
+        assert test_ppu.vram_address == 0x2345
+
+    def test_mirrored(self, test_ppu):
+        test_ppu.write_register(0x3FF9, 0x42)
+
+        assert test_ppu.mask == 0x42
+
+    def test_write_only(self, test_ppu):
+        test_ppu.write_register(ppu.REGISTERS_START + ppu.PPUCTRL, 0xFF)
+
+        assert test_ppu.read_register(ppu.REGISTERS_START + ppu.PPUCTRL) == 0
+
+    def test_read_only(self, test_ppu):
+        test_ppu.write_register(ppu.REGISTERS_START + ppu.PPUSTATUS, 0xFF)
+
+        assert test_ppu.status == 0
+
+    def test_ctrl(self, test_ppu):
+        write_all(test_ppu, [(ppu.PPUCTRL, 0x06)])
+
+        assert test_ppu.increment == 32
+        assert test_ppu.temp_address == 0x0800
+
+    def test_oam(self, test_ppu):
+        write_all(test_ppu, [(ppu.OAMADDR, 0xFF), (ppu.OAMDATA, 1), (ppu.OAMDATA, 2)])
+
+        assert test_ppu.oam[0xFF] == 1
+        assert test_ppu.oam[0] == 2
+        assert test_ppu.read_register(ppu.REGISTERS_START + ppu.OAMDATA) == test_ppu.oam[1]
+
+    def test_scroll(self, test_ppu):
+        write_all(test_ppu, [(ppu.PPUSCROLL, 0x7D), (ppu.PPUSCROLL, 0x5E)])
+
+        assert test_ppu.fine_x == 0x05
+        assert test_ppu.temp_address == 0x616F
+
+
+class TestData:
+    def test_read_buffered(self, test_ppu):
+        test_ppu.name_tables[0x10:0x12] = b'\x01\x02'
+        set_address(test_ppu, 0x2010)
+        read = test_ppu.read_register
+
+        assert [read(ppu.REGISTERS_START + ppu.PPUDATA) for _ in range(3)] == [0, 1, 2]
+
+    def test_read_palette(self, test_ppu):
+        test_ppu.palette[0x01] = 0x2A
+        test_ppu.name_tables[0x701] = 0x11
+        set_address(test_ppu, 0x3F01)
+
+        assert test_ppu.read_register(ppu.REGISTERS_START + ppu.PPUDATA) == 0x2A
+        # The buffer gets the name table byte underneath the palette, $2F01 is in the second physical table
+        assert test_ppu._read_buffer == 0x11
+
+    def test_write_batched(self, test_ppu):
+        set_address(test_ppu, 0x2000)
+        write_all(test_ppu, [(ppu.PPUDATA, value) for value in range(4)])
+
+        assert test_ppu.name_tables[:4] == bytes(4)
+        assert test_ppu.vram_address == 0x2004
+        test_ppu.flush()
+        assert test_ppu.name_tables[:4] == bytes(range(4))
+
+    def test_flushed_by_registers(self, test_ppu):
+        set_address(test_ppu, 0x2000)
+        write_all(test_ppu, [(ppu.PPUDATA, 1)])
+        set_address(test_ppu, 0x2000)
+        write_all(test_ppu, [(ppu.PPUDATA, 2), (ppu.PPUDATA, 3)])
+
+        assert test_ppu.read_vram(0x2000) == 2
+        assert test_ppu.read_vram(0x2001) == 3
+
+    def test_increment_32(self, test_ppu):
+        write_all(test_ppu, [(ppu.PPUCTRL, ppu.CTRL_INCREMENT_32)])
+        set_address(test_ppu, 0x2001)
+        write_all(test_ppu, [(ppu.PPUDATA, value) for value in range(1, 33)])
+        test_ppu.flush()
+
+        assert [test_ppu.read_vram(0x2001 + 32 * row) for row in range(32)] == list(range(1, 33))
+        assert test_ppu.name_tables[0x400:0x800] == bytes(0x400)
+
+    def test_across_tables(self, test_ppu):
+        """A run spanning memory regions is split at the boundaries."""
+        set_address(test_ppu, 0x3EFF)
+        write_all(test_ppu, [(ppu.PPUDATA, value) for value in (1, 2, 3)])
+
+        assert test_ppu.read_vram(0x2EFF) == 1
+        assert test_ppu.palette[:2] == b'\x02\x03'
+
+    def test_wraps(self, test_ppu):
+        set_address(test_ppu, 0x3FFF)
+        write_all(test_ppu, [(ppu.PPUDATA, 1), (ppu.PPUDATA, 2)])
+
+        assert test_ppu.read_vram(0x3F1F) == 1
+        assert test_ppu.read_vram(0x0000) == 2
+
+    def test_chr_ram(self, test_ppu):
+        set_address(test_ppu, 0x0010)
+        write_all(test_ppu, [(ppu.PPUDATA, 5)])
+
+        assert test_ppu.read_vram(0x0010) == 5
+
+    def test_chr_rom(self):
+        test_ppu = ppu.Ppu(Rom.from_bytes(make_rom(chr_rom=b'\x07')))
+        set_address(test_ppu, 0x0000)
+        write_all(test_ppu, [(ppu.PPUDATA, 5), (ppu.PPUDATA, 6)])
+
+        assert test_ppu.read_vram(0x0000) == 7
+        assert test_ppu.read_vram(0x0001) == 0
+
+
+@named_parametrize(
+    ('vertical', 'tables'),
+    [
+        # Value of the last write landing in each physical name table
+        ('horizontal', False, [2, 4]),
+        ('vertical', True, [3, 4]),
+    ],
+)
+def test_mirroring(vertical, tables):
+    test_ppu = ppu.Ppu(Rom.from_bytes(make_rom()))
+    test_ppu.vertical_mirroring = vertical
+    for table in range(4):
+        set_address(test_ppu, ppu.NAME_TABLES_START + table * ppu.NAME_TABLE_SIZE)
+        write_all(test_ppu, [(ppu.PPUDATA, table + 1)])
+    test_ppu.flush()
+
+    assert [test_ppu.name_tables[0], test_ppu.name_tables[ppu.NAME_TABLE_SIZE]] == tables
+    assert test_ppu.read_vram(0x3000) == test_ppu.read_vram(0x2000)
+
+
+@pytest.mark.parametrize('oam_address', [0, 0x10], ids=['aligned', 'wraps'])
+def test_dma(test_ppu, oam_address):
+    test_ppu.oam_address = oam_address
+    test_ppu.dma(bytes(range(256)))
+
+    assert test_ppu.oam[oam_address] == 0
+    assert test_ppu.oam[oam_address - 1] == 255
+
+
+class TestState:
+    def test_round_trip(self, test_ppu):
+        write_all(test_ppu, [(ppu.PPUCTRL, 0x80), (ppu.OAMDATA, 9)])
+        set_address(test_ppu, 0x3F00)
+        write_all(test_ppu, [(ppu.PPUDATA, 0x0F), (ppu.PPUDATA, 0x30), (ppu.PPUSCROLL, 0x0F)])
+        state = test_ppu.save_state()
+
+        restored = ppu.Ppu(Rom.from_bytes(make_rom()))
+        restored.load_state(state)
+
+        assert restored.palette[:2] == b'\x0f\x30'
+        assert restored.save_state() == state
+
+    def test_chr_rom_not_saved(self, test_ppu):
+        chr_rom_ppu = ppu.Ppu(Rom.from_bytes(make_rom(chr_rom=b'\x07')))
+        chr_rom_ppu.load_state(chr_rom_ppu.save_state())
+
+        assert test_ppu.state_size == chr_rom_ppu.state_size + len(test_ppu.chr)
+        assert chr_rom_ppu.chr[0] == 7
+
+    def test_pending_discarded(self, test_ppu):
+        state = test_ppu.save_state()
+        set_address(test_ppu, 0x2000)
+        write_all(test_ppu, [(ppu.PPUDATA, 1)])
+        test_ppu.load_state(state)
+
+        assert test_ppu.read_vram(0x2000) == 0
@@ -0,0 +1,133 @@
+# pylint: disable=no-self-use
+import os
+from unittest import mock
+
+import pytest
+
+from pynes import opcodes
+from pynes import recompiler
+from pynes.addressing_mode import AddressingMode
+from pynes.cpu import Cpu
+from pynes.cpu import Variant
+from pynes.idle import IdleLoopDetector
+from pynes.opcodes import Opcode
+from pynes.rom import Rom
+from testing.util import IDLE_PROGRAM
+from testing.util import make_rom
+
+# $8000: CLC; ADC #$01; AND #$7F; ADC $10; BIT $11; ASL A; BNE $8001; BCS $8001; BEQ $8010; CLV; CLD; CLI; BCC $8001
+PROGRAM = bytes(
+    [0x18, 0x69, 0x01, 0x29, 0x7F, 0x65, 0x10, 0x24, 0x11, 0x0A, 0xD0, 0xF5, 0xB0, 0xF3, 0xF0, 0x00]
+    + [0xB8, 0xD8, 0x58, 0x90, 0xEC]
+)
+ROM = Rom.from_bytes(make_rom(PROGRAM))
+
+# The cpu has no jumps yet
+JUMP_OPCODES = {
+    0x4C: Opcode('JMP', AddressingMode.absolute, 3, 3, lambda cpu, operand: setattr(cpu, 'program_counter', operand)),
+}
+
+
+def make_cpu(rom: Rom, recompiled: bool = False, variant: Variant = Variant.ricoh_2a03) -> Cpu:
+    cpu = Cpu(variant)
+    cpu.memory = bytearray(0x10000)
+    rom.load_into(cpu.memory)
+    cpu.memory[0x10:0x12] = b'\x05\xc0'
+    cpu.program_counter = 0x8000
+    if recompiled:
+        cpu.blocks = recompiler.load(rom, cpu.opcodes)
+    return cpu
+
+
+def test_translate():
+    memory = bytearray(0x10000)
+    ROM.load_into(memory)
+
+    source = recompiler.translate(memory, recompiler.load_analysis(ROM), name='test')
+
+    assert source.startswith('# Generated by pynes.recompiler from test')
+    assert 'def block_8001(cpu, until):' in source
+    # Flags and branches are inlined
+    assert '_execute_18' not in source
+    assert '_execute_69 = opcodes[0x69].execute' in source
+
+
+@pytest.mark.parametrize('until', [1, 2, 5, 9, 100, 1001, 29781])
+def test_same_as_interpreter(until):
+    interpreted = make_cpu(ROM)
+    recompiled = make_cpu(ROM, recompiled=True)
+    interpreted.run(until)
+    recompiled.run(until)
+
+    assert recompiled.save_state() == interpreted.save_state()
+
+
+@pytest.mark.parametrize('variant', list(Variant))
+def test_variants(variant):
+    """Recompiled code runs the cpu's own instructions, e.g. decimal mode ADC on the NMOS 6502."""
+    interpreted = make_cpu(ROM, variant=variant)
+    recompiled = make_cpu(ROM, recompiled=True, variant=variant)
+    for cpu in (interpreted, recompiled):
+        cpu.status.decimal = True
+        cpu.run(100)
+
+    assert recompiled.save_state() == interpreted.save_state()
+
+
+def test_idle_loop():
+    rom = Rom.from_bytes(make_rom(IDLE_PROGRAM))
+    interpreted = make_cpu(rom)
+    recompiled = make_cpu(rom, recompiled=True)
+    detectors = [IdleLoopDetector(), IdleLoopDetector()]
+    for cpu, detector in zip((interpreted, recompiled), detectors):
+        cpu.idle_loop_detector = detector
+        cpu.run(10000)
+
+    assert recompiled.cycles == interpreted.cycles
+    assert detectors[1].skipped_cycles == detectors[0].skipped_cycles > 0
+
+
+def test_interpreter_fallback():
+    """Code the analysis didn't find, e.g. in ram, is interpreted."""
+    cpu = make_cpu(ROM, recompiled=True)
+    cpu.memory[0x0200:0x0202] = bytes([0x18, 0x18])
+    cpu.program_counter = 0x0200
+    cpu.run(4)
+
+    assert cpu.program_counter == 0x0202
+
+
+def test_unknown_control_flow():
+    """Exits the recompiler doesn't translate itself are left to the instruction."""
+    with mock.patch.dict(opcodes.OPCODES, JUMP_OPCODES):
+        rom = Rom.from_bytes(make_rom(bytes([0x18, 0x4C, 0x00, 0x80])))
+        cpu = make_cpu(rom, recompiled=True)
+        cpu.run(5)
+
+    assert cpu.program_counter == 0x8000
+    assert cpu.cycles == 5
+
+
+class TestLoad:
+    def test_cached(self):
+        recompiler.load(ROM, opcodes.OPCODES)
+
+        with mock.patch.object(recompiler, 'translate') as translate:
+            blocks = recompiler.load(ROM, opcodes.OPCODES)
+
+        translate.assert_not_called()
+        assert os.path.exists(recompiler.module_path(ROM))
+        assert 0x8001 in blocks
+
+    def test_unwritable(self):
+        with mock.patch.object(recompiler.cache, 'write'):
+            blocks = recompiler.load(ROM, opcodes.OPCODES)
+
+        assert not os.path.exists(recompiler.module_path(ROM))
+        assert 0x8001 in blocks
+
+    def test_opcodes_changed(self):
+        path = recompiler.module_path(ROM)
+
+        with mock.patch.dict(opcodes.OPCODES, JUMP_OPCODES):
+            assert recompiler.module_path(ROM) != path
@@ -0,0 +1,435 @@
+# pylint: disable=no-self-use
+from typing import List
+
+import numpy as np
+import numpy.typing as npt
+import pytest
+
+from pynes import renderer
+from pynes.ppu import NAME_TABLE_SIZE
+from pynes.ppu import Ppu
+from pynes.rom import Rom
+from pynes.video import FrameBuffer
+from pynes.video import HEIGHT
+from pynes.video import WIDTH
+from testing.util import make_rom
+
+BACKDROP = 0x0F
+# Colors of background palette 0 and sprite palettes 0 and 1, for pixels of color 1
+BACKGROUND_COLOR = 0x16
+SPRITE_COLOR = 0x2A
+OTHER_SPRITE_COLOR = 0x12
+
+SHOW_ALL = renderer.MASK_BACKGROUND | renderer.MASK_SPRITES | renderer.MASK_LEFT
+# Tile 1 is solid, tile 2 only has its top left pixel set
+SOLID_TILE = 1
+CORNER_TILE = 2
+
+
+@pytest.fixture
+def ppu():
+    ppu = Ppu(Rom.from_bytes(make_rom()))
+    set_tile(ppu, SOLID_TILE, [0xFF] * renderer.TILE_SIZE)
+    set_tile(ppu, CORNER_TILE, [0x80] + [0] * (renderer.TILE_SIZE - 1))
+    ppu.palette[0] = BACKDROP
+    ppu.palette[1] = BACKGROUND_COLOR
+    ppu.palette[0x11] = SPRITE_COLOR
+    ppu.palette[0x15] = OTHER_SPRITE_COLOR
+    # Move every sprite off screen
+    ppu.oam[:] = b'\xff' * len(ppu.oam)
+    ppu.mask = SHOW_ALL
+    yield ppu
+
+
+def set_tile(ppu: Ppu, tile: int, rows: List[int]) -> None:
+    """Set the low bit plane of a tile, for a tile of color 1."""
+    start = tile * 2 * renderer.TILE_SIZE
+    end = start + renderer.TILE_SIZE
+    ppu.chr[start:end] = bytes(rows)
+
+
+def set_sprite(ppu: Ppu, number: int, x: int, y: int, tile: int = SOLID_TILE, attributes: int = 0) -> None:
+    start = number * 4
+    end = start + 4
+    # Sprites are drawn one line below their y coordinate
+    ppu.oam[start:end] = bytes([y - 1, tile, attributes, x])
+
+
+def render(ppu: Ppu) -> npt.NDArray[np.uint8]:
+    frame = FrameBuffer()
+    renderer.Renderer(ppu).render(frame)
+    return np.frombuffer(frame.pixels, dtype=np.uint8).reshape(HEIGHT, WIDTH)
+
+
+def test_decode_patterns():
+    # Low plane, then high plane
+    chr_data = bytes([0x80] + [0] * 7 + [0xC0] + [0] * 7)
+
+    patterns = renderer.decode_patterns(chr_data)
+
+    assert patterns.shape == (1, 8, 8)
+    assert patterns[0, 0].tolist() == [3, 2, 0, 0, 0, 0, 0, 0]
+    assert not patterns[0, 1:].any()
+
+
+class TestRender:
+    def test_disabled(self, ppu):
+        ppu.name_tables[0] = SOLID_TILE
+        set_sprite(ppu, 0, 16, 16)
+        ppu.mask = 0
+
+        assert (render(ppu) == BACKDROP).all()
+
+    def test_emphasis(self, ppu):
+        ppu.mask = 0xA0
+        frame = FrameBuffer()
+
+        renderer.Renderer(ppu).render(frame)
+
+        assert frame.emphasis == 0b101
+
+    def test_greyscale(self, ppu):
+        ppu.mask |= renderer.MASK_GREYSCALE
+
+        assert (render(ppu) == BACKDROP & 0x30).all()
+
+    def test_backdrop(self, ppu):
+        """Color 0 of every palette is the backdrop."""
+        ppu.palette[4] = 0x20
+
+        assert (render(ppu) == BACKDROP).all()
+
+    def test_flushes(self, ppu):
+        ppu.write_register(0x2006, 0x3F)
+        ppu.write_register(0x2006, 0x00)
+        ppu.write_register(0x2007, 0x21)
+
+        assert (render(ppu) == 0x21).all()
+
+    def test_chr_ram(self, ppu):
+        """Pattern tables written after the renderer was created are picked up."""
+        ppu.name_tables[0] = 3
+        frame = FrameBuffer()
+        frame_renderer = renderer.Renderer(ppu)
+        frame_renderer.render(frame)
+        assert frame.pixels[0] == BACKDROP
+
+        set_tile(ppu, 3, [0xFF] * renderer.TILE_SIZE)
+        frame_renderer.render(frame)
+        assert frame.pixels[0] == BACKGROUND_COLOR
+
+    def test_chr_rom(self):
+        chr_rom = bytes(16) + b'\xff' * 8
+        ppu = Ppu(Rom.from_bytes(make_rom(chr_rom=chr_rom)))
+        ppu.palette[1] = BACKGROUND_COLOR
+        ppu.name_tables[0] = 1
+        ppu.mask = renderer.MASK_BACKGROUND | renderer.MASK_LEFT
+
+        assert render(ppu)[0, 0] == BACKGROUND_COLOR
+
+
+class TestBackground:
+    def test_tiles(self, ppu):
+        # Second tile of the second row
+        ppu.name_tables[renderer.NAME_TABLE_COLUMNS + 1] = SOLID_TILE
+
+        pixels = render(ppu)
+
+        assert (pixels[8:16, 8:16] == BACKGROUND_COLOR).all()
+        assert (pixels[:8] == BACKDROP).all()
+        assert (pixels[8:16, 16:] == BACKDROP).all()
+
+    def test_pattern_table(self, ppu):
+        ppu.name_tables[0] = SOLID_TILE
+        ppu.ctrl = renderer.CTRL_BACKGROUND_TABLE
+        assert render(ppu)[0, 0] == BACKDROP
+
+        set_tile(ppu, renderer.TILES_PER_TABLE + SOLID_TILE, [0xFF] * renderer.TILE_SIZE)
+        assert render(ppu)[0, 0] == BACKGROUND_COLOR
+
+    def test_attributes(self, ppu):
+        # Tiles in each quadrant of the first attribute byte, which picks palettes 0, 1, 2 and 3 for them
+        for offset in (0, 2, 2 * renderer.NAME_TABLE_COLUMNS, 2 * renderer.NAME_TABLE_COLUMNS + 2):
+            ppu.name_tables[offset] = SOLID_TILE
+        ppu.name_tables[renderer.ATTRIBUTES_START] = 0b11100100
+        ppu.palette[5] = 0x21
+        ppu.palette[9] = 0x22
+        ppu.palette[13] = 0x23
+
+        pixels = render(ppu)
+
+        assert [pixels[0, 0], pixels[0, 16], pixels[16, 0], pixels[16, 16]] == [BACKGROUND_COLOR, 0x21, 0x22, 0x23]
+
+    def test_fine_scroll(self, ppu):
+        ppu.name_tables[0] = SOLID_TILE
+        ppu.fine_x = 3
+        # Fine y of 2
+        ppu.temp_address = 0x2000
+
+        pixels = render(ppu)
+
+        assert (pixels[:6, :5] == BACKGROUND_COLOR).all()
+        assert (pixels[6:, :5] == BACKDROP).all()
+        assert (pixels[:, 5:248] == BACKDROP).all()
+        # The name table on the right mirrors it
+        assert (pixels[:6, 253:] == BACKGROUND_COLOR).all()
+
+    def test_coarse_scroll(self, ppu):
+        ppu.name_tables[2 * renderer.NAME_TABLE_COLUMNS + 3] = SOLID_TILE
+        # Coarse x of 3, coarse y of 2
+        ppu.temp_address = 0x0043
+
+        pixels = render(ppu)
+
+        assert (pixels[:8, :8] == BACKGROUND_COLOR).all()
+        assert (pixels[8:, 8:] == BACKDROP).all()
+
+    @pytest.mark.parametrize(
+        ('vertical_mirroring', 'name_table', 'expected'),
+        [
+            (False, 1, BACKDROP),
+            (False, 2, BACKGROUND_COLOR),
+            (False, 3, BACKGROUND_COLOR),
+            (True, 1, BACKGROUND_COLOR),
+            (True, 2, BACKDROP),
+            (True, 3, BACKGROUND_COLOR),
+        ],
+    )
+    def test_mirroring(self, ppu, vertical_mirroring, name_table, expected):
+        """The second name table in memory is either below or to the right of the first."""
+        ppu.vertical_mirroring = vertical_mirroring
+        ppu.name_tables[NAME_TABLE_SIZE] = SOLID_TILE
+        ppu.temp_address = name_table << 10
+
+        assert render(ppu)[0, 0] == expected
+
+    def test_wrap_around(self, ppu):
+        ppu.name_tables[0] = SOLID_TILE
+        # Last column of the name table on the right, then back to the first name table
+        ppu.temp_address = 0x041F
+
+        pixels = render(ppu)
+
+        assert (pixels[:8, 8:16] == BACKGROUND_COLOR).all()
+        assert (pixels[:8, :8] == BACKDROP).all()
+
+    def test_left_clipped(self, ppu):
+        ppu.name_tables[0:2] = bytes([SOLID_TILE, SOLID_TILE])
+        ppu.mask = renderer.MASK_BACKGROUND
+
+        pixels = render(ppu)
+
+        assert (pixels[:8, :8] == BACKDROP).all()
+        assert (pixels[:8, 8:16] == BACKGROUND_COLOR).all()
+
+    def test_disabled(self, ppu):
+        ppu.name_tables[0] = SOLID_TILE
+        ppu.mask = renderer.MASK_SPRITES | renderer.MASK_LEFT
+        set_sprite(ppu, 0, 16, 16)
+
+        pixels = render(ppu)
+
+        assert pixels[0, 0] == BACKDROP
+        assert pixels[16, 16] == SPRITE_COLOR
+
+
+class TestSprites:
+    def test_position(self, ppu):
+        set_sprite(ppu, 0, 16, 32)
+
+        pixels = render(ppu)
+
+        assert (pixels[32:40, 16:24] == SPRITE_COLOR).all()
+        assert (pixels[:32] == BACKDROP).all()
+        assert (pixels[40:] == BACKDROP).all()
+        assert (pixels[:, 24:] == BACKDROP).all()
+
+    def test_moved(self, ppu):
+        """Sprites are laid over the reused background buffer, nothing of them is left for the next frame."""
+        frame = FrameBuffer()
+        test_renderer = renderer.Renderer(ppu)
+        set_sprite(ppu, 0, 16, 32)
+        test_renderer.render(frame)
+        set_sprite(ppu, 0, 64, 64)
+        test_renderer.render(frame)
+
+        pixels = np.frombuffer(frame.pixels, dtype=np.uint8).reshape(HEIGHT, WIDTH)
+        assert (pixels[32:40, 16:24] == BACKDROP).all()
+        assert (pixels[64:72, 64:72] == SPRITE_COLOR).all()
+
+    def test_palette(self, ppu):
+        set_sprite(ppu, 0, 0, 8, attributes=1)
+
+        assert render(ppu)[8, 0] == OTHER_SPRITE_COLOR
+
+    def test_pattern_table(self, ppu):
+        set_sprite(ppu, 0, 0, 8)
+        ppu.ctrl = renderer.CTRL_SPRITE_TABLE
+        assert render(ppu)[8, 0] == BACKDROP
+
+        set_tile(ppu, renderer.TILES_PER_TABLE + SOLID_TILE, [0xFF] * renderer.TILE_SIZE)
+        assert render(ppu)[8, 0] == SPRITE_COLOR
+
+    def test_front_sprite(self, ppu):
+        """Lower numbered sprites are in front."""
+        set_sprite(ppu, 0, 4, 8)
+        set_sprite(ppu, 1, 0, 8, attributes=1)
+
+        pixels = render(ppu)
+
+        assert pixels[8, 3] == OTHER_SPRITE_COLOR
+        assert (pixels[8, 4:12] == SPRITE_COLOR).all()
+
+    def test_transparent(self, ppu):
+        """Transparent pixels of a sprite show what is behind it."""
+        set_sprite(ppu, 0, 0, 8, tile=CORNER_TILE)
+        set_sprite(ppu, 1, 0, 8, attributes=1)
+
+        pixels = render(ppu)
+
+        assert pixels[8, 0] == SPRITE_COLOR
+        assert pixels[8, 1] == OTHER_SPRITE_COLOR
+
+    def test_over_background(self, ppu):
+        ppu.name_tables[0] = SOLID_TILE
+        set_sprite(ppu, 1, 4, 1)
+
+        pixels = render(ppu)
+
+        assert pixels[1, 3] == BACKGROUND_COLOR
+        assert pixels[1, 4] == SPRITE_COLOR
+
+    def test_behind_background(self, ppu):
+        ppu.name_tables[0] = SOLID_TILE
+        set_sprite(ppu, 1, 4, 1, attributes=renderer.ATTRIBUTE_BEHIND)
+
+        pixels = render(ppu)
+
+        assert pixels[1, 4] == BACKGROUND_COLOR
+        # Shows through where the background is transparent
+        assert pixels[1, 8] == SPRITE_COLOR
+
+    def test_behind_hides_front(self, ppu):
+        """A sprite behind the background still hides sprites behind it, like the hardware."""
+        ppu.name_tables[0] = SOLID_TILE
+        set_sprite(ppu, 1, 0, 1, attributes=renderer.ATTRIBUTE_BEHIND)
+        set_sprite(ppu, 2, 0, 1, attributes=1)
+
+        assert render(ppu)[1, 0] == BACKGROUND_COLOR
+
+    @pytest.mark.parametrize(
+        ('attributes', 'row', 'column'),
+        [
+            (0, 8, 0),
+            (renderer.ATTRIBUTE_FLIP_X, 8, 7),
+            (renderer.ATTRIBUTE_FLIP_Y, 15, 0),
+            (renderer.ATTRIBUTE_FLIP_X | renderer.ATTRIBUTE_FLIP_Y, 15, 7),
+        ],
+        ids=['Not flipped', 'Flip x', 'Flip y', 'Flip both'],
+    )
+    def test_flip(self, ppu, attributes, row, column):
+        set_sprite(ppu, 0, 0, 8, tile=CORNER_TILE, attributes=attributes)
+
+        pixels = render(ppu)
+
+        assert pixels[row, column] == SPRITE_COLOR
+        assert (pixels == SPRITE_COLOR).sum() == 1
+
+    @pytest.mark.parametrize(
+        ('attributes', 'top', 'bottom'),
+        [(0, SPRITE_COLOR, OTHER_SPRITE_COLOR), (renderer.ATTRIBUTE_FLIP_Y, OTHER_SPRITE_COLOR, SPRITE_COLOR)],
+        ids=['Not flipped', 'Flip y'],
+    )
+    def test_tall(self, ppu, attributes, top, bottom):
+        """8x16 sprites are two tiles, from the pattern table picked by bit 0 of the tile number."""
+        ppu.ctrl = renderer.CTRL_SPRITE_16
+        set_tile(ppu, renderer.TILES_PER_TABLE + 4, [0xFF] * renderer.TILE_SIZE)
+        # Color 2, only the top bit plane
+        start = (renderer.TILES_PER_TABLE + 5) * 2 * renderer.TILE_SIZE + renderer.TILE_SIZE
+        end = start + renderer.TILE_SIZE
+        ppu.chr[start:end] = b'\xff' * renderer.TILE_SIZE
+        ppu.palette[0x12] = OTHER_SPRITE_COLOR
+        set_sprite(ppu, 0, 0, 8, tile=5, attributes=attributes)
+
+        pixels = render(ppu)
+
+        assert (pixels[8:16, :8] == top).all()
+        assert (pixels[16:24, :8] == bottom).all()
+        assert (pixels[24:] == BACKDROP).all()
+
+    def test_per_line_limit(self, ppu):
+        for number in range(renderer.MAX_SPRITES_PER_LINE):
+            set_sprite(ppu, number, number * renderer.TILE_SIZE, 8)
+        set_sprite(ppu, renderer.MAX_SPRITES_PER_LINE, 64, 9)
+
+        pixels = render(ppu)
+
+        assert (pixels[8:16, :64] == SPRITE_COLOR).all()
+        # The last sprite is only drawn on the line below the others
+        assert (pixels[9:16, 64:72] == BACKDROP).all()
+        assert (pixels[16, 64:72] == SPRITE_COLOR).all()
+
+    def test_left_clipped(self, ppu):
+        ppu.mask = renderer.MASK_SPRITES | renderer.MASK_BACKGROUND_LEFT
+        set_sprite(ppu, 0, 4, 8)
+
+        pixels = render(ppu)
+
+        assert (pixels[8:16, :8] == BACKDROP).all()
+        assert (pixels[8:16, 8:12] == SPRITE_COLOR).all()
+
+    def test_right_edge(self, ppu):
+        set_sprite(ppu, 0, WIDTH - 4, 8)
+
+        pixels = render(ppu)
+
+        assert (pixels[8:16, -4:] == SPRITE_COLOR).all()
+        assert (pixels[8:16, :8] == BACKDROP).all()
+
+
+class TestSprite0Hit:
+    @pytest.mark.parametrize(
+        ('mask', 'x', 'tile', 'expected'),
+        [
+            (SHOW_ALL, 4, SOLID_TILE, True),
+            (SHOW_ALL, 16, SOLID_TILE, False),
+            (SHOW_ALL, 0, CORNER_TILE, True),
+            (SHOW_ALL & ~renderer.MASK_SPRITES_LEFT, 0, CORNER_TILE, False),
+            (SHOW_ALL & ~renderer.MASK_BACKGROUND_LEFT, 0, CORNER_TILE, False),
+            (SHOW_ALL & ~renderer.MASK_BACKGROUND_LEFT, 4, SOLID_TILE, True),
+        ],
+        ids=[
+            'Overlap',
+            'Transparent background',
+            'Opaque pixel',
+            'Sprites clipped',
+            'Background clipped',
+            'Past the clip',
+        ],
+    )
+    def test_hit(self, ppu, mask, x, tile, expected):
+        ppu.name_tables[0:2] = bytes([SOLID_TILE, SOLID_TILE])
+        ppu.mask = mask
+        set_sprite(ppu, 0, x, 1, tile=tile)
+        # Sprites other than 0 don't count
+        set_sprite(ppu, 1, 0, 1)
+
+        render(ppu)
+
+        assert bool(ppu.status & renderer.STATUS_SPRITE_0_HIT) == expected
+
+    def test_last_column(self, ppu):
+        """There is no hit at x = 255."""
+        ppu.name_tables[renderer.NAME_TABLE_COLUMNS - 1] = SOLID_TILE
+        set_sprite(ppu, 0, WIDTH - 1, 1)
+
+        render(ppu)
+
+        assert not ppu.status & renderer.STATUS_SPRITE_0_HIT
+
+    def test_cleared(self, ppu):
+        ppu.status = renderer.STATUS_SPRITE_0_HIT
+
+        render(ppu)
+
+        assert not ppu.status & renderer.STATUS_SPRITE_0_HIT
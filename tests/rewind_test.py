@@ -0,0 +1,119 @@
+# pylint: disable=no-self-use
+import pytest
+
+from pynes import rewind
+from pynes.nes import Nes
+from pynes.rom import Rom
+from testing.util import make_rom
+
+
+@pytest.fixture
+def test_nes():
+    yield Nes(Rom.from_bytes(make_rom()))
+
+
+def play(test_nes: Nes, history: rewind.RewindBuffer, frames: int) -> None:
+    """Run frames, leaving a mark in ram so every state is different."""
+    for _ in range(frames):
+        test_nes.run_frame()
+        test_nes.cpu.memory[test_nes.frame_count % 0x800] = test_nes.frame_count & 0xFF
+        history.capture()
+
+
+def test_xor():
+    assert rewind.xor(b'\x0f\xf0', b'\xff\xff') == b'\xf0\x0f'
+
+
+def test_invalid_interval(test_nes):
+    with pytest.raises(ValueError):
+        rewind.RewindBuffer(test_nes, interval=0)
+
+
+class TestRewind:
+    def test_interval(self, test_nes):
+        history = rewind.RewindBuffer(test_nes, interval=4)
+        play(test_nes, history, 10)
+
+        assert len(history) == 2
+        assert history.oldest_frame == 4
+
+    def test_restores_state(self, test_nes):
+        history = rewind.RewindBuffer(test_nes, interval=1)
+        play(test_nes, history, 3)
+        expected = test_nes.save_state()
+        play(test_nes, history, 2)
+
+        assert history.rewind() == 4
+        assert history.rewind() == 3
+        assert test_nes.save_state() == expected
+        assert len(history) == 3
+
+    def test_between_captures(self, test_nes):
+        """Rewinding from a frame that wasn't captured goes back to the latest capture."""
+        history = rewind.RewindBuffer(test_nes, interval=2)
+        play(test_nes, history, 3)
+
+        assert history.rewind() == 2
+        assert test_nes.frame_count == 2
+
+    def test_exhausted(self, test_nes):
+        history = rewind.RewindBuffer(test_nes, interval=1)
+        play(test_nes, history, 2)
+        history.rewind()
+
+        with pytest.raises(IndexError):
+            history.rewind()
+        assert len(history) == 0
+        assert history.oldest_frame is None
+
+    def test_empty(self, test_nes):
+        history = rewind.RewindBuffer(test_nes)
+
+        with pytest.raises(IndexError):
+            history.rewind()
+        assert history.nbytes == 0
+
+    def test_capture_after_rewind(self, test_nes):
+        history = rewind.RewindBuffer(test_nes, interval=1)
+        play(test_nes, history, 3)
+        history.rewind()
+        play(test_nes, history, 1)
+
+        assert len(history) == 3
+        assert history.rewind() == 2
+
+    def test_clear(self, test_nes):
+        history = rewind.RewindBuffer(test_nes, interval=1)
+        play(test_nes, history, 3)
+        history.clear()
+
+        assert len(history) == 0
+        assert history.nbytes == 0
+
+
+class TestMemory:
+    def test_deltas_compressed(self, test_nes):
+        history = rewind.RewindBuffer(test_nes, interval=1)
+        play(test_nes, history, 20)
+        state_size = len(test_nes.save_state())
+
+        # Deltas take a small fraction of a full state
+        assert history.nbytes < state_size + 19 * state_size // 50
+
+    def test_ceiling(self, test_nes):
+        state_size = len(test_nes.save_state())
+        history = rewind.RewindBuffer(test_nes, interval=1, max_bytes=state_size + 1000)
+        play(test_nes, history, 50)
+
+        assert history.nbytes <= state_size + 1000
+        assert 1 < len(history) < 50
+        # The oldest states are the ones evicted
+        assert history.oldest_frame == 50 - len(history) + 1
+
+    def test_state_size_changed(self, test_nes):
+        history = rewind.RewindBuffer(test_nes, interval=1)
+        play(test_nes, history, 1)
+        test_nes.cpu.memory += b'\x00'
+
+        with pytest.raises(ValueError):
+            play(test_nes, history, 1)
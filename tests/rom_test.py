@@ -0,0 +1,85 @@
+# pylint: disable=no-self-use
+import pytest
+
+from pynes import rom
+from testing.util import make_rom
+
+
+class TestFromBytes:
+    def test_parse(self):
+        test_rom = rom.Rom.from_bytes(make_rom(b'\x18', chr_rom=b'\x01'))
+
+        assert len(test_rom.prg_rom) == rom.PRG_ROM_BANK_SIZE
+        assert test_rom.prg_rom[0] == 0x18
+        assert len(test_rom.chr_rom) == rom.CHR_ROM_BANK_SIZE
+        assert test_rom.chr_rom[0] == 0x01
+        assert test_rom.mapper == 0
+        assert not test_rom.vertical_mirroring
+
+    def test_flags(self):
+        image = bytearray(make_rom())
+        image[6] = 0x11  # mapper low nibble 1, vertical mirroring
+        image[7] = 0x20  # mapper high nibble 2
+
+        test_rom = rom.Rom.from_bytes(bytes(image))
+
+        assert test_rom.mapper == 0x21
+        assert test_rom.vertical_mirroring
+
+    def test_trainer_is_skipped(self):
+        image = bytearray(make_rom(b'\x18'))
+        image[6] |= 0x04
+        header_size = rom.HEADER_SIZE
+        image = image[:header_size] + b'\xff' * rom.TRAINER_SIZE + image[header_size:]
+
+        assert rom.Rom.from_bytes(bytes(image)).prg_rom[0] == 0x18
+
+    def test_bad_magic(self):
+        with pytest.raises(rom.RomFormatError):
+            rom.Rom.from_bytes(b'\x00' * 32)
+
+    def test_truncated(self):
+        with pytest.raises(rom.RomFormatError):
+            rom.Rom.from_bytes(make_rom()[:-1])
+
+
+def test_load(tmp_path):
+    path = tmp_path / 'test.nes'
+    path.write_bytes(make_rom(b'\x18'))
+
+    assert rom.Rom.load(str(path)).prg_rom[0] == 0x18
+
+
+def test_sha1():
+    assert rom.Rom.from_bytes(make_rom(b'\x18')).sha1 == rom.Rom.from_bytes(make_rom(b'\x18')).sha1
+    assert rom.Rom.from_bytes(make_rom(b'\x18')).sha1 != rom.Rom.from_bytes(make_rom(b'\x58')).sha1
+
+
+class TestLoadInto:
+    def test_16k_is_mirrored(self):
+        memory = bytearray(0x10000)
+        rom.Rom.from_bytes(make_rom(b'\x18')).load_into(memory)
+
+        assert memory[0x8000] == 0x18
+        assert memory[0xC000] == 0x18
+        assert memory[rom.RESET_VECTOR] == 0x00
+        assert memory[rom.RESET_VECTOR + 1] == 0x80
+
+    def test_32k(self):
+        memory = bytearray(0x10000)
+        prg_rom = bytes(range(256)) * (2 * rom.PRG_ROM_BANK_SIZE // 256)
+        rom.Rom(prg_rom=prg_rom, chr_rom=b'', mapper=0, vertical_mirroring=False).load_into(memory)
+
+        assert memory[0x8000:] == prg_rom
+
+    def test_unsupported_mapper(self):
+        test_rom = rom.Rom(prg_rom=bytes(rom.PRG_ROM_BANK_SIZE), chr_rom=b'', mapper=1, vertical_mirroring=False)
+
+        with pytest.raises(NotImplementedError):
+            test_rom.load_into(bytearray(0x10000))
+
+    def test_unsupported_size(self):
+        test_rom = rom.Rom(prg_rom=bytes(rom.PRG_ROM_BANK_SIZE * 3), chr_rom=b'', mapper=0, vertical_mirroring=False)
+
+        with pytest.raises(NotImplementedError):
+            test_rom.load_into(bytearray(0x10000))
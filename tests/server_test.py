@@ -0,0 +1,170 @@
+# pylint: disable=no-self-use
+import asyncio
+import base64
+import json
+from typing import Any
+from typing import List
+from unittest import mock
+
+import pytest
+
+from pynes import server
+from pynes import video
+from testing.util import make_rom
+
+
+@pytest.fixture
+def rom_path(tmp_path):
+    path = tmp_path / 'test.nes'
+    path.write_bytes(make_rom())
+    yield str(path)
+
+
+class TestHandle:
+    def test_session_lifecycle(self, rom_path):
+        async def scenario() -> Any:
+            session_server = server.SessionServer()
+            opened = await session_server.handle({'command': 'open', 'rom': rom_path, 'recompiled': True})
+            session = opened['session']
+
+            return (
+                opened,
+                await session_server.handle({'command': 'input', 'session': session, 'buttons': 0x81}),
+                await session_server.handle({'command': 'step', 'session': session, 'frames': 2}),
+                await session_server.handle({'command': 'screenshot', 'session': session}),
+                session_server.sessions[session].nes.controllers[0].buttons,
+                session_server.sessions[session].nes.cpu.blocks is not None,
+                await session_server.handle({'command': 'close', 'session': session}),
+                session_server.sessions,
+            )
+
+        opened, input_, step, screenshot, buttons, recompiled, close, sessions = asyncio.run(scenario())
+
+        assert opened == {'ok': True, 'session': 1}
+        assert input_ == {'ok': True}
+        assert buttons == 0x81
+        assert step['ok']
+        assert step['frame'] == 2
+        assert step['hash'] == video.FrameBuffer().digest()
+        assert len(base64.b64decode(screenshot['pixels'])) == video.WIDTH * video.HEIGHT
+        assert close == {'ok': True}
+        assert sessions == {}
+        assert recompiled
+
+    def test_metrics(self, rom_path):
+        async def scenario() -> Any:
+            session_server = server.SessionServer()
+            session = (await session_server.handle({'command': 'open', 'rom': rom_path}))['session']
+            await session_server.handle({'command': 'step', 'session': session, 'frames': 2})
+            return await session_server.handle({'command': 'metrics', 'session': session}), session_server.exposition()
+
+        response, exposition = asyncio.run(scenario())
+
+        assert response['ok']
+        assert response['metrics']['frames'] == 2
+        assert 'pynes_frames_total{session="1"} 2' in exposition.splitlines()
+
+    def test_screenshot_formats(self, rom_path):
+        async def scenario() -> Any:
+            session_server = server.SessionServer()
+            session = (await session_server.handle({'command': 'open', 'rom': rom_path}))['session']
+            session_server.sessions[session].nes.frame.pixels[0] = 0x30
+            rgba = await session_server.handle({'command': 'screenshot', 'session': session, 'format': 'rgba32'})
+            again = await session_server.handle({'command': 'screenshot', 'session': session, 'format': 'rgba32'})
+            invalid = await session_server.handle({'command': 'screenshot', 'session': session, 'format': 'bogus'})
+            return rgba, again, invalid, session_server.sessions[session].outputs
+
+        rgba, again, invalid, outputs = asyncio.run(scenario())
+
+        pixels = base64.b64decode(rgba['pixels'])
+        assert len(pixels) == video.WIDTH * video.HEIGHT * 4
+        assert pixels[:4] == b'\xfc\xfc\xfc\xff'
+        assert again == rgba
+        # The output buffer is reused
+        assert list(outputs) == [video.OutputFormat.rgba32]
+        assert not invalid['ok']
+
+    def test_concurrent_sessions(self, rom_path):
+        async def scenario() -> List[server.Message]:
+            session_server = server.SessionServer()
+            sessions = []
+            for _ in range(3):
+                sessions.append((await session_server.handle({'command': 'open', 'rom': rom_path}))['session'])
+
+            return await asyncio.gather(
+                *(session_server.handle({'command': 'step', 'session': session, 'frames': 2}) for session in sessions)
+            )
+
+        responses = asyncio.run(scenario())
+
+        assert [response['frame'] for response in responses] == [2, 2, 2]
+
+    @pytest.mark.parametrize('port', [-1, 2, '0'])
+    def test_invalid_port(self, rom_path, port):
+        async def scenario() -> server.Message:
+            session_server = server.SessionServer()
+            session = (await session_server.handle({'command': 'open', 'rom': rom_path}))['session']
+            return await session_server.handle({'command': 'input', 'session': session, 'buttons': 1, 'port': port})
+
+        response = asyncio.run(scenario())
+
+        assert response == {'ok': False, 'error': f'ProtocolError: Invalid controller port: {port}'}
+
+    @pytest.mark.parametrize('rom', [None, 0, ['test.nes']])
+    def test_invalid_rom(self, rom):
+        request = {'command': 'open'} if rom is None else {'command': 'open', 'rom': rom}
+        with mock.patch.object(server.Rom, 'load') as load:
+            response = asyncio.run(server.SessionServer().handle(request))
+
+        load.assert_not_called()
+        assert response == {'ok': False, 'error': f'ProtocolError: Invalid rom path: {rom!r}'}
+
+    @pytest.mark.parametrize(
+        'request_',
+        [
+            {'command': 'bogus'},
+            {},
+            {'command': 'step', 'session': 100},
+            {'command': 'open'},
+            {'command': 'open', 'rom': '/does/not/exist.nes'},
+        ],
+    )
+    def test_errors(self, request_):
+        response = asyncio.run(server.SessionServer().handle(request_))
+
+        assert not response['ok']
+        assert response['error']
+
+
+def test_socket_protocol(rom_path):
+    requests = [
+        json.dumps({'command': 'open', 'rom': rom_path}),
+        'not json',
+        # Valid JSON, but not a request
+        '5',
+        json.dumps({'command': 'step', 'session': 1}),
+    ]
+
+    async def scenario() -> List[server.Message]:
+        listener = await server.SessionServer().start(port=0)
+        port = listener.sockets[0].getsockname()[1]
+
+        reader, writer = await asyncio.open_connection(server.DEFAULT_HOST, port)
+        responses = []
+        for line in requests:
+            writer.write(line.encode() + b'\n')
+            await writer.drain()
+            responses.append(json.loads(await reader.readline()))
+
+        writer.close()
+        await writer.wait_closed()
+        listener.close()
+        await listener.wait_closed()
+        return responses
+
+    opened, invalid, not_object, step = asyncio.run(scenario())
+
+    assert opened['ok']
+    assert not invalid['ok']
+    assert not_object == {'ok': False, 'error': 'ProtocolError: Request must be a JSON object'}
+    assert step['frame'] == 1
@@ -0,0 +1,49 @@
+import subprocess
+import sys
+from typing import Dict
+
+import pytest
+
+# Generous, importing the cpu or the console takes about 30ms. Mostly to catch something heavy like numpy being pulled
+# in.
+IMPORT_BUDGET_US = 150_000
+
+
+def import_times(module: str) -> Dict[str, int]:
+    """Cumulative import time in microseconds of every module imported by importing module."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        stderr=subprocess.PIPE,
+        check=True,
+        universal_newlines=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        # import time: self [us] | cumulative | imported package
+        _, cumulative, name = line.split('|')
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_cpu():
+    times = import_times('pynes.cpu')
+
+    assert times['pynes.cpu'] < IMPORT_BUDGET_US
+    assert not [module for module in times if module.startswith('pynes.instructions')]
+    assert 'numpy' not in times
+
+
+@pytest.mark.parametrize('module', ['pynes.nes', 'pynes.main'])
+def test_budget(module):
+    """The console and the command line defer numpy, asyncio and the recompiler until they're used."""
+    times = import_times(module)
+
+    assert times[module] < IMPORT_BUDGET_US
+    assert not {'numpy', 'asyncio', 'pynes.recompiler'} & set(times)
+
+
+@pytest.mark.parametrize('module', ['pynes.movie', 'pynes.debugger'])
+def test_no_numpy(module):
+    assert 'numpy' not in import_times(module)
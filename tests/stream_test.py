@@ -0,0 +1,165 @@
+# pylint: disable=no-self-use
+import asyncio
+import threading
+
+import pytest
+
+from pynes import stream
+from pynes.nes import Nes
+from pynes.rom import Rom
+from pynes.video import HEIGHT
+from pynes.video import WIDTH
+from testing.util import make_rom
+
+
+class TestOutputStream:
+    def test_invalid_maxsize(self):
+        with pytest.raises(ValueError):
+            stream.OutputStream(0)
+
+    def test_iterate_in_order(self):
+        output: stream.OutputStream[int] = stream.OutputStream(4)
+        for i in range(3):
+            output.put(i)
+        output.finish()
+
+        assert list(output) == [0, 1, 2]
+
+    def test_get_after_finish(self):
+        output: stream.OutputStream[int] = stream.OutputStream(1)
+        output.finish()
+
+        with pytest.raises(stream.EndOfStream):
+            output.get()
+
+    def test_backpressure(self):
+        """Producer must block on a full queue until the consumer catches up."""
+        output: stream.OutputStream[int] = stream.OutputStream(1)
+        output.put(0)
+
+        producer = threading.Thread(target=output.put, args=(1,))
+        producer.start()
+        producer.join(timeout=0.05)
+        assert producer.is_alive(), 'put should block while the queue is full'
+        assert len(output) == 1
+
+        assert output.get() == 0
+        producer.join(timeout=1)
+        assert not producer.is_alive()
+        assert output.get() == 1
+
+    def test_cancel_releases_producer(self):
+        output: stream.OutputStream[int] = stream.OutputStream(1)
+        output.put(0)
+
+        producer = threading.Thread(target=output.put, args=(1,))
+        producer.start()
+        output.cancel()
+        producer.join(timeout=1)
+
+        assert not producer.is_alive()
+        assert output.cancelled
+        assert len(output) == 0
+
+    def test_put_after_cancel_is_dropped(self):
+        output: stream.OutputStream[int] = stream.OutputStream(1)
+        output.cancel()
+        output.put(0)
+
+        assert len(output) == 0
+
+    def test_break_cancels(self):
+        output: stream.OutputStream[int] = stream.OutputStream(4)
+        output.put(0)
+        output.put(1)
+
+        # Dropping the iterator closes it
+        assert next(iter(output)) == 0
+
+        assert output.cancelled
+
+    def test_error_propagates(self):
+        output: stream.OutputStream[int] = stream.OutputStream(1)
+        output.finish(RuntimeError('boom'))
+
+        with pytest.raises(RuntimeError):
+            list(output)
+
+    def test_async_iteration(self):
+        output: stream.OutputStream[int] = stream.OutputStream(2)
+
+        def produce():
+            for i in range(5):
+                output.put(i)
+            output.finish()
+
+        async def consume() -> None:
+            producer = threading.Thread(target=produce)
+            producer.start()
+
+            assert [item async for item in output] == [0, 1, 2, 3, 4]
+            assert output.cancelled
+            producer.join(timeout=1)
+
+        asyncio.run(consume())
+
+
+class TestEmulatorOutput:
+    def test_start(self):
+        output = stream.EmulatorOutput(video_maxsize=1, audio_maxsize=1)
+
+        def produce(emulator_output):
+            for i in range(3):
+                emulator_output.video.put(bytes([i]))
+
+        output.audio.cancel()
+        thread = output.start(produce)
+
+        assert list(output.video) == [b'\x00', b'\x01', b'\x02']
+        thread.join(timeout=1)
+        assert not output.active
+
+    def test_active(self):
+        output = stream.EmulatorOutput()
+        assert output.active
+
+        output.video.cancel()
+        assert output.active
+
+        output.audio.cancel()
+        assert not output.active
+
+    def test_producer_error(self):
+        output = stream.EmulatorOutput()
+
+        def produce(emulator_output):
+            raise RuntimeError('boom')
+
+        output.start(produce)
+
+        with pytest.raises(RuntimeError):
+            output.video.get()
+        with pytest.raises(RuntimeError):
+            output.audio.get()
+
+
+class TestEmulate:
+    def test_frames(self):
+        output = stream.EmulatorOutput()
+
+        thread = output.emulate(Nes(Rom.from_bytes(make_rom())), frames=2)
+
+        assert [len(frame) for frame in output.video] == [WIDTH * HEIGHT] * 2
+        assert len(list(output.audio)) == 2
+        thread.join(timeout=1)
+
+    def test_consumers_gone(self):
+        output = stream.EmulatorOutput(video_maxsize=1)
+        output.audio.cancel()
+
+        thread = output.emulate(Nes(Rom.from_bytes(make_rom())))
+        output.video.get()
+        output.video.cancel()
+
+        thread.join(timeout=5)
+        assert not thread.is_alive()
@@ -0,0 +1,183 @@
+# pylint: disable=no-self-use
+from unittest import mock
+
+import pytest
+
+from pynes import trace
+from pynes.nes import Nes
+from pynes.ppu import OAM_DMA
+from pynes.rom import Rom
+from testing.util import make_rom
+
+# $8000: BIT $2002; ADC $4016; CLC; BCC $8000
+PROGRAM = bytes([0x2C, 0x02, 0x20, 0x6D, 0x16, 0x40, 0x18, 0x90, 0xF7])
+FRAMES = 2
+
+
+@pytest.fixture
+def test_nes():
+    yield Nes(Rom.from_bytes(make_rom(PROGRAM)))
+
+
+def press_buttons(nes: Nes) -> None:
+    # Strobe, so every read returns A
+    nes.controllers[0].write(1)
+    nes.controllers[0].buttons = nes.frame_count & 1
+
+
+@pytest.fixture
+def test_trace(test_nes):
+    yield trace.record(test_nes, FRAMES, before_frame=press_buttons)
+
+
+class TestRecord:
+    def test_events(self, test_trace, test_nes):
+        assert test_trace.rom_sha1 == test_nes.rom.sha1
+        assert (test_trace.start_frame, test_trace.frames) == (0, FRAMES)
+        assert test_trace.events[:2] == [(trace.READ, 0x2002, 0), (trace.READ, 0x4016, 0)]
+        # A is pressed on odd frames
+        assert (trace.READ, 0x4016, 1) in test_trace.events
+        assert test_trace.digest == trace.cpu_digest(test_nes.cpu)
+
+    def test_handlers_restored(self, test_nes):
+        readers = list(test_nes.cpu.bus.readers)
+        writers = list(test_nes.cpu.bus.writers)
+
+        trace.record(test_nes, 1)
+
+        assert test_nes.cpu.bus.readers == readers
+        assert test_nes.cpu.bus.writers == writers
+
+    def test_stalls(self, test_nes):
+        """DMA stalls the cpu. The register reads it makes itself aren't the cpu's, so they aren't logged."""
+
+        def dma(nes: Nes) -> None:
+            nes.cpu.write_to_memory(OAM_DMA, 0x20)
+
+        recorded = trace.record(test_nes, 1, before_frame=dma)
+
+        assert recorded.events[0][:2] == (trace.STALL, OAM_DMA)
+        assert recorded.events[1] == (trace.READ, 0x2002, 0)
+
+    def test_read_stall(self, test_nes):
+        bus = test_nes.cpu.bus
+
+        def slow_read(address: int) -> int:
+            # Writes made by a handler aren't the cpu's either
+            test_nes.cpu.write_to_memory(0x2000, 0)
+            test_nes.cpu.cycles += 3
+            return 1
+
+        bus.readers[0x40] = slow_read
+        # Plain memory in the traced range isn't logged
+        bus.map(0x3F00, 0x3F00)
+        recorded = trace.record(test_nes, 1, before_frame=lambda nes: nes.cpu.write_to_memory(0x2000, 0))
+
+        assert recorded.events[1:3] == [(trace.READ, 0x4016, 1), (trace.STALL, 0x4016, 3)]
+        # Replay stalls the same way
+        trace.Replay(recorded).run()
+
+
+class TestReplay:
+    def test_run(self, test_trace):
+        replay = trace.Replay(test_trace)
+
+        assert replay.run() >= 0
+        assert replay.position == len(test_trace.events)
+
+        # Again, from the start
+        replay.rewind()
+        replay.run()
+
+    def test_skipped_wait(self):
+        """Wait loops polling PPUSTATUS are skipped when replaying, just like they were when recording."""
+        # BIT $2002; BPL back to the BIT
+        wait_nes = Nes(Rom.from_bytes(make_rom(bytes([0x2C, 0x02, 0x20, 0x10, 0xFB]))))
+        recorded = trace.record(wait_nes, FRAMES)
+
+        replay = trace.Replay(recorded)
+        replay.run()
+
+        assert len(recorded.events) < 10
+        assert replay.cpu.idle_loop_detector is not None
+        assert replay.cpu.idle_loop_detector.skipped_cycles > 0
+
+    def test_write_stall(self, test_trace):
+        test_trace.events = [(trace.STALL, OAM_DMA, 513)]
+        replay = trace.Replay(test_trace)
+        cycles = replay.cpu.cycles
+
+        replay.cpu.write_to_memory(0x2000, 0)
+        replay.cpu.write_to_memory(OAM_DMA, 2)
+
+        assert replay.cpu.cycles == cycles + 513
+        assert replay.position == 1
+
+    def test_ram_mirror(self, test_trace):
+        replay = trace.Replay(test_trace)
+        replay.cpu.write_to_memory(0x0801, 7)
+
+        assert replay.cpu.memory[1] == 7
+        assert replay.cpu.read_from_memory(0x1001) == 7
+
+    def test_wrong_read(self, test_trace):
+        test_trace.events[1] = (trace.READ, 0x4017, 0)
+
+        with pytest.raises(trace.TraceMismatchError, match='Read of 0x4016'):
+            trace.Replay(test_trace).run()
+
+    def test_past_the_end(self, test_trace):
+        del test_trace.events[-1]
+
+        with pytest.raises(trace.TraceMismatchError, match='past the end'):
+            trace.Replay(test_trace).run()
+
+    def test_ended_early(self, test_trace):
+        test_trace.events.append((trace.READ, 0x2002, 0))
+
+        with pytest.raises(trace.TraceMismatchError, match='1 events early'):
+            trace.Replay(test_trace).run()
+
+    def test_different_state(self, test_trace):
+        test_trace.digest = bytes(20)
+
+        with pytest.raises(trace.TraceMismatchError, match='different state'):
+            trace.Replay(test_trace).run()
+
+
+def test_benchmark(test_trace):
+    with mock.patch.object(trace.Replay, 'run', side_effect=[3.0, 1.0, 2.0]) as run:
+        assert trace.benchmark(test_trace) == 1.0
+
+    assert run.call_count == 3
+
+
+class TestFormat:
+    def test_round_trip(self, test_trace, tmp_path):
+        path = str(tmp_path / 'test.pnio')
+        test_trace.save(path)
+        loaded = trace.IoTrace.load(path)
+
+        assert loaded.rom_sha1 == test_trace.rom_sha1
+        assert (loaded.start_frame, loaded.frames) == (test_trace.start_frame, test_trace.frames)
+        assert loaded.state == test_trace.state
+        assert loaded.events == test_trace.events
+        assert loaded.digest == test_trace.digest
+
+    def test_compact(self, test_trace):
+        # Memory is mostly empty, and the reads repeat
+        assert len(test_trace.to_bytes()) < len(test_trace.state) // 10
+
+    @pytest.mark.parametrize(
+        ('data', 'message'),
+        [
+            (b'PNIO', 'Truncated'),
+            (b'XXXX' + bytes(60), 'Not an I/O trace'),
+            (b'PNIO\x02' + bytes(60), 'Unsupported trace version 2'),
+            (b'PNIO\x01' + bytes(60), 'Corrupt trace'),
+        ],
+        ids=['Truncated', 'Bad magic', 'Bad version', 'Corrupt'],
+    )
+    def test_invalid(self, data, message):
+        with pytest.raises(trace.TraceFormatError, match=message):
+            trace.IoTrace.from_bytes(data)
@@ -0,0 +1,151 @@
+import hashlib
+
+import pytest
+
+from pynes import video
+
+
+def test_frame_buffer():
+    frame = video.FrameBuffer()
+    assert len(frame.pixels) == video.WIDTH * video.HEIGHT
+
+    digest = frame.digest()
+    frame.pixels[0] = 1
+    assert frame.digest() != digest
+
+
+class TestDigest:
+    def test_incremental(self):
+        frame = video.FrameBuffer()
+        frame.pixels[:] = bytes(range(256)) * video.HEIGHT
+        frame.digest()
+        frame.pixels[video.WIDTH * 10] = 0xFF
+        digest = frame.digest()
+
+        # Same result as hashing everything from scratch
+        fresh = video.FrameBuffer()
+        fresh.pixels[:] = frame.pixels
+        assert fresh.digest() == digest
+
+    def test_unchanged(self):
+        frame = video.FrameBuffer()
+        frame.pixels[5] = 1
+        digest = frame.digest()
+
+        assert frame.digest() == digest
+
+    def test_row_digests(self):
+        frame = video.FrameBuffer()
+        frame.pixels[video.WIDTH * 2] = 1
+        row_digests = frame.row_digests()
+
+        assert len(row_digests) == video.HEIGHT
+        assert row_digests[0] == hashlib.sha1(bytes(video.WIDTH)).hexdigest()
+        assert row_digests[2] == hashlib.sha1(b'\x01' + bytes(video.WIDTH - 1)).hexdigest()
+
+
+class TestDirtyRegions:
+    def test_changed_rows(self):
+        frame = video.FrameBuffer()
+        for row in (0, 1, 2, 7, 239):
+            frame.pixels[row * video.WIDTH + 3] = 1
+        frame.end_frame()
+
+        assert list(frame.dirty_rows) == [0, 1, 2, 7, 239]
+        assert frame.dirty_regions() == [(0, 3), (7, 8), (239, 240)]
+
+    def test_since_last_frame(self):
+        frame = video.FrameBuffer()
+        frame.pixels[0] = 1
+        frame.end_frame()
+        frame.end_frame()
+
+        assert frame.dirty_regions() == []
+
+    def test_clean(self):
+        frame = video.FrameBuffer()
+
+        assert frame.dirty_regions() == []
+
+
+class TestPaletteLut:
+    def test_rgb(self):
+        lut = video.palette_lut(video.OutputFormat.rgb24)
+
+        assert lut.shape == (video.EMPHASIS_COUNT, video.COLOR_COUNT, 3)
+        assert lut[0, 0x01].tolist() == [0x00, 0x00, 0xFC]
+        assert lut[0, 0x30].tolist() == [0xFC, 0xFC, 0xFC]
+        # Built once
+        assert video.palette_lut(video.OutputFormat.rgb24) is lut
+
+    def test_rgba(self):
+        lut = video.palette_lut(video.OutputFormat.rgba32)
+
+        assert lut[0, 0x30].tolist() == [0xFC, 0xFC, 0xFC, 0xFF]
+        assert (lut[..., 3] == 0xFF).all()
+
+    def test_emphasis(self):
+        lut = video.palette_lut(video.OutputFormat.rgb24)
+
+        # Emphasizing red dims green and blue
+        assert lut[0b001, 0x30].tolist() == [0xFC, 0xCE, 0xCE]
+        # Each channel is dimmed once per other bit set
+        assert lut[0b111, 0x30].tolist() == [0xA8, 0xA8, 0xA8]
+
+    def test_read_only(self):
+        lut = video.palette_lut(video.OutputFormat.rgb24)
+
+        with pytest.raises(ValueError):
+            lut[0, 0, 0] = 1
+
+    def test_indexed(self):
+        with pytest.raises(ValueError, match='no lookup table'):
+            video.palette_lut(video.OutputFormat.indexed)
+
+
+class TestFrameOutput:
+    def test_indexed(self):
+        frame = video.FrameBuffer()
+        output = video.FrameOutput(video.OutputFormat.indexed)
+
+        pixels = output.convert(frame)
+        frame.pixels[video.WIDTH + 2] = 0x21
+
+        # No copy, no conversion
+        assert pixels.shape == (video.HEIGHT, video.WIDTH)
+        assert pixels[1, 2] == 0x21
+
+    @pytest.mark.parametrize('output_format', [video.OutputFormat.rgb24, video.OutputFormat.rgba32])
+    def test_convert(self, output_format):
+        frame = video.FrameBuffer()
+        frame.pixels[video.WIDTH + 2] = 0x30
+        output = video.FrameOutput(output_format)
+
+        pixels = output.convert(frame)
+
+        assert pixels.shape == (video.HEIGHT, video.WIDTH, output_format.value)
+        assert pixels[1, 2, :3].tolist() == [0xFC, 0xFC, 0xFC]
+        assert pixels[0, 0, :3].tolist() == [0x7C, 0x7C, 0x7C]
+
+    def test_reused(self):
+        frame = video.FrameBuffer()
+        output = video.FrameOutput()
+        first = output.convert(frame)
+
+        frame.pixels[0] = 0x30
+        assert output.convert(frame) is first
+        assert first[0, 0].tolist() == [0xFC, 0xFC, 0xFC]
+
+    def test_emphasis(self):
+        frame = video.FrameBuffer()
+        frame.pixels[0] = 0x30
+        frame.emphasis = 0b001
+
+        assert video.FrameOutput().convert(frame)[0, 0].tolist() == [0xFC, 0xCE, 0xCE]
+
+    def test_out_of_range(self):
+        """Pixels are bytes, values past the last color don't index out of the table."""
+        frame = video.FrameBuffer()
+        frame.pixels[0] = 0xFF
+
+        assert video.FrameOutput().convert(frame)[0, 0].tolist() == [0x00, 0x00, 0x00]